@@ -0,0 +1,176 @@
+import traceback
+from datetime import datetime
+from contextlib import nullcontext
+from pontos_controle import impressao_entradas
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# Situações possíveis de uma etapa ao final da execução
+OK = "ok"
+EM_DIA = "em dia"  # pulada: concluída antes com as mesmas entradas (ver pontos_controle.py)
+FALHOU = "falhou"
+NAO_EXECUTADA = "não executada"
+INCOMPLETA = "incompleta"  # terminou, mas descartou parte das entradas (ex: um shard que falhou)
+
+# Situações de sucesso (contam para o código de saída)
+SUCESSO = (OK, EM_DIA)
+
+# Situações que liberam as etapas dependentes: uma etapa incompleta ainda gera saídas utilizáveis
+LIBERAM_DEPENDENTES = SUCESSO + (INCOMPLETA,)
+
+
+class Etapa:
+    """
+    Etapa do pipeline: uma função sem argumentos, as etapas de que depende
+    e o recurso que ela mais consome ("rede" ou "cpu").
+    A função pode retornar INCOMPLETA para indicar que terminou descartando parte das entradas.
+
+    Opcionalmente, funções sem argumentos que descrevem o que a etapa lê e grava, usadas
+    nos pontos de controle: 'entradas' (caminhos lidos), 'parametros' (valores que alteram
+    o resultado) e 'saidas' (caminhos gravados). Etapas sem entradas nem parâmetros sempre executam.
+    'completa', se informada, indica se o que a etapa gravou ainda está completo (ex: um arquivo
+    para cada URL baixada); enquanto retornar False, a etapa não é pulada.
+    """
+
+    def __init__(self, nome, funcao, dependencias=(), recurso="cpu", descricao="",
+                 entradas=None, parametros=None, saidas=None, completa=None):
+        self.nome = nome
+        self.funcao = funcao
+        self.dependencias = tuple(dependencias)
+        self.recurso = recurso
+        self.descricao = descricao
+        self.entradas = entradas
+        self.parametros = parametros
+        self.saidas = saidas
+        self.completa = completa
+
+    @property
+    def controlada(self):
+        """Indica se a etapa declara entradas ou parâmetros (e pode ser pulada quando em dia)."""
+        return self.entradas is not None or self.parametros is not None
+
+
+def selecionar_etapas(etapas, somente=None, pular=None):
+    """
+    Retorna os nomes das etapas a executar, respeitando '--only' (somente) e '--skip' (pular).
+
+    Dependências fora da seleção são consideradas já satisfeitas: permitem reexecutar
+    uma única etapa aproveitando os arquivos gerados por execuções anteriores.
+    """
+
+    nomes = [etapa.nome for etapa in etapas]
+    desconhecidas = [n for n in list(somente or []) + list(pular or []) if n not in nomes]
+    if desconhecidas:
+        raise ValueError(f"Etapas desconhecidas: {', '.join(desconhecidas)}. Disponíveis: {', '.join(nomes)}")
+
+    selecionadas = [n for n in nomes if not somente or n in somente]
+    return [n for n in selecionadas if n not in (pular or [])]
+
+
+def executar_etapas(etapas, somente=None, pular=None, trabalhadores=None, metricas=None,
+                    pontos_controle=None, forcar=False):
+    """
+    Executa as etapas respeitando as dependências declaradas.
+
+    - Etapas independentes rodam ao mesmo tempo
+    - Cada recurso tem o seu próprio pool ('trabalhadores', ex: {"rede": 2, "cpu": 1}),
+      de modo que downloads (rede) seguem em paralelo às transformações (cpu)
+    - Se uma etapa falha, as que dependem dela não são executadas
+    - Com 'metricas' (ver metricas.py), cada etapa é medida: tempo de relógio e de CPU, pico de RSS
+      e os arquivos que ela registrar
+    - Com 'pontos_controle' (ver pontos_controle.py), as etapas que declaram entradas são puladas
+      (situação EM_DIA) quando já foram concluídas com as mesmas entradas e as suas saídas estão
+      intactas; ao terminar com sucesso, cada uma grava o seu ponto de controle. Uma etapa que
+      retorna INCOMPLETA não grava o ponto de controle (executa de novo na próxima vez),
+      mas libera as dependentes.
+      'forcar' executa todas as etapas selecionadas mesmo assim
+
+    Retorna um dicionário {nome da etapa: situação}.
+    """
+
+    trabalhadores = trabalhadores or {"rede": 2, "cpu": 1}
+    por_nome = {etapa.nome: etapa for etapa in etapas}
+    selecionadas = selecionar_etapas(etapas, somente, pular)
+
+    for nome in selecionadas:
+        for dependencia in por_nome[nome].dependencias:
+            if dependencia not in por_nome:
+                raise ValueError(f"Etapa '{nome}' depende de etapa inexistente: '{dependencia}'")
+
+    situacao = {}
+    pendentes = list(selecionadas)
+    em_execucao = {}
+    pools = {
+        recurso: ThreadPoolExecutor(max_workers=max(1, quantidade), thread_name_prefix=f"etapa-{recurso}")
+        for recurso, quantidade in trabalhadores.items()
+    }
+
+    def executar(etapa):
+        controlada = pontos_controle is not None and etapa.controlada
+        if controlada:
+            entradas = impressao_entradas(
+                etapa.entradas() if etapa.entradas else (),
+                etapa.parametros() if etapa.parametros else None,
+            )
+            completa = etapa.completa is None or etapa.completa()
+            if not forcar and completa and pontos_controle.em_dia(etapa.nome, entradas):
+                concluida_em = pontos_controle.ponto(etapa.nome)["concluida_em"]
+                print(f"\n⏭️ Etapa em dia: {etapa.nome} (concluída em {concluida_em}, entradas inalteradas)")
+                return EM_DIA
+            # Até terminar, a etapa não conta como concluída (se falhar, executa de novo na próxima vez)
+            pontos_controle.invalidar(etapa.nome)
+
+        inicio = datetime.now()
+        print(f"\n▶️ Iniciando etapa: {etapa.nome}" + (f" ({etapa.descricao})" if etapa.descricao else ""))
+        with metricas.etapa(etapa.nome, recurso=etapa.recurso) if metricas else nullcontext():
+            resultado = etapa.funcao()
+        if resultado == INCOMPLETA:
+            print(f"\n⚠️ Etapa incompleta: {etapa.nome} em {datetime.now() - inicio} "
+                  f"(ponto de controle não gravado)")
+            return INCOMPLETA
+        print(f"\n🏁 Etapa concluída: {etapa.nome} em {datetime.now() - inicio}")
+
+        if controlada:
+            pontos_controle.registrar(etapa.nome, entradas, etapa.saidas() if etapa.saidas else ())
+        return OK
+
+    try:
+        while pendentes or em_execucao:
+            # Descarta as etapas cujas dependências falharam
+            for nome in list(pendentes):
+                bloqueios = [d for d in por_nome[nome].dependencias
+                             if situacao.get(d) in (FALHOU, NAO_EXECUTADA)]
+                if bloqueios:
+                    print(f"\n⏭️ Etapa {nome} não executada: dependência sem sucesso ({', '.join(bloqueios)}).")
+                    situacao[nome] = NAO_EXECUTADA
+                    pendentes.remove(nome)
+
+            # Dispara as etapas prontas (dependências concluídas ou fora da seleção)
+            for nome in list(pendentes):
+                etapa = por_nome[nome]
+                if all(d not in selecionadas or situacao.get(d) in LIBERAM_DEPENDENTES for d in etapa.dependencias):
+                    pool = pools.get(etapa.recurso) or pools.setdefault(
+                        etapa.recurso, ThreadPoolExecutor(max_workers=1)
+                    )
+                    em_execucao[pool.submit(executar, etapa)] = nome
+                    pendentes.remove(nome)
+
+            if not em_execucao:
+                if pendentes:
+                    raise ValueError(f"Dependência circular entre as etapas: {', '.join(pendentes)}")
+                continue
+
+            concluidos, _ = wait(list(em_execucao), return_when=FIRST_COMPLETED)
+            for futuro in concluidos:
+                nome = em_execucao.pop(futuro)
+                erro = futuro.exception()
+                if erro is None:
+                    situacao[nome] = futuro.result()
+                else:
+                    situacao[nome] = FALHOU
+                    print(f"\n❌ Falha na etapa {nome}: {erro}")
+                    traceback.print_exception(type(erro), erro, erro.__traceback__)
+    finally:
+        for pool in pools.values():
+            pool.shutdown(wait=True)
+
+    return situacao
@@ -0,0 +1,142 @@
+import os
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from datetime import date
+
+# Tabela agregada lida pelo painel (poucos milhares de linhas)
+NOME_AGREGADO = "adesao_ctf_cnae_uf"
+
+ESQUEMA_AGREGADO = pa.schema([
+    pa.field("cnae", pa.int32()),
+    pa.field("desc_cnae", pa.string()),
+    pa.field("UF", pa.dictionary(pa.int32(), pa.string())),
+    pa.field("estabelecimentos", pa.int64()),
+    pa.field("estabelecimentos_ctf", pa.int64()),
+    pa.field("adesao_ctf", pa.float64()),
+    pa.field("idade_media_anos", pa.float64()),
+])
+
+
+def _carregar_estabelecimentos(caminho, cnpjs_ctf, data_referencia):
+    """
+    Lê de estabelecimentos.parquet apenas CNPJ, UF e data de início, e devolve arrays NumPy
+    ordenados pelo CNPJ: (cnpj, código da UF, idade em anos, inscrito no CTF), além da lista de UFs.
+    """
+
+    tabela = pq.read_table(caminho, columns=["CNPJ_COMPLETO", "UF", "DATA_INICIO_ATIVIDADE"])
+    tabela = tabela.filter(pc.is_valid(tabela.column("CNPJ_COMPLETO")))
+
+    cnpj = tabela.column("CNPJ_COMPLETO").to_numpy()
+    ordem = np.argsort(cnpj, kind="stable")
+
+    # UF como código inteiro (-1 = sem UF)
+    uf = pc.dictionary_encode(pc.cast(tabela.column("UF"), pa.string())).combine_chunks()
+    codigos_uf = pc.fill_null(uf.indices, -1).to_numpy(zero_copy_only=False)
+    ufs = uf.dictionary.to_pylist()
+
+    # Idade em anos na data de referência (NaN sem data de início)
+    inicio = pc.cast(tabela.column("DATA_INICIO_ATIVIDADE"), pa.int32())
+    dias = pc.subtract(pa.scalar((data_referencia - date(1970, 1, 1)).days, pa.int32()), inicio)
+    idade = pc.divide(pc.cast(dias, pa.float64()), 365.25).to_numpy(zero_copy_only=False)
+
+    ctf = pc.is_in(tabela.column("CNPJ_COMPLETO"), value_set=cnpjs_ctf).to_numpy(zero_copy_only=False)
+
+    return cnpj[ordem], codigos_uf[ordem], idade[ordem], ctf[ordem], ufs
+
+
+def _agregar_lote(lote, cnpj, codigos_uf, idade, ctf):
+    """
+    Cruza um lote (CNPJ_COMPLETO, CNAE) com os estabelecimentos por busca binária
+    e devolve as somas parciais por (CNAE, UF).
+    """
+
+    lote = lote.filter(pc.and_(pc.is_valid(lote.column("CNPJ_COMPLETO")), pc.is_valid(lote.column("CNAE"))))
+    cnpj_lote = lote.column("CNPJ_COMPLETO").to_numpy()
+    cnae_lote = lote.column("CNAE").to_numpy()
+
+    posicoes = np.searchsorted(cnpj, cnpj_lote)
+    posicoes[posicoes == len(cnpj)] = 0
+    encontrados = cnpj[posicoes] == cnpj_lote
+    posicoes = posicoes[encontrados]
+
+    idade_lote = idade[posicoes]
+    com_idade = ~np.isnan(idade_lote)
+    parcial = pd.DataFrame({
+        "cnae": cnae_lote[encontrados],
+        "uf": codigos_uf[posicoes],
+        "estabelecimentos": 1,
+        "estabelecimentos_ctf": ctf[posicoes].astype(np.int64),
+        "soma_idade": np.where(com_idade, idade_lote, 0.0),
+        "com_idade": com_idade.astype(np.int64),
+    })
+    return parcial.groupby(["cnae", "uf"], sort=False).sum()
+
+
+def gerar_agregado_adesao(pasta_parquet, destino=None, data_referencia=None):
+    """
+    Gera a tabela agregada de adesão ao CTF/APP por subclasse CNAE e UF, a partir dos Parquet do painel:
+    - estabelecimentos: quantidade de estabelecimentos ativos com o CNAE (primário ou secundário)
+    - estabelecimentos_ctf: quantos deles estão inscritos no CTF/APP
+    - adesao_ctf: estabelecimentos_ctf / estabelecimentos
+    - idade_media_anos: idade média dos estabelecimentos (DATA_INICIO_ATIVIDADE até 'data_referencia')
+
+    cnae_estabelecimentos.parquet é lido row group a row group e cruzado com os estabelecimentos
+    por busca binária no CNPJ; as somas parciais são consolidadas ao final.
+    Retorna o caminho do arquivo gravado, ou None se faltarem entradas.
+    """
+
+    destino = destino or pasta_parquet
+    data_referencia = data_referencia or date.today()
+
+    caminhos = {
+        nome: os.path.join(pasta_parquet, f"{nome}.parquet")
+        for nome in ("estabelecimentos", "cnae_estabelecimentos", "ctf_empresas", "cnaes")
+    }
+    faltantes = [f"{nome}.parquet" for nome in ("estabelecimentos", "cnae_estabelecimentos", "ctf_empresas")
+                 if not os.path.exists(caminhos[nome])]
+    if faltantes:
+        print(f"⚠️ Arquivos necessários não encontrados: {', '.join(faltantes)}. Agregado não gerado.")
+        return None
+
+    print("📊 Calculando a adesão ao CTF por CNAE e UF...")
+    cnpjs_ctf = pc.unique(pq.read_table(caminhos["ctf_empresas"], columns=["cnpj"]).column("cnpj").combine_chunks())
+    cnpj, codigos_uf, idade, ctf, ufs = _carregar_estabelecimentos(
+        caminhos["estabelecimentos"], cnpjs_ctf, data_referencia
+    )
+
+    arquivo_cnaes = pq.ParquetFile(caminhos["cnae_estabelecimentos"])
+    parciais = [
+        _agregar_lote(arquivo_cnaes.read_row_group(i, columns=["CNPJ_COMPLETO", "CNAE"]),
+                      cnpj, codigos_uf, idade, ctf)
+        for i in range(arquivo_cnaes.num_row_groups)
+    ]
+    if not parciais:
+        print("⚠️ Nenhum CNAE de estabelecimento encontrado. Agregado não gerado.")
+        return None
+
+    agregado = pd.concat(parciais).groupby(level=["cnae", "uf"]).sum().reset_index()
+    agregado["adesao_ctf"] = agregado["estabelecimentos_ctf"] / agregado["estabelecimentos"]
+    agregado["idade_media_anos"] = agregado["soma_idade"] / agregado["com_idade"].replace(0, np.nan)
+    agregado["UF"] = [ufs[c] if c >= 0 else None for c in agregado["uf"]]
+
+    # Descrição oficial da subclasse, quando a tabela de CNAEs estiver disponível
+    if os.path.exists(caminhos["cnaes"]):
+        descricoes = pq.read_table(caminhos["cnaes"], columns=["cnae", "desc_cnae"]).to_pandas()
+        descricoes = descricoes.drop_duplicates("cnae").set_index("cnae")["desc_cnae"]
+        agregado["desc_cnae"] = agregado["cnae"].map(descricoes)
+    else:
+        agregado["desc_cnae"] = None
+
+    agregado = agregado.sort_values(["cnae", "UF"]).reset_index(drop=True)
+    tabela = pa.Table.from_pandas(agregado[ESQUEMA_AGREGADO.names], schema=ESQUEMA_AGREGADO, preserve_index=False)
+
+    os.makedirs(destino, exist_ok=True)
+    caminho_final = os.path.join(destino, f"{NOME_AGREGADO}.parquet")
+    pq.write_table(tabela, caminho_final + ".tmp", compression="snappy")
+    os.replace(caminho_final + ".tmp", caminho_final)
+
+    print(f"✅ Agregado salvo em: {caminho_final} ({len(agregado)} linhas)")
+    return caminho_final
@@ -0,0 +1,241 @@
+import os
+import io
+import sys
+import json
+import time
+import shutil
+import tempfile
+import argparse
+import platform
+import contextlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Base de comparação gravada com --salvar-base (específica da máquina, não versionada)
+ARQUIVO_BASE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_base.json")
+
+# Etapas medidas, na ordem de execução (a exportação lê os CSVs gravados por transform_cnpj_csv)
+ETAPAS = ["transform_cnpj", "transform_cnpj_empresas", "transform_ctf", "transform_cnpj_csv", "exportar_para_parquet"]
+
+
+def _em_processo_novo(funcao, *args):
+    """
+    Executa 'funcao' em um processo novo (spawn) e devolve o resultado.
+    No Linux o pico de RSS é herdado do processo pai; por isso o processo principal não importa
+    pandas/pyarrow nem gera a base sintética ele mesmo, para não contaminar a medição das etapas.
+    """
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+        return executor.submit(funcao, *args).result()
+
+
+def _gerar_base(pasta, linhas, shards):
+    from dados_sinteticos import gerar_base_sintetica
+    gerar_base_sintetica(pasta, linhas, shards=shards)
+
+
+def _tamanho(caminhos):
+    """Soma o tamanho, em bytes, de arquivos e pastas."""
+    total = 0
+    for caminho in caminhos:
+        if os.path.isdir(caminho):
+            total += sum(os.path.getsize(os.path.join(raiz, f)) for raiz, _, arquivos in os.walk(caminho)
+                         for f in arquivos)
+        elif os.path.exists(caminho):
+            total += os.path.getsize(caminho)
+    return total
+
+
+def _linhas_parquet(pasta, nomes):
+    """Soma as linhas dos Parquet indicados (lidas dos metadados, sem ler os dados)."""
+    import pyarrow.parquet as pq
+    return sum(pq.ParquetFile(os.path.join(pasta, f"{nome}.parquet")).metadata.num_rows for nome in nomes)
+
+
+def _pico_rss_mb():
+    """Pico de memória residente do processo (e dos seus filhos), em MB; None se indisponível."""
+    if resource is not None:
+        pico = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                   resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+        # ru_maxrss vem em bytes no macOS e em KB nos demais
+        return pico / (1024 * 1024) if sys.platform == "darwin" else pico / 1024
+    try:
+        import psutil
+        return psutil.Process().memory_info().peak_wset / (1024 * 1024)
+    except (ImportError, AttributeError):
+        return None
+
+
+def _executar_etapa(etapa, pasta, motor, processos):
+    """
+    Executa uma etapa sobre a base sintética de 'pasta' e devolve (linhas lidas, bytes lidos, segundos, pico RSS).
+    Roda em um processo novo, para que o pico de memória seja só o da etapa.
+    """
+
+    from transform_cnpj_estabelecimentos import transform_cnpj
+    from transform_cnpj_empresas import transform_cnpj_empresas
+    from transform_ctf import transform_ctf
+    from export_to_parquet import exportar_para_parquet
+
+    saida = os.path.join(pasta, "saida", etapa)
+    shutil.rmtree(saida, ignore_errors=True)
+    os.makedirs(saida)
+    csv_estabelecimentos = os.path.join(pasta, "saida", "transform_cnpj_csv")
+
+    etapas = {
+        "transform_cnpj": (
+            [os.path.join(pasta, "estab")],
+            lambda: transform_cnpj(os.path.join(pasta, "estab"), saida, motor=motor, processos=processos,
+                                   formatos=("parquet",), caminho_parquet=saida),
+        ),
+        "transform_cnpj_empresas": (
+            [os.path.join(pasta, "empresas")],
+            lambda: transform_cnpj_empresas(os.path.join(pasta, "empresas"), saida, motor=motor, processos=processos,
+                                            formatos=("parquet",), caminho_parquet=saida),
+        ),
+        "transform_ctf": (
+            [os.path.join(pasta, "ctf")],
+            lambda: transform_ctf(os.path.join(pasta, "ctf"), saida, motor=motor,
+                                  formatos=("parquet",), caminho_parquet=saida),
+        ),
+        "transform_cnpj_csv": (
+            [os.path.join(pasta, "estab")],
+            lambda: transform_cnpj(os.path.join(pasta, "estab"), saida, motor=motor, processos=processos),
+        ),
+        "exportar_para_parquet": (
+            [os.path.join(csv_estabelecimentos, f) for f in ("estabelecimentos.csv", "cnae_estabelecimentos.csv")],
+            lambda: exportar_para_parquet(csv_estabelecimentos, saida),
+        ),
+    }
+    entradas, funcao = etapas[etapa]
+
+    # As mensagens das transformações não interessam aqui
+    inicio = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        funcao()
+    segundos = time.perf_counter() - inicio
+
+    if etapa == "exportar_para_parquet":
+        linhas = _linhas_parquet(saida, ["estabelecimentos", "cnae_estabelecimentos"])
+    else:
+        linhas = None  # preenchido pelo chamador com o tamanho da base gerada
+    return linhas, _tamanho(entradas), segundos, _pico_rss_mb()
+
+
+def medir(pasta, linhas_por_fonte, motor="pandas", processos=1, repeticoes=1):
+    """
+    Mede cada etapa de ETAPAS sobre a base sintética de 'pasta' e devolve, por etapa,
+    linhas/s, MB/s (dos arquivos de entrada) e pico de RSS em MB. Com 'repeticoes' > 1,
+    vale a execução mais rápida e o maior pico de memória.
+    """
+
+    resultados = {}
+    for etapa in ETAPAS:
+        execucoes = [_em_processo_novo(_executar_etapa, etapa, pasta, motor, processos) for _ in range(repeticoes)]
+
+        linhas, tamanho, _, _ = execucoes[0]
+        linhas = linhas if linhas is not None else linhas_por_fonte[etapa]
+        segundos = min(e[2] for e in execucoes)
+        picos = [e[3] for e in execucoes if e[3] is not None]
+        resultados[etapa] = {
+            "linhas": linhas,
+            "mb": round(tamanho / (1024 * 1024), 2),
+            "segundos": round(segundos, 3),
+            "linhas_s": round(linhas / segundos, 1),
+            "mb_s": round(tamanho / (1024 * 1024) / segundos, 2),
+            "rss_mb": round(max(picos), 1) if picos else None,
+        }
+        r = resultados[etapa]
+        print(f"   {etapa:<24} {r['segundos']:>8.2f} s {r['linhas_s']:>12,.0f} linhas/s "
+              f"{r['mb_s']:>8.1f} MB/s {r['rss_mb'] if r['rss_mb'] is not None else '-':>8} MB RSS")
+    return resultados
+
+
+def comparar_com_base(resultados, base, tolerancia):
+    """
+    Compara os resultados com a base gravada e devolve a lista de regressões:
+    vazão (linhas/s) abaixo de base * (1 - tolerancia) ou pico de RSS acima de base * (1 + tolerancia).
+    """
+
+    regressoes = []
+    for etapa, atual in resultados.items():
+        anterior = base.get(etapa)
+        if anterior is None:
+            continue
+        if atual["linhas_s"] < anterior["linhas_s"] * (1 - tolerancia):
+            regressoes.append(f"{etapa}: {atual['linhas_s']:,.0f} linhas/s (base {anterior['linhas_s']:,.0f})")
+        if atual["rss_mb"] and anterior.get("rss_mb") and atual["rss_mb"] > anterior["rss_mb"] * (1 + tolerancia):
+            regressoes.append(f"{etapa}: {atual['rss_mb']} MB de RSS (base {anterior['rss_mb']} MB)")
+    return regressoes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Mede vazão e memória das transformações sobre uma base sintética e compara com a base gravada."
+    )
+    parser.add_argument("--linhas", type=int, default=200_000, help="estabelecimentos gerados (padrão: 200000)")
+    parser.add_argument("--shards", type=int, default=2, help="arquivos por fonte da Receita (padrão: 2)")
+    parser.add_argument("--motor", choices=["pandas", "pyarrow"], default="pandas")
+    parser.add_argument("--processos", type=int, default=1)
+    parser.add_argument("--repeticoes", type=int, default=1, help="execuções por etapa (vale a mais rápida)")
+    parser.add_argument("--pasta", default=None, help="pasta de trabalho (padrão: temporária, removida ao final)")
+    parser.add_argument("--base", default=ARQUIVO_BASE, help="arquivo JSON da base de comparação")
+    parser.add_argument("--salvar-base", action="store_true", help="grava os resultados como nova base")
+    parser.add_argument("--tolerancia", type=float, default=0.20, help="regressão tolerada (padrão: 0.20 = 20%%)")
+    argumentos = parser.parse_args(argv)
+
+    configuracao = {
+        "linhas": argumentos.linhas, "shards": argumentos.shards,
+        "motor": argumentos.motor, "processos": argumentos.processos,
+    }
+    pasta = argumentos.pasta or tempfile.mkdtemp(prefix="benchmark_ctf_")
+    try:
+        print(f"🧪 Gerando base sintética com {argumentos.linhas} estabelecimentos em {pasta}...")
+        _em_processo_novo(_gerar_base, pasta, argumentos.linhas, argumentos.shards)
+        linhas_por_fonte = {
+            "transform_cnpj": argumentos.linhas,
+            "transform_cnpj_empresas": max(1, argumentos.linhas // 2),
+            "transform_ctf": max(1, argumentos.linhas // 20),
+            "transform_cnpj_csv": argumentos.linhas,
+        }
+
+        print(f"⏱️ Medindo as transformações (motor {argumentos.motor}, {argumentos.processos} processo(s))...")
+        resultados = medir(pasta, linhas_por_fonte, argumentos.motor, argumentos.processos, argumentos.repeticoes)
+    finally:
+        if argumentos.pasta is None:
+            shutil.rmtree(pasta, ignore_errors=True)
+
+    if argumentos.salvar_base:
+        with open(argumentos.base, "w", encoding="utf-8") as f:
+            json.dump({"configuracao": configuracao, "maquina": platform.node(), "etapas": resultados},
+                      f, ensure_ascii=False, indent=2)
+        print(f"💾 Base gravada em: {argumentos.base}")
+        return 0
+
+    if not os.path.exists(argumentos.base):
+        print("ℹ️ Nenhuma base gravada; use --salvar-base para criar uma.")
+        return 0
+
+    with open(argumentos.base, encoding="utf-8") as f:
+        base = json.load(f)
+    if base.get("configuracao") != configuracao:
+        print(f"⚠️ A base foi gravada com outra configuração ({base.get('configuracao')}); comparação ignorada.")
+        return 0
+
+    regressoes = comparar_com_base(resultados, base["etapas"], argumentos.tolerancia)
+    if regressoes:
+        print(f"❌ Regressão acima de {argumentos.tolerancia:.0%} em relação à base:")
+        for regressao in regressoes:
+            print(f"   - {regressao}")
+        return 1
+
+    print(f"✅ Nenhuma regressão acima de {argumentos.tolerancia:.0%} em relação à base.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,273 @@
+import os
+import json
+import shutil
+import argparse
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+from datetime import datetime
+
+# Diretório do projeto e pastas padrão (as mesmas do run.py)
+dir_atual = os.path.dirname(os.path.abspath(__file__))
+PASTA_PARQUET = os.path.join(dir_atual, 'Dados Painel Parquet')
+PASTA_INDICE_BUSCA = os.path.join(dir_atual, 'Indice Busca Textual')
+
+# Campos pesquisáveis: campo -> (tabela de saída, coluna chave)
+CAMPOS_BUSCA = {
+    "desc_cnae": ("cnaes", "cnae"),
+    "razao_social": ("dados_empresa", "cnpj_basico"),
+    "NOME_FANTASIA": ("estabelecimentos", "CNPJ_COMPLETO"),
+}
+
+# Alfabeto após a normalização: espaço, a-z e 0-9 (37 símbolos -> 37³ trigramas possíveis)
+_ALFABETO = " abcdefghijklmnopqrstuvwxyz0123456789"
+_SIMBOLO = np.zeros(256, dtype=np.int64)
+_SIMBOLO[np.frombuffer(_ALFABETO.encode("ascii"), dtype=np.uint8)] = np.arange(len(_ALFABETO))
+TOTAL_TRIGRAMAS = len(_ALFABETO) ** 3
+
+# Textos normalizados por lote na construção do índice
+LINHAS_POR_LOTE = 250_000
+
+
+def normalizar(textos):
+    """
+    Normaliza textos (pa.Array) para a busca: sem acentos, minúsculas, apenas letras e dígitos
+    separados por um espaço, com um espaço nas pontas ("Fabricação de Tintas" -> " fabricacao de tintas ").
+    """
+
+    textos = pc.utf8_normalize(textos, "NFKD")
+    textos = pc.replace_substring_regex(textos, r"\p{Mn}+", "")
+    textos = pc.utf8_lower(textos)
+    textos = pc.replace_substring_regex(textos, r"[^a-z0-9]+", " ")
+    textos = pc.utf8_trim(textos, " ")
+    return pc.binary_join_element_wise(" ", textos, " ", "")
+
+
+def _trigramas(normalizados):
+    """
+    Extrai os trigramas distintos de cada texto normalizado.
+    Retorna (trigrama, posição do texto), ordenados por trigrama e posição, e a quantidade de trigramas por texto.
+    """
+
+    if isinstance(normalizados, pa.ChunkedArray):
+        normalizados = normalizados.combine_chunks()
+    if len(normalizados) == 0:
+        vazio = np.zeros(0, dtype=np.int64)
+        return vazio, vazio, vazio
+
+    deslocamentos = np.frombuffer(normalizados.buffers()[1], dtype=np.int32)
+    deslocamentos = deslocamentos[normalizados.offset:normalizados.offset + len(normalizados) + 1].astype(np.int64)
+    dados = np.frombuffer(normalizados.buffers()[2], dtype=np.uint8)[deslocamentos[0]:deslocamentos[-1]]
+    deslocamentos -= deslocamentos[0]
+
+    simbolos = _SIMBOLO[dados]
+    textos = len(normalizados)
+    texto_da_posicao = np.repeat(np.arange(textos, dtype=np.int64), np.diff(deslocamentos))
+    inicio = np.flatnonzero(np.arange(len(simbolos)) + 2 < deslocamentos[1:][texto_da_posicao])
+
+    trigramas = simbolos[inicio] * len(_ALFABETO) ** 2 + simbolos[inicio + 1] * len(_ALFABETO) + simbolos[inicio + 2]
+    pares = np.unique(trigramas * textos + texto_da_posicao[inicio])
+    trigramas, posicoes = pares // textos, pares % textos
+    return trigramas, posicoes, np.bincount(posicoes, minlength=textos)
+
+
+def _lotes_da_fonte(caminho, coluna_chave, coluna_texto):
+    """Lê (chave, texto) da tabela Parquet em lotes, descartando textos vazios."""
+    arquivo = pq.ParquetFile(caminho)
+    for lote in arquivo.iter_batches(batch_size=LINHAS_POR_LOTE, columns=[coluna_chave, coluna_texto]):
+        texto = pc.cast(lote.column(1), pa.string())
+        validos = pc.and_(pc.is_valid(texto), pc.not_equal(pc.utf8_trim_whitespace(texto), ""))
+        yield pa.table({"chave": lote.column(0), "texto": texto}).filter(validos)
+
+
+def construir_indice_campo(caminho_parquet, coluna_chave, coluna_texto, pasta_indice):
+    """
+    Constrói o índice invertido de trigramas de uma coluna de texto, em duas passadas:
+    1. grava os textos (textos.arrow) e conta as ocorrências de cada trigrama
+    2. preenche as listas de documentos de cada trigrama (ordenadas) em um arquivo mapeado em memória
+
+    Só um lote de LINHAS_POR_LOTE textos fica em memória por vez.
+    """
+
+    os.makedirs(pasta_indice, exist_ok=True)
+    caminho_textos = os.path.join(pasta_indice, "textos.arrow")
+    contagem = np.zeros(TOTAL_TRIGRAMAS, dtype=np.int64)
+    qtd_trigramas = []
+
+    escritor = None
+    for lote in _lotes_da_fonte(caminho_parquet, coluna_chave, coluna_texto):
+        if lote.num_rows == 0:
+            continue
+        if escritor is None:
+            escritor = ipc.new_file(caminho_textos, lote.schema)
+        escritor.write_table(lote)
+        trigramas, _, por_texto = _trigramas(normalizar(lote.column("texto").combine_chunks()))
+        contagem += np.bincount(trigramas, minlength=TOTAL_TRIGRAMAS)
+        qtd_trigramas.append(por_texto.astype(np.int16))
+    if escritor is None:
+        return 0
+    escritor.close()
+
+    inicios = np.concatenate([[0], np.cumsum(contagem)]).astype(np.int64)
+    documentos = np.lib.format.open_memmap(
+        os.path.join(pasta_indice, "trigramas_documentos.npy"), mode="w+", dtype=np.int32, shape=(int(inicios[-1]),)
+    )
+    cursor = inicios[:-1].copy()
+    base = 0
+    with pa.memory_map(caminho_textos) as origem:
+        textos = ipc.open_file(origem).read_all().column("texto")
+        for fatia in range(0, len(textos), LINHAS_POR_LOTE):
+            lote = textos.slice(fatia, LINHAS_POR_LOTE).combine_chunks()
+            trigramas, posicoes, _ = _trigramas(normalizar(lote))
+            por_trigrama = np.bincount(trigramas, minlength=TOTAL_TRIGRAMAS)
+            ordem_no_grupo = np.arange(len(trigramas)) - (np.cumsum(por_trigrama) - por_trigrama)[trigramas]
+            documentos[cursor[trigramas] + ordem_no_grupo] = posicoes + base
+            cursor += por_trigrama
+            base += len(lote)
+    documentos.flush()
+    del documentos
+
+    np.save(os.path.join(pasta_indice, "trigramas_inicios.npy"), inicios)
+    np.save(os.path.join(pasta_indice, "documentos_trigramas.npy"), np.concatenate(qtd_trigramas))
+    return base
+
+
+def construir_indices_busca(pasta_parquet=PASTA_PARQUET, pasta_indice=PASTA_INDICE_BUSCA, campos=None):
+    """
+    Constrói o índice de busca textual de cada campo (desc_cnae, razao_social e NOME_FANTASIA)
+    a partir dos Parquet do painel. Cada índice é montado em pasta temporária e substitui o anterior ao término.
+    """
+
+    for campo in campos or CAMPOS_BUSCA:
+        tabela, coluna_chave = CAMPOS_BUSCA[campo]
+        origem = os.path.join(pasta_parquet, f"{tabela}.parquet")
+        if not os.path.exists(origem):
+            print(f"⚠️ {tabela}.parquet não encontrado. Índice de '{campo}' não construído.")
+            continue
+
+        print(f"🔤 Indexando {campo} ({tabela}.parquet)...")
+        destino = os.path.join(pasta_indice, campo)
+        temporario = destino + ".tmp"
+        shutil.rmtree(temporario, ignore_errors=True)
+        documentos = construir_indice_campo(origem, coluna_chave, campo, temporario)
+        if documentos == 0:
+            shutil.rmtree(temporario, ignore_errors=True)
+            print(f"⚠️ Nenhum texto em '{campo}'. Índice não construído.")
+            continue
+        with open(os.path.join(temporario, "indice.json"), "w", encoding="utf-8") as f:
+            json.dump({"criado_em": datetime.now().isoformat(timespec="seconds"), "campo": campo,
+                       "tabela": tabela, "chave": coluna_chave, "documentos": documentos}, f, indent=2)
+
+        shutil.rmtree(destino, ignore_errors=True)
+        os.replace(temporario, destino)
+        print(f"   ➡️ {documentos} textos indexados em: {destino}")
+
+
+class IndiceTextual:
+    """
+    Índice de trigramas de um campo, aberto por mapeamento em memória.
+
+    A busca é insensível a acentos e maiúsculas. A pontuação de cada documento é a fração
+    dos trigramas da consulta que ele contém; os empates são desfeitos pela similaridade de Jaccard,
+    que favorece os textos mais próximos do tamanho da consulta.
+    """
+
+    def __init__(self, pasta):
+        self.pasta = pasta
+        self.inicios = np.load(os.path.join(pasta, "trigramas_inicios.npy"), mmap_mode="r")
+        self.documentos = np.load(os.path.join(pasta, "trigramas_documentos.npy"), mmap_mode="r")
+        self.qtd_trigramas = np.load(os.path.join(pasta, "documentos_trigramas.npy"), mmap_mode="r")
+        self._mapa = pa.memory_map(os.path.join(pasta, "textos.arrow"))
+        self.textos = ipc.open_file(self._mapa).read_all()
+
+    def _lista(self, trigrama):
+        return self.documentos[self.inicios[trigrama]:self.inicios[trigrama + 1]]
+
+    def buscar(self, consulta, limite=10, similaridade_minima=0.5):
+        """
+        Retorna até 'limite' resultados [{"chave", "texto", "pontuacao"}], do mais ao menos relevante.
+        Só entram documentos que contêm ao menos 'similaridade_minima' dos trigramas da consulta.
+        """
+
+        # Sem o espaço final, a última palavra da consulta também casa como prefixo ("tinta" -> "tintas")
+        normalizada = pc.utf8_slice_codeunits(normalizar(pa.array([consulta], pa.string())), 0, -1)
+        trigramas, _, _ = _trigramas(normalizada)
+        if len(trigramas) == 0:
+            return []
+
+        # Candidatos: pelo princípio da casa dos pombos, quem tem a fração mínima dos trigramas
+        # contém ao menos um dos (n - necessários + 1) trigramas mais raros
+        tamanhos = np.asarray(self.inicios[trigramas + 1]) - np.asarray(self.inicios[trigramas])
+        trigramas = trigramas[np.argsort(tamanhos, kind="stable")]
+        necessarios = max(1, int(np.ceil(similaridade_minima * len(trigramas))))
+        candidatos = np.unique(np.concatenate(
+            [np.asarray(self._lista(t)) for t in trigramas[:len(trigramas) - necessarios + 1]]
+        ))
+        if len(candidatos) == 0:
+            return []
+
+        acertos = np.zeros(len(candidatos), dtype=np.int64)
+        for trigrama in trigramas:
+            lista = self._lista(trigrama)
+            if len(lista):
+                posicoes = np.minimum(np.searchsorted(lista, candidatos), len(lista) - 1)
+                acertos += np.asarray(lista[posicoes]) == candidatos
+
+        cobertura = acertos / len(trigramas)
+        selecionados = cobertura >= similaridade_minima
+        candidatos, acertos, cobertura = candidatos[selecionados], acertos[selecionados], cobertura[selecionados]
+        jaccard = acertos / (len(trigramas) + np.asarray(self.qtd_trigramas[candidatos]) - acertos)
+
+        melhores = np.lexsort((-jaccard, -cobertura))[:limite]
+        linhas = self.textos.take(pa.array(candidatos[melhores])).to_pylist()
+        return [
+            {"chave": linha["chave"], "texto": linha["texto"], "pontuacao": round(float(cobertura[i]), 4)}
+            for linha, i in zip(linhas, melhores)
+        ]
+
+
+def abrir_indices_busca(pasta_indice=PASTA_INDICE_BUSCA):
+    """Abre os índices de busca disponíveis, em um dicionário {campo: IndiceTextual}."""
+    return {
+        campo: IndiceTextual(os.path.join(pasta_indice, campo))
+        for campo in CAMPOS_BUSCA
+        if os.path.exists(os.path.join(pasta_indice, campo, "indice.json"))
+    }
+
+
+def ler_argumentos():
+    parser = argparse.ArgumentParser(description="Busca textual (sem acentos) em descrições de CNAE e nomes de empresas.")
+    parser.add_argument("consulta", nargs="?", help='texto procurado (ex: "fabricação de tintas")')
+    parser.add_argument("--campo", choices=list(CAMPOS_BUSCA), default="desc_cnae", help="campo pesquisado")
+    parser.add_argument("--limite", type=int, default=10, help="quantidade máxima de resultados")
+    parser.add_argument("--similaridade", type=float, default=0.5,
+                        help="fração mínima dos trigramas da consulta presentes no resultado (0 a 1)")
+    parser.add_argument("--construir", action="store_true", help="(re)constrói os índices antes de buscar")
+    parser.add_argument("--parquet", default=PASTA_PARQUET, help="pasta dos Parquet do painel")
+    parser.add_argument("--indice", default=PASTA_INDICE_BUSCA, help="pasta dos índices de busca")
+    argumentos = parser.parse_args()
+    if not argumentos.consulta and not argumentos.construir:
+        parser.error("informe o texto procurado ou --construir")
+    return argumentos
+
+
+if __name__ == "__main__":
+    argumentos = ler_argumentos()
+
+    if argumentos.construir:
+        construir_indices_busca(argumentos.parquet, argumentos.indice)
+
+    if argumentos.consulta:
+        indices = abrir_indices_busca(argumentos.indice)
+        if argumentos.campo not in indices:
+            raise SystemExit(f"❌ Índice de '{argumentos.campo}' não encontrado em {argumentos.indice}. Use --construir.")
+
+        inicio = datetime.now()
+        resultados = indices[argumentos.campo].buscar(argumentos.consulta, argumentos.limite, argumentos.similaridade)
+        duracao_ms = (datetime.now() - inicio).total_seconds() * 1000
+
+        print(f"\n🔎 \"{argumentos.consulta}\" em {argumentos.campo}: {len(resultados)} resultado(s) em {duracao_ms:.1f} ms")
+        for resultado in resultados:
+            print(f"   {resultado['pontuacao']:.0%}  {resultado['chave']}  {resultado['texto']}")
@@ -0,0 +1,88 @@
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# Chave compacta do CNPJ: os 14 dígitos como int64 (básico * 10^6 + ordem * 10^2 + DV).
+# As saídas em Parquet e os cruzamentos entre Receita e CTF usam sempre esta chave.
+
+# Pesos do cálculo dos dígitos verificadores (módulo 11), do dígito mais à esquerda para o mais à direita
+PESOS_DV1 = np.array([5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2])
+PESOS_DV2 = np.array([6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2])
+
+
+def _texto(valores):
+    """Coluna de texto como pa.Array (aceita Series do pandas, listas, Array e ChunkedArray)."""
+    if isinstance(valores, pa.ChunkedArray):
+        return valores.combine_chunks()
+    if not isinstance(valores, pa.Array):
+        valores = pa.array(valores, type=pa.string(), from_pandas=True)
+        return valores.combine_chunks() if isinstance(valores, pa.ChunkedArray) else valores
+    return valores
+
+
+def _inteiros(texto, digitos):
+    """Converte texto com até 'digitos' dígitos (sem pontuação) em int64; os demais valores viram nulos."""
+    validos = pc.match_substring_regex(texto, rf"^\d{{1,{digitos}}}$")
+    return pc.cast(pc.if_else(validos, texto, pa.scalar(None, texto.type)), pa.int64())
+
+
+def somente_digitos(texto):
+    """Remove a pontuação (ex: "00.024.116/0001-85" -> "00024116000185"), de forma vetorizada."""
+    return pc.replace_substring_regex(_texto(texto), r"\D", "")
+
+
+def cnpj_int64(texto, digitos=14):
+    """
+    Converte CNPJs em texto, com ou sem pontuação e zeros à esquerda, na chave int64.
+    Com 'digitos' = 8, converte CNPJs básicos. Valores vazios ou fora do formato viram nulos.
+    """
+    return _inteiros(somente_digitos(texto), digitos)
+
+
+def compor_cnpj(basico, ordem, dv):
+    """
+    Monta a chave int64 a partir das três partes do layout da Receita (texto), sem concatenar strings.
+    Linhas com alguma parte vazia ou fora do formato ficam nulas.
+    """
+    chave = pc.multiply(_inteiros(_texto(basico), 8), 1_000_000)
+    chave = pc.add(chave, pc.multiply(_inteiros(_texto(ordem), 4), 100))
+    return pc.add(chave, _inteiros(_texto(dv), 2))
+
+
+def _soma_ponderada(base, pesos):
+    """Soma dos dígitos de 'base' (int64, len(pesos) dígitos) multiplicados pelos pesos, sem matriz de dígitos."""
+    soma = np.zeros(len(base), dtype=np.int64)
+    for posicao, peso in enumerate(pesos[::-1]):
+        soma += (base // 10 ** posicao) % 10 * peso
+    return soma
+
+
+def digitos_verificadores(cnpj_basico, cnpj_ordem):
+    """
+    Calcula os dois dígitos verificadores (como um número de 0 a 99) a partir de arrays inteiros
+    de CNPJ básico e ordem, de forma vetorizada.
+    """
+
+    base = np.asarray(cnpj_basico, dtype=np.int64) * 10_000 + np.asarray(cnpj_ordem, dtype=np.int64)
+    resto = _soma_ponderada(base, PESOS_DV1) % 11
+    dv1 = np.where(resto < 2, 0, 11 - resto)
+    resto = _soma_ponderada(base * 10 + dv1, PESOS_DV2) % 11
+    dv2 = np.where(resto < 2, 0, 11 - resto)
+    return dv1 * 10 + dv2
+
+
+def cnpj_valido(chave):
+    """
+    Indica, para cada chave int64 (array numpy ou Arrow), se os dígitos verificadores conferem.
+    Chaves nulas são inválidas.
+    """
+
+    if isinstance(chave, (pa.Array, pa.ChunkedArray)):
+        nulos = pc.is_null(chave).to_numpy(zero_copy_only=False)
+        chave = pc.fill_null(chave, 0).to_numpy()
+    else:
+        chave = np.asarray(chave, dtype=np.int64)
+        nulos = np.zeros(len(chave), dtype=bool)
+
+    dv = digitos_verificadores(chave // 1_000_000, chave // 100 % 10_000)
+    return (dv == chave % 100) & (chave > 0) & ~nulos
@@ -0,0 +1,239 @@
+import os
+import re
+import json
+import shutil
+import argparse
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from datetime import datetime
+
+# Diretório do projeto e pastas padrão (as mesmas do run.py)
+dir_atual = os.path.dirname(os.path.abspath(__file__))
+PASTA_PARQUET = os.path.join(dir_atual, 'Dados Painel Parquet')
+PASTA_INDICE = os.path.join(dir_atual, 'Indice Consulta CTF')
+
+# Arquivos do índice (arrays NumPy, abertos por mapeamento em memória)
+ARQUIVOS_INDICE = {
+    "cnae_codigos": "cnae_codigos.npy",            # int32: CNAEs distintos, em ordem
+    "cnae_inicios": "cnae_inicios.npy",            # int64: início de cada CNAE em cnae_cnpjs (+ fim)
+    "cnae_cnpjs": "cnae_cnpjs.npy",                # int64: CNPJs agrupados por CNAE, ordenados
+    "estab_cnpjs": "estab_cnpjs.npy",              # int64: CNPJs dos estabelecimentos, ordenados
+    "estab_uf": "estab_uf.npy",                    # int8: código da UF de cada estabelecimento (-1 = sem UF)
+    "ctf_cnpjs": "ctf_cnpjs.npy",                  # int64: CNPJs inscritos no CTF, ordenados e sem repetição
+    "ctf_categorias": "ctf_categorias.npy",        # int32: categorias CTF distintas, em ordem
+    "ctf_inicios": "ctf_inicios.npy",              # int64: início de cada categoria em ctf_cnpjs_categoria (+ fim)
+    "ctf_cnpjs_categoria": "ctf_cnpjs_categoria.npy",  # int64: CNPJs agrupados por categoria, ordenados
+}
+ARQUIVO_METADADOS = "indice.json"
+
+
+def codigo_cnae(texto):
+    """
+    Converte um código CNAE em qualquer formatação ("2222-6/00", "2222600") no inteiro usado nas saídas.
+    """
+
+    digitos = re.sub(r"\D", "", str(texto))
+    if not digitos or len(digitos) > 7:
+        raise ValueError(f"Código CNAE inválido: {texto}")
+    return int(digitos)
+
+
+def _agrupar(chaves, valores):
+    """
+    Ordena os pares (chave, valor) e devolve (chaves distintas, inícios dos grupos + fim, valores agrupados).
+    Dentro de cada grupo, os valores ficam em ordem crescente e sem repetição.
+    """
+
+    ordem = np.lexsort((valores, chaves))
+    chaves = chaves[ordem]
+    valores = valores[ordem]
+
+    distintos = np.ones(len(chaves), dtype=bool)
+    distintos[1:] = (chaves[1:] != chaves[:-1]) | (valores[1:] != valores[:-1])
+    chaves = chaves[distintos]
+    valores = valores[distintos]
+
+    codigos, inicios = np.unique(chaves, return_index=True)
+    return codigos, np.append(inicios, len(chaves)).astype(np.int64), valores
+
+
+def construir_indice(pasta_parquet=PASTA_PARQUET, pasta_indice=PASTA_INDICE):
+    """
+    Constrói o índice de consulta a partir dos Parquet do painel:
+    - CNAE -> CNPJs dos estabelecimentos ativos com o CNAE (primário ou secundário)
+    - CNPJ -> UF do estabelecimento
+    - CNPJs inscritos no CTF, no geral e por categoria
+
+    O índice é montado em uma pasta temporária, que substitui 'pasta_indice' ao término.
+    """
+
+    print(f"🧭 Construindo índice de consulta a partir de: {pasta_parquet}")
+    temporario = pasta_indice + ".tmp"
+    shutil.rmtree(temporario, ignore_errors=True)
+    os.makedirs(temporario)
+
+    def salvar(nome, array):
+        np.save(os.path.join(temporario, ARQUIVOS_INDICE[nome]), np.ascontiguousarray(array))
+
+    # CNAE -> CNPJs
+    cnaes = pq.read_table(os.path.join(pasta_parquet, "cnae_estabelecimentos.parquet"),
+                          columns=["CNPJ_COMPLETO", "CNAE"])
+    cnaes = cnaes.filter(pc.and_(pc.is_valid(cnaes.column("CNPJ_COMPLETO")), pc.is_valid(cnaes.column("CNAE"))))
+    codigos, inicios, cnpjs = _agrupar(cnaes.column("CNAE").to_numpy(), cnaes.column("CNPJ_COMPLETO").to_numpy())
+    salvar("cnae_codigos", codigos.astype(np.int32))
+    salvar("cnae_inicios", inicios)
+    salvar("cnae_cnpjs", cnpjs)
+    del cnaes, codigos, inicios, cnpjs
+
+    # CNPJ -> UF
+    estab = pq.read_table(os.path.join(pasta_parquet, "estabelecimentos.parquet"), columns=["CNPJ_COMPLETO", "UF"])
+    estab = estab.filter(pc.is_valid(estab.column("CNPJ_COMPLETO")))
+    uf = pc.dictionary_encode(pc.cast(estab.column("UF"), pa.string())).combine_chunks()
+    cnpjs = estab.column("CNPJ_COMPLETO").to_numpy()
+    ordem = np.argsort(cnpjs, kind="stable")
+    salvar("estab_cnpjs", cnpjs[ordem])
+    salvar("estab_uf", pc.fill_null(uf.indices, -1).to_numpy(zero_copy_only=False).astype(np.int8)[ordem])
+    ufs = uf.dictionary.to_pylist()
+    total_estabelecimentos = len(cnpjs)
+    del estab, cnpjs, ordem
+
+    # CTF: inscritos e inscritos por categoria (parte do código "categoria-atividade" antes do hífen)
+    ctf = pq.read_table(os.path.join(pasta_parquet, "ctf_empresas.parquet"), columns=["cnpj", "ctf"])
+    ctf = ctf.filter(pc.is_valid(ctf.column("cnpj")))
+    salvar("ctf_cnpjs", np.unique(ctf.column("cnpj").to_numpy()))
+    categoria = pc.extract_regex(pc.cast(ctf.column("ctf"), pa.string()).combine_chunks(), r"^(?P<categoria>\d+)-")
+    categoria = categoria.field("categoria")
+    ctf = ctf.append_column("categoria", pc.cast(categoria, pa.int32()))
+    ctf = ctf.filter(pc.is_valid(ctf.column("categoria")))
+    codigos, inicios, cnpjs = _agrupar(ctf.column("categoria").to_numpy(), ctf.column("cnpj").to_numpy())
+    salvar("ctf_categorias", codigos.astype(np.int32))
+    salvar("ctf_inicios", inicios)
+    salvar("ctf_cnpjs_categoria", cnpjs)
+
+    metadados = {
+        "criado_em": datetime.now().isoformat(timespec="seconds"),
+        "origem": os.path.abspath(pasta_parquet),
+        "ufs": ufs,
+        "estabelecimentos": total_estabelecimentos,
+    }
+    with open(os.path.join(temporario, ARQUIVO_METADADOS), "w", encoding="utf-8") as f:
+        json.dump(metadados, f, ensure_ascii=False, indent=2)
+
+    shutil.rmtree(pasta_indice, ignore_errors=True)
+    os.replace(temporario, pasta_indice)
+    print(f"✅ Índice salvo em: {pasta_indice}")
+
+
+class IndiceConsulta:
+    """
+    Índice de consulta aberto por mapeamento em memória (np.load com mmap_mode="r"):
+    só as páginas tocadas por uma consulta são lidas do disco.
+    """
+
+    def __init__(self, pasta_indice=PASTA_INDICE):
+        if not os.path.exists(os.path.join(pasta_indice, ARQUIVO_METADADOS)):
+            raise FileNotFoundError(f"Índice não encontrado em {pasta_indice}. Construa-o com --construir.")
+
+        with open(os.path.join(pasta_indice, ARQUIVO_METADADOS), encoding="utf-8") as f:
+            self.metadados = json.load(f)
+        self.ufs = self.metadados["ufs"]
+        for nome, arquivo in ARQUIVOS_INDICE.items():
+            setattr(self, nome, np.load(os.path.join(pasta_indice, arquivo), mmap_mode="r"))
+
+    def _grupo(self, codigos, inicios, valores, codigo):
+        """Fatia de 'valores' correspondente ao código (vazia se o código não existir)."""
+        posicao = np.searchsorted(codigos, codigo)
+        if posicao == len(codigos) or codigos[posicao] != codigo:
+            return valores[:0]
+        return valores[inicios[posicao]:inicios[posicao + 1]]
+
+    @staticmethod
+    def _contidos(ordenados, cnpjs):
+        """Máscara dos 'cnpjs' presentes no array ordenado 'ordenados' (busca binária)."""
+        if len(ordenados) == 0:
+            return np.zeros(len(cnpjs), dtype=bool)
+        posicoes = np.minimum(np.searchsorted(ordenados, cnpjs), len(ordenados) - 1)
+        return np.asarray(ordenados[posicoes]) == cnpjs
+
+    def consultar(self, cnae, uf=None, categoria=None):
+        """
+        Retorna um dicionário com os estabelecimentos ativos do CNAE (opcionalmente filtrados por UF)
+        e os inscritos no CTF (opcionalmente, apenas na categoria CTF informada).
+        """
+
+        cnpjs = np.asarray(self._grupo(self.cnae_codigos, self.cnae_inicios, self.cnae_cnpjs, codigo_cnae(cnae)))
+
+        if uf is not None:
+            uf = uf.upper()
+            if uf not in self.ufs:
+                cnpjs = cnpjs[:0]
+            else:
+                posicoes = np.minimum(np.searchsorted(self.estab_cnpjs, cnpjs), max(len(self.estab_cnpjs) - 1, 0))
+                na_uf = np.asarray(self.estab_uf[posicoes]) == self.ufs.index(uf)
+                cnpjs = cnpjs[self._contidos(self.estab_cnpjs, cnpjs) & na_uf]
+
+        if categoria is None:
+            inscritos = self.ctf_cnpjs
+        else:
+            inscritos = self._grupo(self.ctf_categorias, self.ctf_inicios, self.ctf_cnpjs_categoria, int(categoria))
+        com_ctf = cnpjs[self._contidos(inscritos, cnpjs)]
+
+        return {
+            "cnae": codigo_cnae(cnae),
+            "uf": uf,
+            "categoria": categoria,
+            "estabelecimentos": len(cnpjs),
+            "estabelecimentos_ctf": len(com_ctf),
+            "adesao_ctf": len(com_ctf) / len(cnpjs) if len(cnpjs) else 0.0,
+            "cnpjs": cnpjs,
+            "cnpjs_ctf": com_ctf,
+        }
+
+
+def formatar_cnpj(cnpj):
+    """Formata um CNPJ inteiro como 00.000.000/0000-00."""
+    texto = f"{int(cnpj):014d}"
+    return f"{texto[:2]}.{texto[2:5]}.{texto[5:8]}/{texto[8:12]}-{texto[12:]}"
+
+
+def ler_argumentos():
+    parser = argparse.ArgumentParser(description="Consulta rápida de estabelecimentos ativos e inscritos no CTF por CNAE.")
+    parser.add_argument("cnae", nargs="*", help="códigos CNAE (ex: 2222-6/00 ou 2222600)")
+    parser.add_argument("--uf", help="filtra os estabelecimentos pela UF (ex: DF)")
+    parser.add_argument("--categoria", type=int, help="considera apenas inscrições nesta categoria CTF")
+    parser.add_argument("--listar", type=int, default=0, metavar="N",
+                        help="lista até N CNPJs inscritos no CTF")
+    parser.add_argument("--construir", action="store_true", help="(re)constrói o índice antes de consultar")
+    parser.add_argument("--parquet", default=PASTA_PARQUET, help="pasta dos Parquet do painel")
+    parser.add_argument("--indice", default=PASTA_INDICE, help="pasta do índice de consulta")
+    argumentos = parser.parse_args()
+    if not argumentos.cnae and not argumentos.construir:
+        parser.error("informe ao menos um código CNAE ou --construir")
+    return argumentos
+
+
+if __name__ == "__main__":
+    argumentos = ler_argumentos()
+
+    if argumentos.construir:
+        construir_indice(argumentos.parquet, argumentos.indice)
+
+    indice = IndiceConsulta(argumentos.indice)
+    for cnae in argumentos.cnae:
+        inicio = datetime.now()
+        resultado = indice.consultar(cnae, uf=argumentos.uf, categoria=argumentos.categoria)
+        duracao_ms = (datetime.now() - inicio).total_seconds() * 1000
+
+        filtros = [f"UF {resultado['uf']}"] if resultado["uf"] else []
+        if resultado["categoria"] is not None:
+            filtros.append(f"categoria CTF {resultado['categoria']}")
+        print(f"\n🔎 CNAE {resultado['cnae']:07d}" + (f" ({', '.join(filtros)})" if filtros else ""))
+        print(f"   🏢 Estabelecimentos ativos: {resultado['estabelecimentos']}")
+        print(f"   🌿 Inscritos no CTF:        {resultado['estabelecimentos_ctf']}")
+        print(f"   📈 Adesão ao CTF:           {resultado['adesao_ctf']:.1%}")
+        print(f"   ⏱️ Consulta em {duracao_ms:.1f} ms")
+
+        for cnpj in resultado["cnpjs_ctf"][:argumentos.listar]:
+            print(f"      - {formatar_cnpj(cnpj)}")
@@ -0,0 +1,196 @@
+import os
+import csv
+import argparse
+import numpy as np
+import pandas as pd
+from transform_cnpj_estabelecimentos import COLUNAS_ESTABELECIMENTOS
+from chave_cnpj import digitos_verificadores
+
+# UFs e proporções aproximadas (as maiores bases pesam mais, como na Receita)
+UFS = ["SP", "MG", "RJ", "RS", "PR", "SC", "BA", "GO", "PE", "CE", "DF", "ES", "PA", "MT", "MS",
+       "MA", "PB", "RN", "AL", "PI", "AM", "SE", "RO", "TO", "AC", "AP", "RR"]
+PESOS_UFS = np.linspace(27, 1, len(UFS)) ** 2
+
+# Cabeçalho do CSV de pessoas jurídicas do CTF/APP (IBAMA)
+CABECALHO_CTF = [
+    "CNPJ", "Razão Social", "Código da categoria", "Categoria", "Código da atividade", "Atividade",
+    "Situação cadastral", "Data de início da atividade", "Data de término da atividade", "Estado"
+]
+
+# Os arquivos da Receita trazem os acentos em latin1 (em que qualquer sequência de bytes é válida),
+# e é assim que as transformações os leem
+ENCODING_RECEITA = "latin1"
+
+PALAVRAS = ["COMÉRCIO", "INDÚSTRIA", "SERVIÇOS", "CONSTRUÇÕES", "TINTAS", "AÇO", "QUÍMICA", "TRANSPORTES",
+            "ALIMENTOS", "SÃO", "JOÃO", "PAULO", "BRASIL", "NORDESTE", "PEÇAS", "MADEIRAS", "RESÍDUOS"]
+
+
+def _texto(valores, largura=0):
+    """Converte um array inteiro em texto com zeros à esquerda."""
+    return pd.Series(valores).astype(str).str.zfill(largura).to_numpy()
+
+
+def _nomes(rng, quantidade, palavras=3):
+    """Gera nomes com acentos a partir de PALAVRAS (ex: 'TINTAS SÃO JOÃO')."""
+    escolhas = rng.integers(0, len(PALAVRAS), size=(quantidade, palavras))
+    tabela = [pd.Series(np.array(PALAVRAS, dtype=object)[escolhas[:, i]]) for i in range(palavras)]
+    return tabela[0].str.cat(tabela[1:], sep=" ").to_numpy()
+
+
+def _datas(rng, quantidade, inicio="1970-01-01", fim="2025-12-31"):
+    """Datas aleatórias no formato AAAAMMDD da Receita."""
+    dias = rng.integers(0, (pd.Timestamp(fim) - pd.Timestamp(inicio)).days, size=quantidade)
+    return (pd.Timestamp(inicio) + pd.to_timedelta(dias, unit="D")).strftime("%Y%m%d").to_numpy()
+
+
+def _gravar_receita(df, caminho):
+    """Grava no padrão da Receita: sem cabeçalho, ';' e todos os campos entre aspas."""
+    df.to_csv(caminho, sep=";", header=False, index=False, quoting=csv.QUOTE_ALL, encoding=ENCODING_RECEITA)
+
+
+def gerar_estabelecimentos(pasta, linhas, shards=1, semente=0, proporcao_ativos=0.5):
+    """
+    Gera arquivos de ESTABELECIMENTOS no layout oficial (30 colunas), divididos em 'shards'
+    como K3241.K03200Y<n>.D00000.ESTABELE. Retorna a lista de arquivos gerados.
+    """
+
+    os.makedirs(pasta, exist_ok=True)
+    rng = np.random.default_rng(semente)
+    arquivos = []
+    for shard, faixa in enumerate(np.array_split(np.arange(linhas), max(1, shards))):
+        n = len(faixa)
+        basico = faixa
+        ordem = rng.integers(1, 5, size=n)
+        cnaes = rng.integers(111301, 9900000, size=(n, 4))
+        qtd_secundarios = rng.integers(0, 4, size=n)
+        secundarios = pd.Series(_texto(cnaes[:, 1], 7)).where(qtd_secundarios >= 1, "")
+        for j in (2, 3):
+            secundarios += ("," + pd.Series(_texto(cnaes[:, j], 7))).where(qtd_secundarios >= j, "")
+
+        colunas = {
+            "CNPJ_BASICO": _texto(basico, 8),
+            "CNPJ_ORDEM": _texto(ordem, 4),
+            "CNPJ_DV": _texto(digitos_verificadores(basico, ordem), 2),
+            "IDENT_MATRIZ_FILIAL": np.where(ordem == 1, "1", "2"),
+            "NOME_FANTASIA": np.where(rng.random(n) < 0.4, "", _nomes(rng, n, 2)),
+            "SITUACAO_CADASTRAL": np.where(rng.random(n) < proporcao_ativos, "02",
+                                           rng.choice(["01", "03", "04", "08"], size=n)),
+            "DATA_SITUACAO_CADASTRAL": _datas(rng, n, "2000-01-01"),
+            "MOTIVO_SITUACAO_CADASTRAL": _texto(rng.integers(0, 80, size=n), 2),
+            "NOME_CIDADE_EXTERIOR": "",
+            "PAIS": "",
+            "DATA_INICIO_ATIVIDADE": _datas(rng, n),
+            "CNAE_PRIMARIO": _texto(cnaes[:, 0], 7),
+            "CNAES_SECUNDARIOS": secundarios.to_numpy(),
+            "TIPO_LOGRADOURO": rng.choice(["RUA", "AVENIDA", "TRAVESSA", "RODOVIA"], size=n),
+            "LOGRADOURO": _nomes(rng, n, 2),
+            "NUMERO": _texto(rng.integers(1, 5000, size=n)),
+            "COMPLEMENTO": np.where(rng.random(n) < 0.7, "", "SALA 1"),
+            "BAIRRO": "CENTRO",
+            "CEP": _texto(rng.integers(1_000_000, 99_999_999, size=n), 8),
+            "UF": rng.choice(UFS, size=n, p=PESOS_UFS / PESOS_UFS.sum()),
+            "MUNICIPIO": _texto(rng.integers(1, 9999, size=n), 4),
+            "DDD_1": _texto(rng.integers(11, 99, size=n)),
+            "TELEFONE_1": _texto(rng.integers(20_000_000, 99_999_999, size=n)),
+            "DDD_2": "",
+            "TELEFONE_2": "",
+            "DDD_FAX": "",
+            "FAX": "",
+            "EMAIL": np.where(rng.random(n) < 0.5, "", "CONTATO@EMPRESA.COM.BR"),
+            "SITUACAO_ESPECIAL": "",
+            "DATA_SITUACAO_ESPECIAL": "",
+        }
+        df = pd.DataFrame({coluna: colunas[coluna] for coluna in COLUNAS_ESTABELECIMENTOS}, index=range(n))
+        caminho = os.path.join(pasta, f"K3241.K03200Y{shard}.D00000.ESTABELE")
+        _gravar_receita(df, caminho)
+        arquivos.append(caminho)
+    return arquivos
+
+
+def gerar_empresas(pasta, linhas, shards=1, semente=1):
+    """
+    Gera arquivos de EMPRESAS no layout oficial (7 colunas: CNPJ básico, razão social, natureza jurídica,
+    qualificação do responsável, capital social, porte e ente federativo).
+    """
+
+    os.makedirs(pasta, exist_ok=True)
+    rng = np.random.default_rng(semente)
+    arquivos = []
+    for shard, faixa in enumerate(np.array_split(np.arange(linhas), max(1, shards))):
+        n = len(faixa)
+        capital = rng.integers(0, 10_000_000, size=n)
+        df = pd.DataFrame({
+            "cnpj_basico": _texto(faixa, 8),
+            "razao_social": _nomes(rng, n) + " LTDA",
+            "natureza_juridica": rng.choice(["2062", "2135", "2305", "2240", "1244"], size=n),
+            "qualificacao_responsavel": rng.choice(["49", "05", "16"], size=n),
+            "capital_social": _texto(capital // 100) + "," + _texto(capital % 100, 2),
+            "porte": rng.choice(["00", "01", "03", "05"], size=n),
+            "ente_federativo": "",
+        })
+        caminho = os.path.join(pasta, f"K3241.K03200Y{shard}.D00000.EMPRECSV")
+        _gravar_receita(df, caminho)
+        arquivos.append(caminho)
+    return arquivos
+
+
+def gerar_ctf(pasta, linhas, linhas_estabelecimentos, semente=2):
+    """
+    Gera o CSV de pessoas jurídicas do CTF/APP (cabeçalho do IBAMA, ';', UTF-8), com CNPJs
+    dos estabelecimentos sintéticos, parte deles formatados com pontuação.
+    """
+
+    os.makedirs(pasta, exist_ok=True)
+    rng = np.random.default_rng(semente)
+    basico = rng.integers(0, max(1, linhas_estabelecimentos), size=linhas)
+    ordem = np.ones(linhas, dtype=np.int64)
+    cnpj = pd.Series(basico * 1_000_000 + ordem * 100 + digitos_verificadores(basico, ordem)).astype(str).str.zfill(14)
+    formatado = cnpj.str.replace(r"(\d{2})(\d{3})(\d{3})(\d{4})(\d{2})", r"\1.\2.\3/\4-\5", regex=True)
+    categoria = rng.integers(1, 23, size=linhas)
+
+    df = pd.DataFrame({
+        "CNPJ": np.where(rng.random(linhas) < 0.3, formatado, cnpj),
+        "Razão Social": _nomes(rng, linhas),
+        "Código da categoria": categoria,
+        "Categoria": "Categoria " + pd.Series(categoria).astype(str),
+        "Código da atividade": rng.integers(1, 60, size=linhas),
+        "Atividade": "Atividade",
+        "Situação cadastral": np.where(rng.random(linhas) < 0.8, "Ativa", "Inativa"),
+        "Data de início da atividade": "01/01/2020",
+        "Data de término da atividade": np.where(rng.random(linhas) < 0.9, "", "01/01/2024"),
+        "Estado": rng.choice(UFS, size=linhas),
+    })
+
+    caminho = os.path.join(pasta, "pessoasJuridicas.csv")
+    df.to_csv(caminho, sep=";", index=False, encoding="utf-8")
+    return [caminho]
+
+
+def gerar_base_sintetica(pasta, estabelecimentos=100_000, empresas=None, ctf=None, shards=2):
+    """
+    Gera uma base sintética completa em 'pasta' (subpastas estab/, empresas/ e ctf/), determinística.
+    Por padrão, empresas = estabelecimentos / 2 e ctf = estabelecimentos / 20.
+    """
+
+    empresas = empresas if empresas is not None else max(1, estabelecimentos // 2)
+    ctf = ctf if ctf is not None else max(1, estabelecimentos // 20)
+    return {
+        "estab": gerar_estabelecimentos(os.path.join(pasta, "estab"), estabelecimentos, shards),
+        "empresas": gerar_empresas(os.path.join(pasta, "empresas"), empresas, shards),
+        "ctf": gerar_ctf(os.path.join(pasta, "ctf"), ctf, estabelecimentos),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gera uma base sintética nos layouts da Receita e do IBAMA.")
+    parser.add_argument("pasta", help="pasta de destino")
+    parser.add_argument("--estabelecimentos", type=int, default=100_000)
+    parser.add_argument("--empresas", type=int, default=None)
+    parser.add_argument("--ctf", type=int, default=None)
+    parser.add_argument("--shards", type=int, default=2)
+    argumentos = parser.parse_args()
+
+    arquivos = gerar_base_sintetica(argumentos.pasta, argumentos.estabelecimentos, argumentos.empresas,
+                                    argumentos.ctf, argumentos.shards)
+    for fonte, caminhos in arquivos.items():
+        print(f"✅ {fonte}: {len(caminhos)} arquivo(s) em {os.path.dirname(caminhos[0])}")
@@ -0,0 +1,211 @@
+import os
+import json
+import shutil
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from datetime import datetime
+from transform_cnpj_estabelecimentos import COLUNAS_ESTABELECIMENTOS
+
+# Arquivos mantidos entre execuções (retrato do mês anterior)
+ARQUIVO_ASSINATURAS = "assinaturas.parquet"            # CNPJ_COMPLETO + hash da linha, ordenado pelo CNPJ
+ARQUIVO_ANTERIOR = "estabelecimentos_anterior.parquet"  # cópia integral do mês anterior
+ARQUIVO_RETRATO = "retrato.json"                        # mês e contagem do retrato
+
+# Conjuntos de mudanças gravados para cada mês
+CONJUNTOS_DELTA = {
+    "inseridos": "estabelecimentos novos (linha do mês atual)",
+    "atualizados": "estabelecimentos alterados (linha do mês atual)",
+    "atualizados_antes": "estabelecimentos alterados (linha do mês anterior)",
+    "removidos": "estabelecimentos que deixaram de constar (linha do mês anterior)",
+}
+
+
+def colunas_assinatura(caminho_parquet):
+    """
+    Colunas do layout da Receita presentes em estabelecimentos.parquet, na ordem do layout.
+    Colunas acrescentadas na transformação (CNPJ_COMPLETO, TEM_CTF, CATEGORIAS_CTF) ficam de fora:
+    uma mudança apenas no CTF não é uma mudança do estabelecimento na Receita.
+    """
+
+    presentes = set(pq.ParquetFile(caminho_parquet).schema_arrow.names)
+    return [c for c in COLUNAS_ESTABELECIMENTOS if c in presentes]
+
+
+def calcular_assinaturas(caminho_parquet, colunas=None):
+    """
+    Calcula o hash de conteúdo de cada linha de estabelecimentos.parquet, row group a row group,
+    sobre 'colunas' (padrão: colunas_assinatura). Só essas colunas e o CNPJ_COMPLETO são lidos.
+    Retorna (cnpjs, hashes) ordenados pelo CNPJ_COMPLETO (int64, uint64).
+    """
+
+    arquivo = pq.ParquetFile(caminho_parquet)
+    presentes = set(arquivo.schema_arrow.names)
+    colunas = [c for c in (colunas or colunas_assinatura(caminho_parquet)) if c in presentes]
+    cnpjs, hashes = [], []
+    for i in range(arquivo.num_row_groups):
+        df = arquivo.read_row_group(i, columns=["CNPJ_COMPLETO"] + colunas).to_pandas()
+        df = df[df["CNPJ_COMPLETO"].notna()]
+        cnpjs.append(df["CNPJ_COMPLETO"].to_numpy(dtype=np.int64))
+        hashes.append(pd.util.hash_pandas_object(df[colunas], index=False).to_numpy())
+
+    cnpjs = np.concatenate(cnpjs) if cnpjs else np.zeros(0, dtype=np.int64)
+    hashes = np.concatenate(hashes) if hashes else np.zeros(0, dtype=np.uint64)
+    ordem = np.argsort(cnpjs, kind="stable")
+    return cnpjs[ordem], hashes[ordem]
+
+
+def comparar_assinaturas(cnpjs_antes, hashes_antes, cnpjs_depois, hashes_depois):
+    """
+    Compara duas assinaturas ordenadas e retorna os CNPJs (inseridos, atualizados, removidos).
+    """
+
+    def localizar(ordenados, procurados):
+        if len(ordenados) == 0:
+            return np.zeros(len(procurados), dtype=np.int64), np.zeros(len(procurados), dtype=bool)
+        posicoes = np.minimum(np.searchsorted(ordenados, procurados), len(ordenados) - 1)
+        return posicoes, ordenados[posicoes] == procurados
+
+    posicoes, existiam = localizar(cnpjs_antes, cnpjs_depois)
+    inseridos = cnpjs_depois[~existiam]
+    alterados = existiam & (hashes_antes[posicoes] != hashes_depois) if len(cnpjs_antes) else existiam
+    atualizados = cnpjs_depois[alterados]
+
+    _, continuam = localizar(cnpjs_depois, cnpjs_antes)
+    removidos = cnpjs_antes[~continuam]
+    return inseridos, atualizados, removidos
+
+
+def extrair_linhas(caminho_parquet, cnpjs, destino):
+    """
+    Grava em 'destino' as linhas de 'caminho_parquet' cujo CNPJ_COMPLETO está em 'cnpjs'.
+    Retorna a quantidade de linhas gravadas (o arquivo é gravado mesmo vazio, com o esquema da origem).
+    """
+
+    arquivo = pq.ParquetFile(caminho_parquet)
+    conjunto = pa.array(cnpjs, pa.int64())
+    linhas = 0
+    with pq.ParquetWriter(destino, schema=arquivo.schema_arrow, compression="snappy") as escritor:
+        for i in range(arquivo.num_row_groups):
+            if len(conjunto) == 0:
+                break
+            lote = arquivo.read_row_group(i)
+            lote = lote.filter(pc.is_in(lote.column("CNPJ_COMPLETO"), value_set=conjunto))
+            if lote.num_rows:
+                escritor.write_table(lote)
+                linhas += lote.num_rows
+    return linhas
+
+
+def calcular_delta(caminho_parquet, pasta_historico, pasta_delta, mes=None):
+    """
+    Compara o estabelecimentos.parquet do mês atual com o retrato do mês anterior e grava,
+    em 'pasta_delta/<mes>/', os conjuntos de mudanças (ver CONJUNTOS_DELTA) e um resumo.json.
+
+    - A chave é o CNPJ_COMPLETO; uma linha é considerada alterada quando o hash das suas colunas
+      do layout da Receita muda (ver colunas_assinatura); TEM_CTF e CATEGORIAS_CTF não contam
+    - Se o retrato anterior foi assinado com outras colunas, as suas assinaturas são recalculadas
+      a partir da cópia do mês anterior, para que só mudanças de conteúdo apareçam no delta
+    - Na primeira execução (sem retrato), apenas o retrato é gravado
+    - Ao final, o mês atual passa a ser o retrato usado na próxima comparação
+
+    Retorna o dicionário do resumo, ou None na primeira execução.
+    """
+
+    mes = mes or datetime.today().strftime("%Y-%m")
+    os.makedirs(pasta_historico, exist_ok=True)
+    caminho_assinaturas = os.path.join(pasta_historico, ARQUIVO_ASSINATURAS)
+    caminho_anterior = os.path.join(pasta_historico, ARQUIVO_ANTERIOR)
+    caminho_retrato = os.path.join(pasta_historico, ARQUIVO_RETRATO)
+
+    print(f"🧮 Calculando assinaturas dos estabelecimentos de {mes}...")
+    colunas = colunas_assinatura(caminho_parquet)
+    cnpjs, hashes = calcular_assinaturas(caminho_parquet, colunas)
+
+    resumo = None
+    if os.path.exists(caminho_retrato):
+        with open(caminho_retrato, encoding="utf-8") as f:
+            retrato = json.load(f)
+        if retrato.get("colunas") == colunas:
+            anteriores = pq.read_table(caminho_assinaturas)
+            cnpjs_antes = anteriores.column("CNPJ_COMPLETO").to_numpy()
+            hashes_antes = anteriores.column("hash").to_numpy()
+        else:
+            print("🧮 Retrato anterior assinado com outras colunas: recalculando as suas assinaturas...")
+            cnpjs_antes, hashes_antes = calcular_assinaturas(caminho_anterior, colunas)
+        inseridos, atualizados, removidos = comparar_assinaturas(cnpjs_antes, hashes_antes, cnpjs, hashes)
+
+        destino = os.path.join(pasta_delta, mes)
+        temporario = destino + ".tmp"
+        shutil.rmtree(temporario, ignore_errors=True)
+        os.makedirs(temporario)
+        extracoes = {
+            "inseridos": (caminho_parquet, inseridos),
+            "atualizados": (caminho_parquet, atualizados),
+            "atualizados_antes": (caminho_anterior, atualizados),
+            "removidos": (caminho_anterior, removidos),
+        }
+        resumo = {"mes": mes, "mes_anterior": retrato["mes"], "estabelecimentos": len(cnpjs)}
+        for nome, (origem, chaves) in extracoes.items():
+            resumo[nome] = extrair_linhas(origem, chaves, os.path.join(temporario, f"{nome}.parquet"))
+        with open(os.path.join(temporario, "resumo.json"), "w", encoding="utf-8") as f:
+            json.dump(resumo, f, ensure_ascii=False, indent=2)
+
+        shutil.rmtree(destino, ignore_errors=True)
+        os.replace(temporario, destino)
+        print(f"✅ Delta {retrato['mes']} -> {mes}: {resumo['inseridos']} inseridos, "
+              f"{resumo['atualizados']} atualizados, {resumo['removidos']} removidos.")
+        print(f"   📂 {destino}")
+    else:
+        print("ℹ️ Nenhum retrato anterior: este mês será a base das próximas comparações.")
+
+    # O mês atual passa a ser o retrato (gravado em temporários e substituído ao final)
+    assinaturas = pa.table({"CNPJ_COMPLETO": pa.array(cnpjs, pa.int64()), "hash": pa.array(hashes, pa.uint64())})
+    pq.write_table(assinaturas, caminho_assinaturas + ".tmp", compression="snappy")
+    shutil.copyfile(caminho_parquet, caminho_anterior + ".tmp")
+    os.replace(caminho_assinaturas + ".tmp", caminho_assinaturas)
+    os.replace(caminho_anterior + ".tmp", caminho_anterior)
+    with open(caminho_retrato + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({"mes": mes, "estabelecimentos": len(cnpjs), "colunas": colunas}, f, ensure_ascii=False, indent=2)
+    os.replace(caminho_retrato + ".tmp", caminho_retrato)
+
+    return resumo
+
+
+def aplicar_delta(caminho_base, pasta_delta_mes, destino):
+    """
+    Atualiza uma tabela de estabelecimentos do mês anterior com o delta de um mês, sem reconstrução:
+    remove as linhas removidas e alteradas e acrescenta as inseridas e as novas versões das alteradas.
+    Retorna a quantidade de linhas gravadas em 'destino'.
+
+    Destinada a cópias mantidas fora do pipeline (ex: uma base do painel atualizada a cada mês):
+    o run.py não a usa. O agregado de adesão e os índices continuam sendo reconstruídos por inteiro,
+    pois dependem de entradas que o delta não cobre (cnae_estabelecimentos, ctf_empresas e,
+    no agregado, a idade na data de referência, que muda a cada execução).
+    Como TEM_CTF e CATEGORIAS_CTF não entram na assinatura, as linhas que não mudaram na Receita
+    mantêm na tabela atualizada a marcação CTF do mês anterior.
+    """
+
+    def chaves(nome):
+        return pq.read_table(os.path.join(pasta_delta_mes, f"{nome}.parquet"),
+                             columns=["CNPJ_COMPLETO"]).column("CNPJ_COMPLETO").combine_chunks()
+
+    descartar = pa.concat_arrays([chaves("removidos"), chaves("atualizados_antes")])
+    base = pq.ParquetFile(caminho_base)
+    linhas = 0
+    with pq.ParquetWriter(destino + ".tmp", schema=base.schema_arrow, compression="snappy") as escritor:
+        for i in range(base.num_row_groups):
+            lote = base.read_row_group(i)
+            lote = lote.filter(pc.invert(pc.is_in(lote.column("CNPJ_COMPLETO"), value_set=descartar)))
+            escritor.write_table(lote)
+            linhas += lote.num_rows
+        for nome in ("inseridos", "atualizados"):
+            novas = pq.read_table(os.path.join(pasta_delta_mes, f"{nome}.parquet"))
+            if novas.num_rows:
+                escritor.write_table(novas.cast(base.schema_arrow))
+                linhas += novas.num_rows
+
+    os.replace(destino + ".tmp", destino)
+    return linhas
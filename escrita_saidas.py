@@ -0,0 +1,116 @@
+import os
+import pyarrow as pa
+import pyarrow.parquet as pq
+from esquema_saida import tabela_arrow, texto_csv
+from metricas import registrar_arquivo
+
+# Formatos de saída aceitos pelas transformações
+FORMATOS = ("csv", "parquet")
+
+
+def validar_formatos(formatos, caminho_parquet=None):
+    """
+    Confere os formatos de saída pedidos e se a pasta Parquet foi informada quando necessária.
+    """
+
+    formatos = tuple(formatos)
+    desconhecidos = [f for f in formatos if f not in FORMATOS]
+    if desconhecidos or not formatos:
+        raise ValueError(f"Formatos de saída inválidos: {formatos} (use {FORMATOS})")
+    if "parquet" in formatos and not caminho_parquet:
+        raise ValueError("Informe 'caminho_parquet' para gravar as saídas em Parquet.")
+    return formatos
+
+
+class EscritorTabela:
+    """
+    Grava uma tabela de saída bloco a bloco, em CSV e/ou Parquet.
+
+    - CSV: cada bloco é acrescentado ao arquivo, com cabeçalho apenas no primeiro
+    - Parquet: cada bloco vira um row group do mesmo arquivo (ParquetWriter), com os tipos
+      declarados para 'tabela' em esquema_saida.py (por padrão, a tabela de mesmo nome)
+    - Tudo é gravado em arquivos temporários, que só substituem os finais em 'fechar()';
+      se nenhum bloco for gravado, os arquivos finais existentes são mantidos
+    """
+
+    def __init__(self, nome, caminho_csv=None, caminho_parquet=None, formatos=("csv",), compressao="snappy",
+                 tabela=None):
+        formatos = validar_formatos(formatos, caminho_parquet)
+        self.nome = nome
+        self.tabela = tabela or nome
+        self.compressao = compressao
+        self.linhas = 0
+        self.destinos = {}
+        if "csv" in formatos:
+            os.makedirs(caminho_csv, exist_ok=True)
+            self.destinos["csv"] = os.path.join(caminho_csv, f"{nome}.csv")
+        if "parquet" in formatos:
+            os.makedirs(caminho_parquet, exist_ok=True)
+            self.destinos["parquet"] = os.path.join(caminho_parquet, f"{nome}.parquet")
+
+        self._escritor_parquet = None
+        for destino in self.destinos.values():
+            if os.path.exists(destino + ".tmp"):
+                os.remove(destino + ".tmp")
+
+    def escrever(self, df):
+        """Grava um bloco (DataFrame de texto ou tabela Arrow já tipada) em todos os formatos pedidos."""
+        if df is None or len(df) == 0:
+            return
+
+        if "csv" in self.destinos:
+            texto = texto_csv(df, self.tabela) if isinstance(df, pa.Table) else df
+            texto.to_csv(self.destinos["csv"] + ".tmp", mode="a", header=self.linhas == 0, index=False)
+
+        if "parquet" in self.destinos:
+            tabela = tabela_arrow(df, self.tabela)
+            if self._escritor_parquet is None:
+                self._escritor_parquet = pq.ParquetWriter(
+                    self.destinos["parquet"] + ".tmp",
+                    schema=tabela.schema,
+                    compression=self.compressao
+                )
+            self._escritor_parquet.write_table(tabela, row_group_size=max(1, tabela.num_rows))
+
+        self.linhas += len(df)
+
+    def fechar(self):
+        """Finaliza a gravação e publica os arquivos finais. Retorna o total de linhas gravadas."""
+        if self._escritor_parquet is not None:
+            self._escritor_parquet.close()
+            self._escritor_parquet = None
+
+        for destino in self.destinos.values():
+            temporario = destino + ".tmp"
+            if self.linhas and os.path.exists(temporario):
+                os.replace(temporario, destino)
+                registrar_arquivo(destino, bytes_gravados=os.path.getsize(destino), linhas_gravadas=self.linhas)
+            elif os.path.exists(temporario):
+                os.remove(temporario)
+        return self.linhas
+
+    def descartar(self):
+        """Interrompe a gravação sem publicar nada; os arquivos finais existentes são mantidos."""
+        self.linhas = 0
+        self.fechar()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo_excecao, *exc):
+        if tipo_excecao is None:
+            self.fechar()
+        else:
+            self.descartar()
+        return False
+
+
+def gravar_tabela(df, nome, caminho_csv=None, caminho_parquet=None, formatos=("csv",)):
+    """
+    Grava um DataFrame inteiro como tabela de saída (ver EscritorTabela).
+    Retorna a lista dos arquivos gravados.
+    """
+
+    with EscritorTabela(nome, caminho_csv, caminho_parquet, formatos) as escritor:
+        escritor.escrever(df)
+    return list(escritor.destinos.values())
@@ -0,0 +1,193 @@
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+from chave_cnpj import cnpj_int64
+
+# Tipos lógicos das colunas das saídas em Parquet
+CNPJ = "cnpj"            # int64: os 14 dígitos do CNPJ completo (ver chave_cnpj.py)
+CNPJ_BASICO = "cnpj_basico"  # int64: os 8 dígitos do CNPJ básico
+CNAE = "cnae"            # int32: código CNAE de 7 dígitos
+DATA = "data"            # date32: datas no formato AAAAMMDD da Receita
+DECIMAL = "decimal"      # decimal(20, 2): valores com vírgula decimal ("1000,00")
+CATEGORIA = "categoria"  # dictionary<int32, string>: colunas de baixa cardinalidade
+LOGICO = "logico"        # bool: indicadores calculados pelo pipeline (ex: TEM_CTF)
+LISTA_CNAE = "lista_cnae"  # list<int32>: códigos CNAE separados por vírgula (ex: CNAEs secundários)
+
+TIPOS_ARROW = {
+    CNPJ: pa.int64(),
+    CNPJ_BASICO: pa.int64(),
+    CNAE: pa.int32(),
+    DATA: pa.date32(),
+    DECIMAL: pa.decimal128(20, 2),
+    CATEGORIA: pa.dictionary(pa.int32(), pa.string()),
+    LOGICO: pa.bool_(),
+    LISTA_CNAE: pa.list_(pa.int32()),
+}
+
+# Esquema declarado de cada tabela de saída; as colunas não listadas permanecem texto
+TIPOS_SAIDA = {
+    "estabelecimentos": {
+        "CNPJ_COMPLETO": CNPJ,
+        "CNPJ_BASICO": CNPJ_BASICO,
+        "DATA_INICIO_ATIVIDADE": DATA,
+        "CNAE_PRIMARIO": CNAE,
+        "UF": CATEGORIA,
+        "MUNICIPIO": CATEGORIA,
+        # Marcação opcional dos inscritos no CTF (ver membros_ctf.py)
+        "TEM_CTF": LOGICO,
+        "CATEGORIAS_CTF": CATEGORIA,
+    },
+    "cnae_estabelecimentos": {
+        "CNPJ_COMPLETO": CNPJ,
+        "CNAE": CNAE,
+    },
+    # Layout compacto opcional de cnae_estabelecimentos (uma linha por estabelecimento, somente Parquet)
+    "cnae_estabelecimentos_lista": {
+        "CNPJ_COMPLETO": CNPJ,
+        "CNAE_PRIMARIO": CNAE,
+        "CNAES_SECUNDARIOS": LISTA_CNAE,
+    },
+    "dados_empresa": {
+        "cnpj_basico": CNPJ_BASICO,
+        "capital_social": DECIMAL,
+        "porte": CATEGORIA,
+    },
+    "ctf_empresas": {
+        "cnpj": CNPJ,
+        "ctf": CATEGORIA,
+    },
+    "cnaes": {
+        "cnae": CNAE,
+    },
+}
+
+# Dígitos das colunas numéricas quando gravadas em CSV (texto com zeros à esquerda, como na origem)
+DIGITOS_CSV = {CNPJ: 14, CNPJ_BASICO: 8, CNAE: 7}
+
+
+def _somente_validos(texto, padrao):
+    """Mantém os valores que casam com o padrão; os demais (e vazios) viram nulos."""
+    return pc.if_else(pc.match_substring_regex(texto, padrao), texto, pa.scalar(None, pa.string()))
+
+
+def codigos_cnae(texto):
+    """
+    Converte códigos CNAE de 7 dígitos em texto (pa.Array) para int32, sem passar por objetos Python.
+    Valores vazios ou fora do formato viram nulos.
+    """
+    return pc.cast(_somente_validos(texto, r"^\d{1,7}$"), pa.int32())
+
+
+def explodir_cnaes(texto):
+    """
+    Separa listas de CNAEs em texto ("4711302,4729699") em códigos int32, de forma vetorizada (Arrow).
+    Retorna (linhas, codigos): para cada código válido, o índice da linha de origem e o código.
+    Listas vazias ou nulas e códigos fora do formato são descartados.
+    """
+
+    listas = pc.split_pattern(texto, ",")
+    linhas = pc.list_parent_indices(listas)
+    codigos = codigos_cnae(pc.list_flatten(listas))
+    validos = pc.is_valid(codigos)
+    return linhas.filter(validos), codigos.filter(validos)
+
+
+def lista_cnaes(texto):
+    """
+    Converte listas de CNAEs em texto em uma coluna list<int32> (uma lista por linha, vazia se não houver).
+    """
+
+    linhas, codigos = explodir_cnaes(texto)
+    quantidades = np.bincount(linhas.to_numpy(), minlength=len(texto))
+    deslocamentos = np.concatenate([[0], np.cumsum(quantidades)]).astype(np.int32)
+    return pa.ListArray.from_arrays(pa.array(deslocamentos), codigos)
+
+
+def _converter_coluna(texto, tipo):
+    """
+    Converte uma coluna de texto (pa.Array) para o tipo lógico informado.
+    Valores fora do formato esperado viram nulos, em vez de interromper a gravação.
+    """
+
+    if tipo in (CNPJ, CNPJ_BASICO):
+        # Descarta pontuação (ex: "00.024.116/0001-85") antes de converter
+        return cnpj_int64(texto, 14 if tipo == CNPJ else 8)
+
+    if tipo == CNAE:
+        # Até 7 dígitos, como em codigos_cnae: códigos maiores estourariam o int32
+        digitos = pc.replace_substring_regex(texto, r"\D", "")
+        return pc.cast(_somente_validos(digitos, r"^\d{1,7}$"), TIPOS_ARROW[tipo])
+
+    if tipo == DATA:
+        validos = _somente_validos(texto, r"^\d{8}$")
+        instantes = pc.strptime(validos, format="%Y%m%d", unit="s", error_is_null=True)
+        return pc.cast(instantes, pa.date32())
+
+    if tipo == DECIMAL:
+        valores = pc.replace_substring(pc.utf8_trim_whitespace(texto), ",", ".")
+        return pc.cast(_somente_validos(valores, r"^-?\d{1,18}(\.\d{1,2})?$"), TIPOS_ARROW[DECIMAL])
+
+    if tipo == CATEGORIA:
+        return pc.dictionary_encode(texto).cast(TIPOS_ARROW[CATEGORIA])
+
+    if tipo == LOGICO:
+        # Texto gravado pelo pandas no CSV ("True"/"False")
+        return pc.equal(_somente_validos(texto, r"^(True|False)$"), "True")
+
+    if tipo == LISTA_CNAE:
+        return lista_cnaes(texto)
+
+    raise ValueError(f"Tipo de coluna desconhecido: {tipo}")
+
+
+def esquema_saida(tabela, colunas):
+    """
+    Esquema Arrow da tabela de saída 'tabela' com as colunas informadas (na ordem dada).
+    Tabelas sem esquema declarado (ou colunas não listadas) ficam como texto.
+    """
+
+    tipos = TIPOS_SAIDA.get(tabela, {})
+    return pa.schema([
+        pa.field(str(coluna), TIPOS_ARROW[tipos[coluna]] if coluna in tipos else pa.string())
+        for coluna in colunas
+    ])
+
+
+def tabela_arrow(df, tabela):
+    """
+    Converte um DataFrame de texto em uma tabela Arrow com o esquema declarado de 'tabela'.
+    Aceita também uma tabela Arrow: as colunas de texto são convertidas e as já tipadas
+    (ex: CNAEs int32 da transformação de estabelecimentos) apenas ajustadas ao esquema.
+    """
+
+    tipos = TIPOS_SAIDA.get(tabela, {})
+    nomes = df.column_names if isinstance(df, pa.Table) else list(df.columns)
+    esquema = esquema_saida(tabela, nomes)
+    colunas = []
+    for campo in esquema:
+        if isinstance(df, pa.Table):
+            valores = df.column(campo.name).combine_chunks()
+            if pa.types.is_large_string(valores.type):
+                valores = valores.cast(pa.string())
+            elif not pa.types.is_string(valores.type):
+                colunas.append(valores.cast(campo.type))
+                continue
+        else:
+            valores = pa.array(df[campo.name], type=pa.string(), from_pandas=True)
+        colunas.append(_converter_coluna(valores, tipos[campo.name]) if campo.name in tipos else valores)
+
+    return pa.Table.from_arrays(colunas, schema=esquema)
+
+
+def texto_csv(tabela, nome):
+    """
+    Converte uma tabela Arrow já tipada em DataFrame para a gravação em CSV, mantendo o texto
+    das saídas originais: CNPJs e códigos CNAE com todos os dígitos (ver DIGITOS_CSV).
+    """
+
+    tipos = TIPOS_SAIDA.get(nome, {})
+    for i, coluna in enumerate(tabela.column_names):
+        if tipos.get(coluna) in DIGITOS_CSV and pa.types.is_integer(tabela.column(i).type):
+            texto = pc.utf8_lpad(pc.cast(tabela.column(i), pa.string()), DIGITOS_CSV[tipos[coluna]], "0")
+            tabela = tabela.set_column(i, coluna, texto)
+    return tabela.to_pandas()
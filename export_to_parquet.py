@@ -1,21 +1,59 @@
 import os
 import pandas as pd
-import pyarrow as pa
 import pyarrow.parquet as pq
 from tqdm import tqdm
+from esquema_saida import tabela_arrow
+from leitura_csv import ler_csv_em_blocos
+from metricas import registrar_arquivo
+
+def _converter_csv(caminho_csv, caminho_parquet, nome_tabela, chunk_size, orcamento):
+    """
+    Converte um CSV em Parquet bloco a bloco, um row group por bloco, com o esquema tipado da tabela.
+    O Parquet é gravado em temporário e só substitui o anterior ao final. Retorna as linhas convertidas.
+    """
+
+    writer = None
+    linhas = 0
+    try:
+        leitor = ler_csv_em_blocos(caminho_csv, delimitador=",", chunk_size=chunk_size, orcamento=orcamento)
+        for chunk in leitor:
+            tabela = tabela_arrow(chunk, nome_tabela)
+            if writer is None:
+                writer = pq.ParquetWriter(caminho_parquet + ".tmp", schema=tabela.schema, compression="snappy")
+            writer.write_table(tabela, row_group_size=max(1, tabela.num_rows))
+            linhas += tabela.num_rows
+    finally:
+        if writer is not None:
+            writer.close()
+
+    # CSV só com o cabeçalho: Parquet vazio, com o esquema da tabela
+    if writer is None:
+        vazio = pd.read_csv(caminho_csv, dtype=str, encoding="utf-8", nrows=0)
+        pq.write_table(tabela_arrow(vazio, nome_tabela), caminho_parquet + ".tmp", compression="snappy")
+
+    os.replace(caminho_parquet + ".tmp", caminho_parquet)
+    registrar_arquivo(caminho_csv, bytes_lidos=os.path.getsize(caminho_csv), linhas_lidas=linhas,
+                      linhas_filtradas=linhas)
+    registrar_arquivo(caminho_parquet, bytes_gravados=os.path.getsize(caminho_parquet), linhas_gravadas=linhas)
+    return linhas
+
 
 def exportar_para_parquet(
     origem="Entrada do Painel",
     destino="Dados Painel Parquet",
     ignorar=("ctfs.csv",),
-    chunk_size=500_000
+    chunk_size=500_000,
+    orcamento=None
 ):
     """
     Converte todos os arquivos CSV da pasta de origem para Parquet, salvando na pasta de destino.
 
-    - Para 'estabelecimentos.csv', faz leitura em chunks e escreve vários row-groups
-      em um único arquivo Parquet, evitando estouro de memória.
-    - Para os demais, converte diretamente com pandas -> Parquet.
+    - Todos os arquivos são lidos em blocos e gravados em vários row groups de um único
+      arquivo Parquet, evitando estouro de memória.
+    - Os blocos têm 'chunk_size' linhas ou, com 'orcamento' (OrcamentoMemoria), o tamanho
+      que cabe no orçamento de memória, pelos bytes por linha medidos em cada arquivo.
+    - Aplica o esquema tipado de cada tabela (ver esquema_saida.py): CNPJ int64, CNAE int32,
+      datas date32, capital social decimal e colunas de baixa cardinalidade como dicionário.
     - Usa tqdm para mostrar progresso.
     """
 
@@ -38,43 +76,15 @@ def exportar_para_parquet(
     for arquivo in progresso:
         caminho_csv     = os.path.join(origem, arquivo)
         caminho_parquet = os.path.join(destino, arquivo.replace(".csv", ".parquet"))
+        nome_tabela     = arquivo[:-len(".csv")]
 
-        # Se for o estabelecimentos.csv, usar chunking
+        # A base de estabelecimentos é obrigatória: uma falha nela interrompe a exportação
         if arquivo.lower() == "estabelecimentos.csv":
-            primeiro = True
-            writer = None
-            leitor = pd.read_csv(
-                caminho_csv,
-                dtype=str,
-                chunksize=chunk_size,
-                iterator=True,
-                encoding="utf-8"
-            )
-            for chunk in leitor:
-                tabela = pa.Table.from_pandas(chunk, preserve_index=False)
-                if primeiro:
-                    writer = pq.ParquetWriter(
-                        caminho_parquet,
-                        schema=tabela.schema,
-                        compression="snappy"
-                    )
-                    primeiro = False
-                writer.write_table(tabela)
-            if writer:
-                writer.close()
-                progresso.write(f"✅ {arquivo} convertido com chunking.")
-            else:
-                progresso.write(f"❌ Falha ao abrir writer para {arquivo}.")
+            _converter_csv(caminho_csv, caminho_parquet, nome_tabela, chunk_size, orcamento)
+            progresso.write(f"✅ {arquivo} convertido com chunking.")
         else:
-            # conversão padrão para arquivos menores
             try:
-                df = pd.read_csv(caminho_csv, dtype=str, encoding="utf-8")
-                df.to_parquet(
-                    caminho_parquet,
-                    index=False,
-                    engine="pyarrow",
-                    compression="snappy"
-                )
+                _converter_csv(caminho_csv, caminho_parquet, nome_tabela, chunk_size, orcamento)
                 progresso.write(f"✅ {arquivo} convertido com sucesso.")
             except Exception as e:
                 progresso.write(f"❌ Erro ao processar {arquivo}: {e}")
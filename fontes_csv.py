@@ -0,0 +1,100 @@
+import os
+from collections import namedtuple
+from contextlib import contextmanager
+from zipfile import ZipFile, is_zipfile
+
+# Uma fonte de dados: arquivo solto (membro=None) ou membro de um arquivo ZIP
+Fonte = namedtuple("Fonte", ["nome", "caminho", "membro"])
+
+
+def listar_fontes(caminho_pasta, ignorar=()):
+    """
+    Lista as fontes de dados de uma pasta, em ordem alfabética.
+
+    - Arquivos soltos entram como estão
+    - Arquivos ZIP são abertos e cada membro vira uma fonte, lida sem extração para o disco
+    - Arquivos ocultos (iniciados por '.') e os nomes em 'ignorar' são desconsiderados
+    """
+
+    fontes = []
+    for arquivo in sorted(os.listdir(caminho_pasta)):
+        if arquivo.startswith(".") or arquivo in ignorar:
+            continue
+
+        caminho_arquivo = os.path.join(caminho_pasta, arquivo)
+        if not os.path.isfile(caminho_arquivo):
+            continue
+
+        if arquivo.lower().endswith(".zip") and is_zipfile(caminho_arquivo):
+            with ZipFile(caminho_arquivo) as zip_ref:
+                for info in zip_ref.infolist():
+                    if not info.is_dir():
+                        fontes.append(Fonte(f"{arquivo}/{info.filename}", caminho_arquivo, info.filename))
+        else:
+            fontes.append(Fonte(arquivo, caminho_arquivo, None))
+
+    return fontes
+
+
+def como_fonte(arquivo):
+    """
+    Converte um caminho de arquivo em Fonte. Um ZIP vira o seu primeiro membro.
+    Objetos Fonte são devolvidos sem alteração.
+    """
+
+    if isinstance(arquivo, Fonte):
+        return arquivo
+
+    if arquivo.lower().endswith(".zip") and is_zipfile(arquivo):
+        with ZipFile(arquivo) as zip_ref:
+            membros = [info.filename for info in zip_ref.infolist() if not info.is_dir()]
+        if membros:
+            return Fonte(f"{os.path.basename(arquivo)}/{membros[0]}", arquivo, membros[0])
+
+    return Fonte(os.path.basename(arquivo), arquivo, None)
+
+
+def localizar_fonte(caminho_pasta, sufixos):
+    """
+    Retorna a primeira fonte da pasta cujo nome termina com um dos sufixos (sem diferenciar maiúsculas),
+    procurando tanto em arquivos extraídos quanto dentro dos ZIPs. Retorna None se não encontrar.
+    """
+
+    if isinstance(sufixos, str):
+        sufixos = (sufixos,)
+    sufixos = tuple(s.upper() for s in sufixos)
+
+    if not os.path.isdir(caminho_pasta):
+        return None
+
+    for fonte in listar_fontes(caminho_pasta):
+        if fonte.nome.upper().endswith(sufixos):
+            return fonte
+    return None
+
+
+def tamanho_fonte(fonte):
+    """
+    Tamanho, em bytes, do conteúdo da fonte (descompactado, no caso de membros de ZIP).
+    """
+
+    fonte = como_fonte(fonte)
+    if fonte.membro is None:
+        return os.path.getsize(fonte.caminho)
+    with ZipFile(fonte.caminho) as zip_ref:
+        return zip_ref.getinfo(fonte.membro).file_size
+
+
+@contextmanager
+def abrir_fonte(fonte):
+    """
+    Abre a fonte em modo binário. Membros de ZIP são descompactados à medida que são lidos.
+    """
+
+    fonte = como_fonte(fonte)
+    if fonte.membro is None:
+        with open(fonte.caminho, "rb") as f:
+            yield f
+    else:
+        with ZipFile(fonte.caminho) as zip_ref, zip_ref.open(fonte.membro) as f:
+            yield f
@@ -1,107 +1,393 @@
 import os
+import json
+import queue
+import shutil
+import threading
+import contextvars
 import requests
 from tqdm import tqdm
 from zipfile import ZipFile
 from bs4 import BeautifulSoup
+from urllib.parse import urlparse
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from metricas import registrar_arquivo
 
-def get_files_online(urls, caminho_destino):
+# Uma sessão (pool de conexões keep-alive) por host
+_sessoes = {}
+_trava_sessoes = threading.Lock()
+
+# Subpasta (oculta) onde ficam os downloads incompletos, retomados na execução seguinte
+PASTA_PARCIAIS = ".downloads_parciais"
+
+
+def obter_sessao(url, tamanho_pool=8):
+    """
+    Retorna a sessão HTTP compartilhada do host da URL, criando-a na primeira chamada.
+
+    A sessão mantém as conexões TCP/TLS abertas (keep-alive) entre downloads,
+    evitando um novo handshake a cada arquivo do mesmo servidor.
+    """
+
+    host = urlparse(url).netloc
+    with _trava_sessoes:
+        sessao = _sessoes.get(host)
+        if sessao is None:
+            sessao = requests.Session()
+            adaptador = HTTPAdapter(pool_connections=1, pool_maxsize=tamanho_pool)
+            sessao.mount("http://", adaptador)
+            sessao.mount("https://", adaptador)
+            _sessoes[host] = sessao
+        return sessao
+
+
+def nome_local(indice, url):
+    """Nome com que o arquivo da URL (na posição 'indice' da lista baixada) é salvo na pasta de destino."""
+    return f"file_{indice}_" + os.path.basename(url)
+
+
+def _extrair_zip(caminho_arquivo, caminho_destino, nome_arquivo):
+    """
+    Extrai um ZIP baixado para 'caminho_destino', renomeia o CSV de CNAEs e remove o ZIP.
+    Retorna True se a extração foi concluída.
+    """
+
+    try:
+        tqdm.write(f"📦 Extraindo: {nome_arquivo}")
+        with ZipFile(caminho_arquivo, 'r') as zip_ref:
+                zip_ref.extractall(caminho_destino)
+                for nome in zip_ref.namelist():
+                    if "CNAE" in nome.upper() and nome.upper().endswith("CSV"):
+                        caminho_origem = os.path.join(caminho_destino, nome)
+                        caminho_destino_csv = os.path.join(caminho_destino, "cnaes_original.csv")
+                        os.rename(caminho_origem, caminho_destino_csv)
+        os.remove(caminho_arquivo)
+        tqdm.write(f"🗑️ Deletando ZIP: {nome_arquivo}")
+        return True
+    except Exception as e:
+        tqdm.write(f"❌ Erro ao extrair {nome_arquivo}: {e}")
+        return False
+
+
+def _consultar_servidor(sessao, url):
+    """
+    Consulta o servidor (HEAD) e retorna (tamanho, aceita_range, validador, cabecalhos).
+
+    O validador (ETag ou Last-Modified) garante que bytes parciais de uma versão
+    anterior do arquivo não sejam misturados com a versão atual ao retomar.
+    """
+
+    try:
+        resposta = sessao.head(url, timeout=30, verify=False, allow_redirects=True)
+        resposta.raise_for_status()
+    except Exception:
+        return 0, False, None, {}
+
+    tamanho = int(resposta.headers.get('content-length', 0))
+    aceita_range = resposta.headers.get('accept-ranges', '').lower() == 'bytes'
+    validador = resposta.headers.get('ETag') or resposta.headers.get('Last-Modified')
+    return tamanho, aceita_range, validador, resposta.headers
+
+
+def _verificar_inalterado(url, manifesto, tamanho_pool):
+    """
+    Faz um HEAD condicional (If-None-Match / If-Modified-Since) e indica se a URL
+    continua igual à versão registrada no manifesto.
+    """
+
+    try:
+        resposta = obter_sessao(url, tamanho_pool).head(
+            url, headers=manifesto.cabecalhos_condicionais(url),
+            timeout=30, verify=False, allow_redirects=True
+        )
+        if resposta.status_code != 304:
+            resposta.raise_for_status()
+    except Exception:
+        return False
+
+    return manifesto.inalterado(url, resposta.status_code, resposta.headers)
+
+
+def _preparar_parciais(caminho_parcial, plano):
+    """
+    Lê o plano gravado junto aos arquivos parciais de um download anterior.
+    Se o arquivo remoto mudou (tamanho, validador ou segmentação), descarta os parciais.
+    """
+
+    caminho_plano = caminho_parcial + ".json"
+    try:
+        with open(caminho_plano, encoding="utf-8") as f:
+            plano_anterior = json.load(f)
+    except (OSError, ValueError):
+        plano_anterior = None
+
+    if plano_anterior != plano:
+        for k in range(max(plano["segmentos"], (plano_anterior or {}).get("segmentos", 1))):
+            caminho_parte = f"{caminho_parcial}.{k}"
+            if os.path.exists(caminho_parte):
+                os.remove(caminho_parte)
+        with open(caminho_plano, "w", encoding="utf-8") as f:
+            json.dump(plano, f)
+
+
+def _baixar_faixa(sessao, url, caminho_parte, inicio, fim, validador, atualizar, tentativas):
+    """
+    Baixa os bytes [inicio, fim] da URL para 'caminho_parte' (fim=None vai até o final do arquivo).
+
+    Retoma a partir dos bytes já presentes em disco usando o cabeçalho Range,
+    com até 'tentativas' reconexões. Retorna True se a faixa foi concluída.
+    """
+
+    for tentativa in range(1, tentativas + 1):
+        ja_baixado = os.path.getsize(caminho_parte) if os.path.exists(caminho_parte) else 0
+        if fim is not None and inicio + ja_baixado > fim:
+            return True
+
+        # Segmentos com 'fim' sempre pedem a sua faixa, inclusive o primeiro (que começa no byte 0)
+        cabecalhos = {}
+        if inicio + ja_baixado > 0 or fim is not None:
+            cabecalhos['Range'] = f"bytes={inicio + ja_baixado}-{'' if fim is None else fim}"
+            if validador:
+                cabecalhos['If-Range'] = validador
+
+        try:
+            with sessao.get(url, headers=cabecalhos, stream=True, timeout=30, verify=False) as resposta:
+                if resposta.status_code == 416 and fim is None:
+                    return True  # Nada a acrescentar: o parcial já está completo
+                resposta.raise_for_status()
+
+                modo = 'ab'
+                if 'Range' in cabecalhos and resposta.status_code != 206:
+                    # Servidor ignorou o Range (ou o arquivo mudou): recomeça a faixa do zero,
+                    # o que só é possível quando a faixa é o arquivo inteiro
+                    if inicio > 0 or fim is not None:
+                        raise Exception("servidor não aceitou a requisição por faixa (Range)")
+                    atualizar(-ja_baixado)
+                    modo = 'wb'
+
+                with open(caminho_parte, modo) as f:
+                    for dados in resposta.iter_content(chunk_size=1024 * 1024):  # 1 MB
+                        if dados:
+                            f.write(dados)
+                            atualizar(len(dados))
+            return True
+        except Exception as e:
+            tqdm.write(f"⚠️ Tentativa {tentativa}/{tentativas} falhou para {url}: {e}")
+
+    return False
+
+
+def _baixar_url(url, caminho_arquivo, nome_arquivo, posicoes, tamanho_pool, segmentos=1, tentativas=3,
+                manifesto=None, alterados=None):
+    """
+    Baixa uma URL para 'caminho_arquivo' usando a sessão do host, com barra de progresso própria.
+
+    - Os bytes são gravados em arquivos parciais na subpasta PASTA_PARCIAIS e, se a conexão cair,
+      o próximo download retoma do ponto em que parou (HTTP Range)
+    - Com 'segmentos' > 1 e servidor compatível, o arquivo é baixado em várias faixas de bytes paralelas
+    - Com 'manifesto', registra a versão baixada e, se o conteúdo mudou, acrescenta a URL a 'alterados'
+    Retorna True se o download foi concluído.
+    """
+
+    tqdm.write(f"\n🔄 Baixando: {url}")
+    sessao = obter_sessao(url, tamanho_pool)
+    total, aceita_range, validador, cabecalhos = _consultar_servidor(sessao, url)
+
+    if not (aceita_range and total > 0):
+        segmentos = 1
+    segmentos = max(1, min(segmentos, total // (1024 * 1024) or 1))
+
+    pasta_parciais = os.path.join(os.path.dirname(caminho_arquivo), PASTA_PARCIAIS)
+    os.makedirs(pasta_parciais, exist_ok=True)
+    caminho_parcial = os.path.join(pasta_parciais, nome_arquivo)
+    _preparar_parciais(caminho_parcial, {
+        "url": url, "tamanho": total, "validador": validador, "segmentos": segmentos
+    })
+
+    # Faixas de bytes [inicio, fim] de cada segmento
+    if segmentos == 1:
+        faixas = [(0, None)]
+    else:
+        passo = -(-total // segmentos)
+        faixas = [(k * passo, min((k + 1) * passo, total) - 1) for k in range(segmentos)]
+    partes = [f"{caminho_parcial}.{k}" for k in range(segmentos)]
+    ja_baixado = sum(os.path.getsize(p) for p in partes if os.path.exists(p))
+
+    posicao = posicoes.get()
+    trava_barra = threading.Lock()
+
+    try:
+        with tqdm(
+            desc=f"    🟢 {nome_arquivo}",
+            total=total if total > 0 else None,
+            initial=ja_baixado,
+            unit='B',
+            unit_scale=True,
+            unit_divisor=1024,
+            dynamic_ncols=True,
+            position=posicao,
+            leave=False
+        ) as barra:
+
+            def atualizar(n):
+                with trava_barra:
+                    barra.update(n)
+
+            if ja_baixado:
+                tqdm.write(f"↪️ Retomando {nome_arquivo} a partir de {ja_baixado} bytes já baixados")
+
+            with ThreadPoolExecutor(max_workers=segmentos) as executor:
+                concluidos = list(executor.map(
+                    lambda k: _baixar_faixa(sessao, url, partes[k], faixas[k][0], faixas[k][1],
+                                            validador, atualizar, tentativas),
+                    range(segmentos)
+                ))
+
+        if not all(concluidos):
+            tqdm.write(f"❌ Erro ao baixar {url}: download incompleto (os bytes baixados serão reaproveitados na próxima execução)")
+            return False
+
+        baixado = sum(os.path.getsize(p) for p in partes)
+        if total > 0 and baixado != total:
+            for parte in partes:
+                os.remove(parte)
+            tqdm.write(f"❌ Erro ao baixar {url}: tamanho inesperado ({baixado} de {total} bytes)")
+            return False
+
+        # Junta as partes no arquivo final
+        if segmentos == 1:
+            os.replace(partes[0], caminho_arquivo)
+        else:
+            with open(caminho_arquivo, 'wb') as f:
+                for parte in partes:
+                    with open(parte, 'rb') as p:
+                        shutil.copyfileobj(p, f, 1024 * 1024)
+                    os.remove(parte)
+        os.remove(caminho_parcial + ".json")
+        registrar_arquivo(url, bytes_baixados=baixado - ja_baixado)
+
+        if manifesto is None or manifesto.registrar(url, caminho_arquivo, cabecalhos):
+            if alterados is not None:
+                alterados.add(url)
+
+        tqdm.write(f"✅ Download concluído: {caminho_arquivo}")
+        return True
+    except Exception as e:
+        tqdm.write(f"❌ Erro ao salvar {nome_arquivo}: {e}")
+        return False
+    finally:
+        posicoes.put(posicao)
+
+
+def get_files_online(urls, caminho_destino, max_workers=4, segmentos=1, tentativas=3,
+                     manifesto=None, forcar=False, extrair=True):
     
     """
     Faz download e extração de arquivos (ZIP ou CSV) a partir de uma lista de URLs.
 
-    - Suporta arquivos ZIP com extração automática
+    - Baixa até 'max_workers' arquivos ao mesmo tempo, reaproveitando uma sessão keep-alive por host
+    - Retoma downloads interrompidos a partir dos bytes já salvos (HTTP Range), com até
+      'tentativas' reconexões por arquivo
+    - Com 'segmentos' > 1, baixa cada arquivo grande em várias faixas de bytes paralelas
+    - Com 'manifesto' (ManifestoDownloads), consulta antes o servidor com requisições condicionais:
+      se nenhuma URL mudou desde a última execução (e 'forcar' for False), não baixa nada
+    - Extrai cada ZIP em segundo plano assim que o seu download termina,
+      enquanto os demais downloads continuam
+    - Com 'extrair=False', mantém os ZIPs como baixados; as transformações leem os membros
+      diretamente do ZIP (ver fontes_csv.py), evitando a gravação extra e o pico de espaço em disco
     - Mostra barra de progresso para cada arquivo
     - Salva todos os arquivos em 'caminho_destino'
+
+    Retorna (alterados, falhas): as URLs cujo conteúdo mudou (sem manifesto, todas as baixadas
+    com sucesso) e as URLs que não puderam ser baixadas ou extraídas.
+    Como as transformações consolidam todos os arquivos de uma fonte, basta uma URL
+    alterada para que a fonte inteira seja baixada novamente.
     """
 
     os.makedirs(caminho_destino, exist_ok=True)
+    max_workers = max(1, max_workers)
+    alterados = set()
 
-    for i, url in enumerate(urls):
-        nome_arquivo = f"file_{i}_" + os.path.basename(url)
-        caminho_arquivo = os.path.join(caminho_destino, nome_arquivo)
+    if manifesto is not None and not forcar and urls:
+        with ThreadPoolExecutor(max_workers=max_workers) as consultas:
+            inalterados = list(consultas.map(
+                lambda url: _verificar_inalterado(url, manifesto, max_workers), urls
+            ))
+        if all(inalterados):
+            print(f"\n♻️ Nenhuma alteração desde a última execução ({len(urls)} arquivo(s)). Download dispensado.")
+            return [], []
 
-        print(f"\n🔄 Baixando: {url}")
-        try:
-            resposta = requests.get(url, stream=True, timeout=30, verify=False)
-            resposta.raise_for_status()
-        except Exception as e:
-            print(f"❌ Erro ao baixar {url}: {e}")
-            continue
+    # Posições livres das barras de progresso (uma por download simultâneo)
+    posicoes = queue.Queue()
+    for posicao in range(max_workers):
+        posicoes.put(posicao)
 
-        total = int(resposta.headers.get('content-length', 0))
+    with ThreadPoolExecutor(max_workers=max_workers) as downloads, \
+         ThreadPoolExecutor(max_workers=1) as extracoes:
 
-        try:
-            with open(caminho_arquivo, 'wb') as f, tqdm(
-                desc=f"    🟢 {nome_arquivo}",
-                total=total if total > 0 else None,
-                unit='B',
-                unit_scale=True,
-                unit_divisor=1024,
-                dynamic_ncols=True,
-                leave=True
-            ) as barra:
-                for dados in resposta.iter_content(chunk_size=1024 * 1024):  # 1 MB
-                    if dados:
-                        f.write(dados)
-                        barra.update(len(dados))
-            print(f"✅ Download concluído: {caminho_arquivo}")
-        except Exception as e:
-            print(f"❌ Erro ao salvar {nome_arquivo}: {e}")
-            continue
-
-        # Extração se for ZIP
-        if nome_arquivo.endswith(".zip"):
-            try:
-                print(f"📦 Extraindo: {nome_arquivo}")
-                with ZipFile(caminho_arquivo, 'r') as zip_ref:
-                        zip_ref.extractall(caminho_destino)
-                        for nome in zip_ref.namelist():
-                            if "CNAE" in nome.upper() and nome.upper().endswith("CSV"):
-                                caminho_origem = os.path.join(caminho_destino, nome)
-                                caminho_destino_csv = os.path.join(caminho_destino, "cnaes_original.csv")
-                                os.rename(caminho_origem, caminho_destino_csv)
-                os.remove(caminho_arquivo)
-                print(f"🗑️ Deletando ZIP: {nome_arquivo}")
-            except Exception as e:
-                print(f"❌ Erro ao extrair {nome_arquivo}: {e}")
+        futuros = {}
+        for i, url in enumerate(urls):
+            nome_arquivo = nome_local(i, url)
+            caminho_arquivo = os.path.join(caminho_destino, nome_arquivo)
+            # Cada download roda no contexto de quem chamou, para as métricas da etapa (ver metricas.py)
+            futuro = downloads.submit(
+                contextvars.copy_context().run, _baixar_url, url, caminho_arquivo, nome_arquivo, posicoes,
+                max_workers * max(1, segmentos), segmentos, tentativas, manifesto, alterados
+            )
+            futuros[futuro] = (url, caminho_arquivo, nome_arquivo)
+
+        falhas = set()
+        pendentes_extracao = {}
+        for futuro in as_completed(futuros):
+            url, caminho_arquivo, nome_arquivo = futuros[futuro]
+            if not futuro.result():
+                falhas.add(url)
+                continue
+
+            # Extração se for ZIP
+            if extrair and nome_arquivo.endswith(".zip"):
+                pendentes_extracao[url] = extracoes.submit(_extrair_zip, caminho_arquivo, caminho_destino,
+                                                           nome_arquivo)
+
+        for url, extracao in pendentes_extracao.items():
+            if not extracao.result():
+                falhas.add(url)
 
     print(f"\n📁 Todos os arquivos foram processados em: {caminho_destino}")
+    if falhas:
+        print(f"❌ {len(falhas)} de {len(urls)} arquivo(s) não foram baixados ou extraídos.")
+    return [url for url in urls if url in alterados], [url for url in urls if url in falhas]
 
 
-def get_latest_cnpj_urls(url_base, tipo_arquivo='Estabelecimentos'):
-   
+def listar_diretorio(url):
     """
-    Retorna os links dos arquivos mais recentes da Receita Federal
-    para o tipo especificado (ex: Estabelecimentos, Empresas, Socios...).
+    Retorna os links (href) da página de listagem de um diretório do servidor.
     """
 
     try:
-        resposta = requests.get(url_base, stream=True, timeout=30, verify=False)
+        resposta = obter_sessao(url).get(url, timeout=30, verify=False)
         resposta.raise_for_status()
     except Exception as e:
-        raise Exception(f"Erro ao acessar a URL base: {e}")
+        raise Exception(f"Erro ao acessar {url}: {e}")
 
     soup = BeautifulSoup(resposta.text, 'html.parser')
+    return [link['href'] for link in soup.find_all('a', href=True)]
 
-    meses = sorted(set(link['href'].strip('/') for link in soup.find_all('a', href=True)
-                       if link['href'].startswith('20')), reverse=True)
 
-    if not meses:
-        raise Exception("Nenhum diretório de mês encontrado no site da Receita.")
-
-    url_mais_recente = url_base + meses[0] + "/"
-    print(f"🗂️  Usando dados mais recentes de: {url_mais_recente}")
-
-    try:
-        resposta_mes = requests.get(url_mais_recente, timeout=30)
-        resposta_mes.raise_for_status()
-    except Exception as e:
-        raise Exception(f"Erro ao acessar o diretório mais recente: {e}")
+def get_latest_cnpj_urls(url_base, tipo_arquivo='Estabelecimentos', listagem=None):
+   
+    """
+    Retorna os links dos arquivos mais recentes da Receita Federal
+    para o tipo especificado (ex: Estabelecimentos, Empresas, Socios...).
 
-    soup_mes = BeautifulSoup(resposta_mes.text, 'html.parser')
-    links_mes = soup_mes.find_all('a', href=True)
+    Com 'listagem' (ListagemReceita, ver listagem_receita.py), os diretórios são consultados
+    uma única vez e o mesmo mês é usado para todos os tipos; sem ela, cada chamada consulta o servidor.
+    """
 
-    return [url_mais_recente + link['href'] for link in links_mes if tipo_arquivo in link['href']]
+    if listagem is None:
+        from listagem_receita import ListagemReceita
+        listagem = ListagemReceita(url_base)
+    return listagem.urls(tipo_arquivo)
 
 def baixar_arquivo_simples(url, destino, nome_arquivo):
     
@@ -119,7 +405,7 @@ def baixar_arquivo_simples(url, destino, nome_arquivo):
 
     print(f"\n🔄 Baixando arquivo: {url}")
     try:
-        resposta = requests.get(url, timeout=30, verify=False)  # SSL desativado por segurança pública do site
+        resposta = obter_sessao(url).get(url, timeout=30, verify=False)  # SSL desativado por segurança pública do site
         resposta.raise_for_status()
     except Exception as e:
         print(f"❌ Erro ao baixar {url}: {e}")
@@ -0,0 +1,183 @@
+import os
+import math
+import shutil
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from metricas import registrar_arquivo
+from orcamento_memoria import OrcamentoMemoria
+
+# Tabela larga gerada: estabelecimentos com os atributos da empresa (matriz) ao lado
+NOME_TABELA_LARGA = "estabelecimentos_empresas"
+
+# Atributos de dados_empresa acrescentados a cada estabelecimento
+COLUNAS_EMPRESA = ["razao_social", "natureza_juridica", "capital_social", "porte"]
+
+# Bytes em memória por byte descomprimido das duas tabelas ao juntar uma partição
+# (tabelas lidas, índice de ordenação, colunas copiadas com take e o bloco de saída)
+FATOR_MEMORIA = 3
+
+
+def _bytes_descomprimidos(arquivo, colunas):
+    """Tamanho descomprimido, em bytes, das colunas informadas de um Parquet (lido dos metadados)."""
+    metadados = arquivo.metadata
+    total = 0
+    for i in range(metadados.num_row_groups):
+        grupo = metadados.row_group(i)
+        for j in range(grupo.num_columns):
+            coluna = grupo.column(j)
+            if coluna.path_in_schema in colunas:
+                total += coluna.total_uncompressed_size
+    return total
+
+
+def calcular_particoes(arquivo_estab, arquivo_empresas, colunas_empresa, limite):
+    """
+    Quantidade de partições por hash do CNPJ básico para que cada partição (estabelecimentos
+    e empresas correspondentes) caiba em 'limite' bytes durante a junção. 1 = cabe tudo de uma vez.
+    """
+
+    necessario = FATOR_MEMORIA * (
+        _bytes_descomprimidos(arquivo_estab, arquivo_estab.schema_arrow.names)
+        + _bytes_descomprimidos(arquivo_empresas, ["cnpj_basico"] + list(colunas_empresa))
+    )
+    return max(1, math.ceil(necessario / limite))
+
+
+def _particao(chaves, particoes):
+    """Partição de cada CNPJ básico (int64): hash multiplicativo, que espalha chaves sequenciais."""
+    valores = pc.fill_null(chaves, 0).to_numpy(zero_copy_only=False).astype(np.uint64)
+    return ((valores * np.uint64(0x9E3779B97F4A7C15)) >> np.uint64(32)) % np.uint64(particoes)
+
+
+def _distribuir(arquivo, colunas, chave, particoes, pasta, prefixo):
+    """
+    Distribui as linhas do Parquet entre 'particoes' arquivos ('prefixo'_NNNN.parquet em 'pasta'),
+    row group a row group: só um row group da origem fica em memória por vez.
+    Retorna os caminhos das partições (as vazias não são gravadas).
+    """
+
+    caminhos = [os.path.join(pasta, f"{prefixo}_{k:04d}.parquet") for k in range(particoes)]
+    escritores = {}
+    try:
+        for i in range(arquivo.num_row_groups):
+            lote = arquivo.read_row_group(i, columns=colunas)
+            destino = _particao(lote.column(chave), particoes)
+            ordem = np.argsort(destino, kind="stable")
+            limites = np.searchsorted(destino[ordem], np.arange(particoes + 1))
+            lote = lote.take(pa.array(ordem))
+            for k in range(particoes):
+                if limites[k + 1] > limites[k]:
+                    if k not in escritores:
+                        escritores[k] = pq.ParquetWriter(caminhos[k], schema=lote.schema, compression="snappy")
+                    escritores[k].write_table(lote.slice(limites[k], limites[k + 1] - limites[k]))
+    finally:
+        for escritor in escritores.values():
+            escritor.close()
+    return caminhos
+
+
+def _juntar_particao(estab, empresas, colunas_empresa):
+    """
+    Junta (left join) uma partição de estabelecimentos com as empresas correspondentes:
+    as empresas são ordenadas pelo CNPJ básico e cada estabelecimento é localizado por busca binária,
+    o que preserva a ordem dos estabelecimentos. Sem empresa correspondente, os atributos ficam nulos.
+    """
+
+    empresas = empresas.filter(pc.is_valid(empresas.column("cnpj_basico")))
+    chaves_empresa = empresas.column("cnpj_basico").to_numpy()
+    ordem = np.argsort(chaves_empresa, kind="stable")
+    chaves_empresa = chaves_empresa[ordem]
+
+    chaves = pc.fill_null(estab.column("CNPJ_BASICO"), -1).to_numpy(zero_copy_only=False)
+    if len(chaves_empresa):
+        posicoes = np.minimum(np.searchsorted(chaves_empresa, chaves), len(chaves_empresa) - 1)
+        encontrados = chaves_empresa[posicoes] == chaves
+    else:
+        posicoes = np.zeros(len(chaves), dtype=np.int64)
+        encontrados = np.zeros(len(chaves), dtype=bool)
+
+    # Índices nas empresas originais; None (nulo) onde não há empresa
+    indices = pa.array(ordem[posicoes] if len(ordem) else posicoes, mask=~encontrados)
+    for coluna in colunas_empresa:
+        estab = estab.append_column(empresas.schema.field(coluna), empresas.column(coluna).take(indices))
+    return estab
+
+
+def juntar_empresas(pasta_parquet, destino=None, orcamento=None, colunas_empresa=COLUNAS_EMPRESA):
+    """
+    Gera a tabela larga estabelecimentos_empresas.parquet: cada estabelecimento com os atributos
+    'colunas_empresa' da sua empresa (dados_empresa, pelo CNPJ básico), fora da memória:
+
+    - Calcula, pelos metadados dos Parquet, quantas partições são necessárias para que cada junção
+      caiba no limite do 'orcamento' (OrcamentoMemoria; None = limite automático, ver orcamento_memoria.py)
+    - Distribui as duas tabelas em partições por hash do CNPJ básico, row group a row group
+    - Junta uma partição por vez (busca binária nas empresas da partição) e grava o resultado
+      em row groups do tamanho de bloco do orçamento
+    - Com uma única partição, junta diretamente, sem gravar partições intermediárias
+
+    As linhas saem agrupadas por partição (e, dentro dela, na ordem original).
+    Tudo é gravado em temporários; o arquivo final só é substituído ao término. Retorna as linhas gravadas.
+    """
+
+    destino = destino or os.path.join(pasta_parquet, f"{NOME_TABELA_LARGA}.parquet")
+    orcamento = orcamento or OrcamentoMemoria()
+    arquivo_estab = pq.ParquetFile(os.path.join(pasta_parquet, "estabelecimentos.parquet"))
+    arquivo_empresas = pq.ParquetFile(os.path.join(pasta_parquet, "dados_empresa.parquet"))
+    colunas_empresa = [c for c in colunas_empresa if c != "cnpj_basico"]
+    desconhecidas = [c for c in colunas_empresa if c not in arquivo_empresas.schema_arrow.names]
+    if desconhecidas:
+        raise ValueError(f"Colunas fora de dados_empresa: {desconhecidas}")
+
+    particoes = calcular_particoes(arquivo_estab, arquivo_empresas, colunas_empresa, orcamento.limite)
+    print(f"🔗 Juntando estabelecimentos e empresas em {particoes} partição(ões) "
+          f"(limite de {orcamento.limite_mb} MB)...")
+
+    pasta_particoes = os.path.join(os.path.dirname(os.path.abspath(destino)), f".particoes_{NOME_TABELA_LARGA}")
+    shutil.rmtree(pasta_particoes, ignore_errors=True)
+    colunas_lidas = ["cnpj_basico"] + colunas_empresa
+    if particoes > 1:
+        os.makedirs(pasta_particoes)
+        partes_estab = _distribuir(arquivo_estab, None, "CNPJ_BASICO", particoes, pasta_particoes, "estab")
+        partes_empresas = _distribuir(arquivo_empresas, colunas_lidas, "cnpj_basico", particoes, pasta_particoes,
+                                      "empresas")
+        pares = list(zip(partes_estab, partes_empresas))
+    else:
+        pares = [(arquivo_estab, arquivo_empresas)]
+
+    linhas = 0
+    escritor = None
+    try:
+        for parte_estab, parte_empresas in pares:
+            if isinstance(parte_estab, str) and not os.path.exists(parte_estab):
+                continue
+            estab = parte_estab.read() if isinstance(parte_estab, pq.ParquetFile) else pq.read_table(parte_estab)
+            if isinstance(parte_empresas, pq.ParquetFile):
+                empresas = parte_empresas.read(columns=colunas_lidas)
+            elif os.path.exists(parte_empresas):
+                empresas = pq.read_table(parte_empresas)
+            else:
+                empresas = pa.table({c: pa.array([], arquivo_empresas.schema_arrow.field(c).type)
+                                     for c in colunas_lidas})
+
+            tabela = _juntar_particao(estab, empresas, colunas_empresa)
+            del estab, empresas
+            if escritor is None:
+                escritor = pq.ParquetWriter(destino + ".tmp", schema=tabela.schema, compression="snappy")
+            linhas_por_grupo = orcamento.linhas_por_bloco(tabela.nbytes / max(1, tabela.num_rows))
+            escritor.write_table(tabela, row_group_size=linhas_por_grupo)
+            linhas += tabela.num_rows
+    finally:
+        if escritor is not None:
+            escritor.close()
+        shutil.rmtree(pasta_particoes, ignore_errors=True)
+
+    if escritor is None:
+        print("⚠️ Nenhum estabelecimento encontrado. Tabela larga não gerada.")
+        return 0
+
+    os.replace(destino + ".tmp", destino)
+    registrar_arquivo(destino, bytes_gravados=os.path.getsize(destino), linhas_gravadas=linhas)
+    print(f"✅ {linhas} estabelecimentos com os dados da empresa salvos em: {destino}")
+    return linhas
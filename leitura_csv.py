@@ -0,0 +1,155 @@
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+from fontes_csv import abrir_fonte, como_fonte
+from metricas import registrar_arquivo
+from orcamento_memoria import LINHAS_SONDAGEM, LINHAS_MAXIMAS
+
+# Motores de leitura disponíveis para as transformações
+MOTORES = ("pandas", "pyarrow")
+
+
+def _ler_com_pandas(arquivo_fonte, colunas, usecols, encoding, delimitador, chunk_size, orcamento=None):
+    """
+    Lê com o parser do pandas (single-thread), mantendo todas as colunas como texto.
+    Com 'orcamento', cada bloco tem as linhas que cabem no orçamento, pelos bytes por linha do bloco anterior.
+    """
+
+    leitor = pd.read_csv(
+        arquivo_fonte,
+        encoding=encoding,
+        delimiter=delimitador,
+        names=colunas,
+        header=None if colunas else 0,
+        usecols=usecols,
+        index_col=False,
+        dtype=str,
+        chunksize=LINHAS_SONDAGEM if orcamento is not None else chunk_size
+    )
+
+    if orcamento is not None:
+        linhas = LINHAS_SONDAGEM
+        while True:
+            try:
+                bloco = leitor.get_chunk(linhas)
+            except StopIteration:
+                return
+            yield bloco
+            linhas = orcamento.linhas_por_bloco(bloco.memory_usage(deep=True).sum() / max(1, len(bloco)))
+    elif chunk_size is None:
+        yield leitor
+    else:
+        yield from leitor
+
+
+def _ler_com_pyarrow(arquivo_fonte, colunas, usecols, encoding, delimitador, chunk_size, orcamento=None,
+                     nome_fonte=None):
+    """
+    Lê com o leitor CSV em streaming do Arrow (multithread), que decodifica
+    o arquivo em blocos paralelos e só materializa as colunas projetadas em 'usecols'.
+    Com 'orcamento', os lotes são acumulados até ocuparem os bytes de um bloco do orçamento
+    (ou LINHAS_MAXIMAS linhas).
+
+    Linhas com número incorreto de colunas são descartadas (o pandas completa ou corta os campos);
+    ao final, o total descartado é avisado e somado às linhas lidas de 'nome_fonte' nas métricas,
+    sem entrar nas linhas filtradas.
+    """
+
+    descartadas = 0
+
+    def descartar(linha):
+        nonlocal descartadas
+        descartadas += 1
+        return "skip"
+
+    opcoes_leitura = pacsv.ReadOptions(
+        encoding=encoding,
+        column_names=colunas,
+        autogenerate_column_names=False,
+        block_size=16 * 1024 * 1024
+    )
+    opcoes_parse = pacsv.ParseOptions(
+        delimiter=delimitador,
+        invalid_row_handler=descartar  # ignora (e conta) linhas com número incorreto de colunas
+    )
+    opcoes_conversao = pacsv.ConvertOptions(
+        include_columns=usecols,
+        column_types={c: pa.string() for c in (usecols or colunas or [])},
+        strings_can_be_null=True
+    )
+
+    leitor = pacsv.open_csv(
+        arquivo_fonte,
+        read_options=opcoes_leitura,
+        parse_options=opcoes_parse,
+        convert_options=opcoes_conversao
+    )
+
+    # Texto em todas as colunas, como no dtype=str do pandas
+    esquema = pa.schema([pa.field(nome, pa.string()) for nome in leitor.schema.names])
+
+    lotes = []
+    linhas = 0
+    tamanho = 0
+    limite = orcamento.bytes_por_bloco() if orcamento is not None else None
+    for lote in leitor:
+        if lote.schema != esquema:
+            lote = lote.cast(esquema)
+        lotes.append(lote)
+        linhas += lote.num_rows
+        tamanho += lote.nbytes
+        if limite is not None:
+            cheio = tamanho >= limite or linhas >= LINHAS_MAXIMAS
+        else:
+            cheio = chunk_size is not None and linhas >= chunk_size
+        if cheio:
+            yield pa.Table.from_batches(lotes, schema=esquema).to_pandas()
+            lotes = []
+            linhas = 0
+            tamanho = 0
+            limite = orcamento.bytes_por_bloco() if orcamento is not None else None
+
+    # Relatado antes do último bloco: quem lê o arquivo inteiro (ler_csv) não retoma o gerador
+    if descartadas:
+        print(f"⚠️ {nome_fonte}: {descartadas} linha(s) com número incorreto de colunas descartada(s).")
+        registrar_arquivo(nome_fonte, linhas_lidas=descartadas)
+
+    if lotes or (chunk_size is None and orcamento is None):
+        yield pa.Table.from_batches(lotes, schema=esquema).to_pandas()
+
+
+def ler_csv_em_blocos(fonte, colunas=None, usecols=None, encoding="utf-8", delimitador=";",
+                      chunk_size=None, motor="pandas", orcamento=None):
+    """
+    Lê uma fonte CSV (arquivo solto ou membro de ZIP) e devolve DataFrames de texto.
+
+    Parâmetros:
+    - fonte: caminho, ZIP ou Fonte (ver fontes_csv.py)
+    - colunas: nomes de todas as colunas do layout, para arquivos sem cabeçalho
+      (None = a primeira linha é o cabeçalho)
+    - usecols: projeção de colunas; só estas são materializadas
+    - encoding: codificação do arquivo (ex: windows-1251, windows-1252, latin1, utf-8)
+    - chunk_size: linhas por bloco (None = arquivo inteiro em um único DataFrame)
+    - motor: "pandas" (parser padrão) ou "pyarrow" (leitor multithread do Arrow); linhas com número
+      incorreto de colunas são completadas ou cortadas pelo pandas e descartadas (com aviso) pelo Arrow
+    - orcamento: OrcamentoMemoria (ver orcamento_memoria.py); quando informado, substitui 'chunk_size':
+      o tamanho de cada bloco é calculado pelos bytes por linha medidos e recua se a memória apertar
+    """
+
+    if motor not in MOTORES:
+        raise ValueError(f"Motor de leitura desconhecido: {motor} (use um de {MOTORES})")
+
+    with abrir_fonte(fonte) as arquivo_fonte:
+        if motor == "pyarrow":
+            yield from _ler_com_pyarrow(arquivo_fonte, colunas, usecols, encoding, delimitador, chunk_size, orcamento,
+                                        nome_fonte=como_fonte(fonte).nome)
+        else:
+            yield from _ler_com_pandas(arquivo_fonte, colunas, usecols, encoding, delimitador, chunk_size, orcamento)
+
+
+def ler_csv(fonte, **kwargs):
+    """
+    Lê uma fonte CSV inteira em um único DataFrame de texto (ver ler_csv_em_blocos).
+    """
+
+    return next(ler_csv_em_blocos(fonte, chunk_size=None, **kwargs))
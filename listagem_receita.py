@@ -0,0 +1,110 @@
+import os
+import json
+import time
+import threading
+from datetime import datetime
+from get_files_online import listar_diretorio
+
+
+class ListagemReceita:
+    """
+    Listagem dos diretórios de dados abertos do CNPJ (Receita Federal), consultada uma única vez.
+
+    - O índice raiz e o diretório do mês são lidos na primeira consulta e reaproveitados
+      por todas as fontes (Estabelecimentos, Empresas, Naturezas, Cnaes)
+    - O mês é fixado na primeira consulta: um mês publicado no meio da execução não mistura
+      arquivos de meses diferentes
+    - Com 'caminho', a listagem é gravada em JSON e reaproveitada por execuções seguintes
+      por até 'validade' segundos (None = sem validade: sempre consulta o servidor)
+    """
+
+    def __init__(self, url_base, caminho=None, validade=None, mes=None):
+        self.url_base = url_base
+        self.caminho = caminho
+        self.validade = validade
+        self._mes_pedido = mes
+        self._trava = threading.Lock()
+        self._listagem = None
+
+    def _ler_gravada(self):
+        """Listagem gravada em disco, se ainda válida para esta URL base e este mês; None caso contrário."""
+        if not self.caminho or self.validade is None:
+            return None
+        try:
+            with open(self.caminho, encoding="utf-8") as f:
+                listagem = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if listagem.get("url_base") != self.url_base:
+            return None
+        if self._mes_pedido and listagem.get("mes") != self._mes_pedido:
+            return None
+        if time.time() - listagem.get("consultada_em", 0) > self.validade:
+            return None
+        return listagem
+
+    def _consultar(self):
+        """Consulta o índice raiz e o diretório do mês no servidor."""
+        meses = sorted(set(href.strip('/') for href in listar_diretorio(self.url_base)
+                           if href.startswith('20')), reverse=True)
+        if not meses:
+            raise Exception("Nenhum diretório de mês encontrado no site da Receita.")
+
+        mes = self._mes_pedido or meses[0]
+        if mes not in meses:
+            raise Exception(f"O mês {mes} não está disponível no site da Receita (mais recente: {meses[0]}).")
+
+        return {
+            "url_base": self.url_base,
+            "mes": mes,
+            "mes_mais_recente": meses[0],
+            "links": listar_diretorio(self.url_base + mes + "/"),
+            "consultada_em": time.time(),
+        }
+
+    def _gravar(self, listagem):
+        temporario = self.caminho + ".tmp"
+        with open(temporario, "w", encoding="utf-8") as f:
+            json.dump(listagem, f, ensure_ascii=False, indent=2)
+        os.replace(temporario, self.caminho)
+
+    def _obter(self):
+        with self._trava:
+            if self._listagem is None:
+                listagem = self._ler_gravada()
+                if listagem is not None:
+                    consultada = datetime.fromtimestamp(listagem["consultada_em"]).strftime("%Y-%m-%d %H:%M")
+                    print(f"♻️ Listagem da Receita reaproveitada (consultada em {consultada}).")
+                else:
+                    listagem = self._consultar()
+                    if self.caminho:
+                        self._gravar(listagem)
+                print(f"🗂️  Usando dados mais recentes de: {self.url_base}{listagem['mes']}/")
+                self._listagem = listagem
+            return self._listagem
+
+    @property
+    def mes(self):
+        """Mês (AAAA-MM) fixado para esta execução."""
+        return self._obter()["mes"]
+
+    def urls(self, tipo_arquivo='Estabelecimentos'):
+        """
+        Links dos arquivos do mês fixado para o tipo especificado (ex: Estabelecimentos, Empresas, Socios...).
+        """
+        listagem = self._obter()
+        url_mes = self.url_base + listagem["mes"] + "/"
+        return [url_mes + href for href in listagem["links"] if tipo_arquivo in href]
+
+    def reiniciar(self):
+        """Descarta a listagem em memória (a gravada em disco, se válida, continua valendo)."""
+        with self._trava:
+            self._listagem = None
+
+    def descartar(self):
+        """Descarta a listagem em memória e a gravada em disco (a próxima consulta vai ao servidor)."""
+        with self._trava:
+            self._listagem = None
+            if self.caminho and os.path.exists(self.caminho):
+                os.remove(self.caminho)
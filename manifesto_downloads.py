@@ -0,0 +1,112 @@
+import os
+import json
+import hashlib
+import threading
+from datetime import datetime
+
+
+def calcular_sha256(caminho_arquivo, tamanho_bloco=1024 * 1024):
+    """
+    Calcula o hash SHA-256 do conteúdo de um arquivo, lendo em blocos de 1 MB.
+    """
+
+    sha = hashlib.sha256()
+    with open(caminho_arquivo, 'rb') as f:
+        for bloco in iter(lambda: f.read(tamanho_bloco), b''):
+            sha.update(bloco)
+    return sha.hexdigest()
+
+
+class ManifestoDownloads:
+    """
+    Manifesto persistente (JSON) dos arquivos baixados, indexado pela URL.
+
+    Para cada URL guarda ETag, Last-Modified, tamanho e SHA-256 do conteúdo,
+    permitindo requisições condicionais (If-None-Match / If-Modified-Since)
+    e a detecção de fontes que não mudaram desde a última execução.
+
+    As novas entradas ficam pendentes até serem confirmadas com 'confirmar()',
+    o que deve ocorrer só depois que a transformação da fonte terminar com sucesso.
+    Assim, uma falha na transformação não faz a próxima execução pular a fonte.
+    """
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self._trava = threading.Lock()
+        self._pendentes = {}
+        try:
+            with open(caminho, encoding="utf-8") as f:
+                self._entradas = json.load(f)
+        except (OSError, ValueError):
+            self._entradas = {}
+
+    def entrada(self, url):
+        """Retorna a entrada confirmada da URL (ou None)."""
+        with self._trava:
+            return self._entradas.get(url)
+
+    def cabecalhos_condicionais(self, url):
+        """Monta os cabeçalhos If-None-Match / If-Modified-Since a partir da entrada da URL."""
+        entrada = self.entrada(url) or {}
+        cabecalhos = {}
+        if entrada.get("etag"):
+            cabecalhos["If-None-Match"] = entrada["etag"]
+        if entrada.get("last_modified"):
+            cabecalhos["If-Modified-Since"] = entrada["last_modified"]
+        return cabecalhos
+
+    def inalterado(self, url, status, cabecalhos_resposta):
+        """
+        Indica se a resposta (HEAD condicional) do servidor corresponde à versão já registrada.
+        Considera 304 (Not Modified), ETag idêntico ou Last-Modified e tamanho idênticos.
+        """
+
+        entrada = self.entrada(url)
+        if entrada is None:
+            return False
+        if status == 304:
+            return True
+
+        etag = cabecalhos_resposta.get("ETag")
+        if etag and entrada.get("etag"):
+            return etag == entrada["etag"]
+
+        last_modified = cabecalhos_resposta.get("Last-Modified")
+        tamanho = int(cabecalhos_resposta.get("content-length", 0))
+        return bool(
+            last_modified
+            and last_modified == entrada.get("last_modified")
+            and tamanho == entrada.get("tamanho")
+        )
+
+    def registrar(self, url, caminho_arquivo, cabecalhos_resposta):
+        """
+        Registra (como pendente) a versão recém-baixada da URL.
+        Retorna True se o conteúdo mudou em relação à entrada confirmada.
+        """
+
+        sha256 = calcular_sha256(caminho_arquivo)
+        nova = {
+            "etag": cabecalhos_resposta.get("ETag"),
+            "last_modified": cabecalhos_resposta.get("Last-Modified"),
+            "tamanho": os.path.getsize(caminho_arquivo),
+            "sha256": sha256,
+            "baixado_em": datetime.now().isoformat(timespec="seconds")
+        }
+
+        with self._trava:
+            anterior = self._entradas.get(url)
+            self._pendentes[url] = nova
+        return anterior is None or anterior.get("sha256") != sha256
+
+    def confirmar(self, urls):
+        """Confirma as entradas pendentes das URLs informadas e grava o manifesto em disco."""
+        with self._trava:
+            for url in urls:
+                if url in self._pendentes:
+                    self._entradas[url] = self._pendentes.pop(url)
+
+            temporario = self.caminho + ".tmp"
+            with open(temporario, "w", encoding="utf-8") as f:
+                json.dump(self._entradas, f, ensure_ascii=False, indent=2)
+            os.replace(temporario, self.caminho)
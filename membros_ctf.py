@@ -0,0 +1,95 @@
+import os
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from metricas import registrar_arquivo
+
+# Arquivo persistente do conjunto de inscritos no CTF (gravado junto aos Parquet do painel)
+ARQUIVO_MEMBROS = "ctf_membros.parquet"
+
+# Colunas acrescentadas aos estabelecimentos quando marcados com os inscritos no CTF
+COLUNA_TEM_CTF = "TEM_CTF"                # bool: o CNPJ tem alguma inscrição ativa no CTF/APP
+COLUNA_CATEGORIAS_CTF = "CATEGORIAS_CTF"  # texto: categorias CTF do CNPJ, em ordem e sem repetição ("3,9")
+
+
+class MembrosCTF:
+    """
+    Conjunto compacto dos CNPJs inscritos no CTF/APP: array int64 ordenado e sem repetição
+    (a chave de chave_cnpj.py), com as categorias CTF de cada CNPJ.
+
+    A pertinência de um bloco inteiro de CNPJs é verificada com uma única busca binária vetorizada
+    ('sondar'), o que permite marcar os estabelecimentos durante a própria transformação,
+    sem cruzamento com ctf_empresas no painel.
+    """
+
+    def __init__(self, cnpjs, categorias):
+        self.cnpjs = cnpjs            # int64 ordenado, sem repetição
+        self.categorias = categorias  # pa.Array de texto alinhado a 'cnpjs'
+
+    def __len__(self):
+        return len(self.cnpjs)
+
+    @classmethod
+    def de_tabela(cls, tabela):
+        """
+        Monta o conjunto a partir da tabela do CTF (cnpj int64, ctf "categoria-atividade").
+        """
+
+        tabela = tabela.select(["cnpj", "ctf"]).filter(pc.is_valid(tabela.column("cnpj")))
+        # Categoria: parte do código "categoria-atividade" antes do hífen (-1 se fora desse formato)
+        ctf = pc.cast(tabela.column("ctf"), pa.string()).combine_chunks()
+        categoria = pc.extract_regex(ctf, r"^(?P<categoria>\d+)-").field("categoria")
+        categoria = pc.if_else(pc.match_substring_regex(ctf, r"^\d+-"), categoria, pa.scalar(None, pa.string()))
+        cnpjs = tabela.column("cnpj").to_numpy()
+        categoria = pc.fill_null(pc.cast(categoria, pa.int32()), -1).to_numpy(zero_copy_only=False)
+
+        # Pares (cnpj, categoria) distintos, em ordem; depois, as categorias de cada CNPJ juntas em texto
+        ordem = np.lexsort((categoria, cnpjs))
+        cnpjs, categoria = cnpjs[ordem], categoria[ordem]
+        distintos = np.ones(len(cnpjs), dtype=bool)
+        distintos[1:] = (cnpjs[1:] != cnpjs[:-1]) | (categoria[1:] != categoria[:-1])
+        cnpjs, categoria = cnpjs[distintos], categoria[distintos]
+
+        unicos = np.unique(cnpjs)
+        validas = categoria >= 0
+        quantidades = np.bincount(np.searchsorted(unicos, cnpjs[validas]), minlength=len(unicos))
+        deslocamentos = pa.array(np.concatenate([[0], np.cumsum(quantidades)]).astype(np.int32))
+        listas = pa.ListArray.from_arrays(deslocamentos, pa.array(categoria[validas].astype(str), pa.string()))
+        categorias = pc.binary_join(listas, ",")
+        categorias = pc.if_else(pc.equal(categorias, ""), pa.scalar(None, pa.string()), categorias)
+        return cls(unicos, categorias)
+
+    @classmethod
+    def carregar(cls, caminho):
+        """Lê o conjunto gravado por 'gravar'."""
+        tabela = pq.read_table(caminho)
+        return cls(tabela.column("cnpj").to_numpy(),
+                   pc.cast(tabela.column("categorias_ctf"), pa.string()).combine_chunks())
+
+    def gravar(self, caminho):
+        """Grava o conjunto em Parquet (temporário substituído ao final). Retorna o caminho."""
+        tabela = pa.table({
+            "cnpj": pa.array(self.cnpjs, pa.int64()),
+            "categorias_ctf": pc.dictionary_encode(self.categorias),
+        })
+        os.makedirs(os.path.dirname(os.path.abspath(caminho)), exist_ok=True)
+        pq.write_table(tabela, caminho + ".tmp", compression="snappy")
+        os.replace(caminho + ".tmp", caminho)
+        registrar_arquivo(caminho, bytes_gravados=os.path.getsize(caminho), linhas_gravadas=len(self))
+        return caminho
+
+    def sondar(self, chaves):
+        """
+        Verifica, por busca binária, quais chaves int64 (pa.Array, nulos permitidos) estão no CTF.
+        Retorna (tem_ctf, categorias): pa.Array bool e pa.Array de texto (nulo fora do CTF).
+        """
+
+        valores = pc.fill_null(chaves, 0).to_numpy(zero_copy_only=False)
+        if len(self.cnpjs) == 0:
+            return pa.array(np.zeros(len(valores), dtype=bool)), pa.nulls(len(valores), pa.string())
+
+        posicoes = np.minimum(np.searchsorted(self.cnpjs, valores), len(self.cnpjs) - 1)
+        tem_ctf = pa.array((self.cnpjs[posicoes] == valores) & pc.is_valid(chaves).to_numpy(zero_copy_only=False))
+        categorias = pc.if_else(tem_ctf, self.categorias.take(pa.array(posicoes)), pa.scalar(None, pa.string()))
+        return tem_ctf, categorias
@@ -0,0 +1,253 @@
+import os
+import sys
+import json
+import time
+import threading
+import contextvars
+from datetime import datetime
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Valores registrados por arquivo (somados por etapa no relatório)
+# - bytes_baixados: bytes transferidos pela rede nesta execução
+# - bytes_lidos / linhas_lidas: tamanho e linhas das entradas, antes dos filtros
+# - linhas_filtradas: linhas das entradas que passaram pelos filtros
+# - bytes_gravados / linhas_gravadas: tamanho e linhas dos arquivos de saída
+VALORES_ARQUIVO = ("bytes_baixados", "bytes_lidos", "linhas_lidas", "linhas_filtradas",
+                   "bytes_gravados", "linhas_gravadas")
+
+# Etapa em execução no contexto atual (cada etapa do agendador roda na sua própria thread)
+_etapa_atual = contextvars.ContextVar("etapa_atual", default=None)
+
+
+def rss_atual():
+    """Memória residente atual do processo, em bytes; None se não for possível medir."""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _pico_rss_filhos():
+    """Maior pico de RSS entre os processos filhos já encerrados, em bytes (None se indisponível)."""
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    # ru_maxrss vem em bytes no macOS e em KB nos demais
+    return pico if sys.platform == "darwin" else pico * 1024
+
+
+def _tempo_cpu():
+    """Tempo de CPU (usuário + sistema) do processo e dos filhos já encerrados, em segundos."""
+    tempos = os.times()
+    return tempos.user + tempos.system + tempos.children_user + tempos.children_system
+
+
+class Metricas:
+    """
+    Coleta as métricas de uma execução do pipeline, por etapa e por arquivo.
+
+    - Etapa: tempo de relógio, tempo de CPU e pico de RSS (amostrado em segundo plano
+      a cada 'intervalo' segundos enquanto houver etapas em execução)
+    - Arquivo: bytes baixados, lidos e gravados e linhas antes e depois dos filtros (ver VALORES_ARQUIVO),
+      atribuídos à etapa em execução no contexto de quem registra
+
+    O tempo de CPU e o RSS são do processo inteiro: com etapas simultâneas, cada uma vê também
+    o consumo das demais. Processos filhos (transformações com 'processos' > 1) entram no tempo
+    de CPU e, à parte, em 'pico_rss_filhos_bytes'.
+    """
+
+    def __init__(self, intervalo=0.2):
+        self.intervalo = intervalo
+        self.inicio = datetime.now()
+        self.etapas = {}
+        self.arquivos = {}
+        self._ativas = set()
+        self._trava = threading.Lock()
+        self._amostrador = None
+
+    def reiniciar(self):
+        """Descarta as métricas coletadas e marca o início de uma nova execução."""
+        with self._trava:
+            self.inicio = datetime.now()
+            self.etapas = {}
+            self.arquivos = {}
+
+    def _amostrar(self):
+        while True:
+            with self._trava:
+                if not self._ativas:
+                    self._amostrador = None
+                    return
+                rss = rss_atual()
+                if rss is not None:
+                    for nome in self._ativas:
+                        self.etapas[nome]["pico_rss_bytes"] = max(self.etapas[nome]["pico_rss_bytes"] or 0, rss)
+            time.sleep(self.intervalo)
+
+    @contextmanager
+    def etapa(self, nome, **rotulos):
+        """
+        Mede o bloco como a etapa 'nome'; os arquivos registrados dentro dele são atribuídos a ela.
+        'rotulos' (ex: recurso="cpu") são copiados para o relatório.
+        """
+
+        with self._trava:
+            self.etapas[nome] = {
+                "etapa": nome, **rotulos,
+                "inicio": datetime.now().isoformat(timespec="seconds"),
+                "segundos": None, "cpu_segundos": None, "pico_rss_bytes": rss_atual(), "pico_rss_filhos_bytes": None,
+            }
+            self._ativas.add(nome)
+            if self._amostrador is None:
+                self._amostrador = threading.Thread(target=self._amostrar, name="metricas-rss", daemon=True)
+                self._amostrador.start()
+
+        token = _etapa_atual.set(nome)
+        inicio, cpu, filhos = time.perf_counter(), _tempo_cpu(), _pico_rss_filhos()
+        try:
+            yield self.etapas[nome]
+        finally:
+            _etapa_atual.reset(token)
+            with self._trava:
+                self._ativas.discard(nome)
+                medicao = self.etapas[nome]
+                medicao["segundos"] = round(time.perf_counter() - inicio, 3)
+                medicao["cpu_segundos"] = round(_tempo_cpu() - cpu, 3)
+                rss = rss_atual()
+                if rss is not None:
+                    medicao["pico_rss_bytes"] = max(medicao["pico_rss_bytes"] or 0, rss)
+                elif resource is not None:
+                    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+                    medicao["pico_rss_bytes"] = pico if sys.platform == "darwin" else pico * 1024
+                # O pico dos filhos só é atribuído à etapa se aumentou durante ela
+                depois = _pico_rss_filhos()
+                if depois is not None and depois != filhos:
+                    medicao["pico_rss_filhos_bytes"] = depois
+
+    def registrar_arquivo(self, arquivo, etapa=None, **valores):
+        """
+        Soma 'valores' (ver VALORES_ARQUIVO) às métricas do arquivo na etapa informada
+        (por padrão, a etapa em execução no contexto atual).
+        """
+
+        desconhecidos = [v for v in valores if v not in VALORES_ARQUIVO]
+        if desconhecidos:
+            raise ValueError(f"Métricas de arquivo desconhecidas: {desconhecidos}")
+
+        etapa = etapa or _etapa_atual.get()
+        with self._trava:
+            registro = self.arquivos.setdefault((etapa, str(arquivo)), {"etapa": etapa, "arquivo": str(arquivo)})
+            for nome, valor in valores.items():
+                if valor is not None:
+                    registro[nome] = registro.get(nome, 0) + int(valor)
+
+    def relatorio(self, **extras):
+        """
+        Monta o relatório da execução: 'etapas' (com os totais dos seus arquivos) e 'arquivos'.
+        'extras' (ex: situação das etapas, configuração) são acrescentados no primeiro nível.
+        """
+
+        with self._trava:
+            etapas = [dict(medicao) for medicao in self.etapas.values()]
+            arquivos = [dict(registro) for registro in self.arquivos.values()]
+
+        for medicao in etapas:
+            for valor in VALORES_ARQUIVO:
+                parcelas = [a[valor] for a in arquivos if a["etapa"] == medicao["etapa"] and valor in a]
+                if parcelas:
+                    medicao[valor] = sum(parcelas)
+
+        fim = datetime.now()
+        return {
+            "inicio": self.inicio.isoformat(timespec="seconds"),
+            "fim": fim.isoformat(timespec="seconds"),
+            "segundos": round((fim - self.inicio).total_seconds(), 3),
+            **extras,
+            "etapas": etapas,
+            "arquivos": arquivos,
+        }
+
+
+def gravar_relatorio_json(relatorio, caminho):
+    """Grava o relatório completo em JSON (temporário substituído ao final)."""
+    os.makedirs(os.path.dirname(os.path.abspath(caminho)), exist_ok=True)
+    with open(caminho + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(relatorio, f, ensure_ascii=False, indent=2)
+    os.replace(caminho + ".tmp", caminho)
+
+
+def acrescentar_relatorio_jsonl(relatorio, caminho):
+    """Acrescenta o relatório como uma linha de 'caminho' (histórico de execuções, uma por linha)."""
+    os.makedirs(os.path.dirname(os.path.abspath(caminho)), exist_ok=True)
+    with open(caminho, "a", encoding="utf-8") as f:
+        f.write(json.dumps(relatorio, ensure_ascii=False) + "\n")
+
+
+def _rotulos(**rotulos):
+    """Rótulos no formato do Prometheus: {nome="valor",...}, com barras e aspas escapadas."""
+    escapar = lambda valor: str(valor).replace("\\", "\\\\").replace('"', '\\"')
+    texto = ",".join(f'{nome}="{escapar(valor)}"' for nome, valor in rotulos.items())
+    return "{" + texto + "}" if texto else ""
+
+
+def gravar_relatorio_prometheus(relatorio, caminho, prefixo="consulta_ctf"):
+    """
+    Grava as métricas das etapas no formato de texto do Prometheus (para o textfile collector
+    do node_exporter), em temporário substituído ao final.
+    """
+
+    metricas = {
+        "duracao_segundos": ("gauge", "Duração da execução do pipeline", [("", relatorio["segundos"])]),
+        "etapa_segundos": ("gauge", "Tempo de relógio da etapa", []),
+        "etapa_cpu_segundos": ("gauge", "Tempo de CPU do processo durante a etapa", []),
+        "etapa_pico_rss_bytes": ("gauge", "Pico de memória residente durante a etapa", []),
+        "etapa_sucesso": ("gauge", "1 se a etapa terminou com sucesso", []),
+        "etapa_bytes": ("gauge", "Bytes baixados, lidos e gravados pela etapa", []),
+        "etapa_linhas": ("gauge", "Linhas lidas, após os filtros e gravadas pela etapa", []),
+    }
+    situacao = relatorio.get("situacao", {})
+    for medicao in relatorio["etapas"]:
+        etapa = medicao["etapa"]
+        metricas["etapa_segundos"][2].append((_rotulos(etapa=etapa), medicao["segundos"]))
+        metricas["etapa_cpu_segundos"][2].append((_rotulos(etapa=etapa), medicao["cpu_segundos"]))
+        if medicao["pico_rss_bytes"] is not None:
+            metricas["etapa_pico_rss_bytes"][2].append((_rotulos(etapa=etapa), medicao["pico_rss_bytes"]))
+        if etapa in situacao:
+            metricas["etapa_sucesso"][2].append((_rotulos(etapa=etapa), int(situacao[etapa] == "ok")))
+        for valor in VALORES_ARQUIVO:
+            if valor in medicao:
+                grupo, tipo = valor.split("_", 1)
+                metricas[f"etapa_{grupo}"][2].append((_rotulos(etapa=etapa, tipo=tipo), medicao[valor]))
+
+    linhas = []
+    for nome, (tipo, ajuda, amostras) in metricas.items():
+        if not amostras:
+            continue
+        linhas.append(f"# HELP {prefixo}_{nome} {ajuda}")
+        linhas.append(f"# TYPE {prefixo}_{nome} {tipo}")
+        linhas.extend(f"{prefixo}_{nome}{rotulos} {valor}" for rotulos, valor in amostras if valor is not None)
+
+    os.makedirs(os.path.dirname(os.path.abspath(caminho)), exist_ok=True)
+    with open(caminho + ".tmp", "w", encoding="utf-8") as f:
+        f.write("\n".join(linhas) + "\n")
+    os.replace(caminho + ".tmp", caminho)
+
+
+# Coletor da execução atual, usado pelos módulos do pipeline
+metricas = Metricas()
+
+
+def registrar_arquivo(arquivo, **valores):
+    """Registra métricas de um arquivo no coletor da execução atual (ver Metricas.registrar_arquivo)."""
+    metricas.registrar_arquivo(arquivo, **valores)
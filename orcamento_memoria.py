@@ -0,0 +1,103 @@
+import os
+import copy
+from metricas import rss_atual
+
+MB = 1024 * 1024
+
+# Limite automático: fração da memória física da máquina (ou um valor fixo, se não for possível medi-la)
+FRACAO_MEMORIA_FISICA = 0.5
+LIMITE_SEM_MEDICAO = 4096 * MB
+
+# Fração do limite que um bloco lido pode ocupar: o bloco passa por lotes do leitor, DataFrame,
+# tabela Arrow tipada e buffers de escrita, que coexistem em memória
+FRACAO_BLOCO = 1 / 8
+
+# Faixa de linhas por bloco (e, portanto, por row group): blocos pequenos demais tornam a leitura lenta
+# e os Parquet fragmentados; grandes demais não trazem ganho
+LINHAS_MINIMAS = 10_000
+LINHAS_MAXIMAS = 2_000_000
+
+# Linhas do primeiro bloco, lido antes de se conhecer o tamanho médio das linhas
+LINHAS_SONDAGEM = 50_000
+
+# Recuo: com a memória residente acima de LIMIAR_RECUO do limite, os blocos caem pela metade
+# (até RECUO_MAXIMO); abaixo de LIMIAR_RETOMADA, voltam a crescer aos poucos
+LIMIAR_RECUO = 0.85
+LIMIAR_RETOMADA = 0.6
+RECUO_MAXIMO = 1 / 16
+
+
+def memoria_fisica():
+    """Memória física total da máquina, em bytes; None se não for possível medir."""
+    try:
+        import psutil
+        return psutil.virtual_memory().total
+    except ImportError:
+        pass
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class OrcamentoMemoria:
+    """
+    Orçamento de memória único, respeitado pelos leitores e escritores do pipeline.
+
+    - 'limite_mb' = None usa FRACAO_MEMORIA_FISICA da memória da máquina: o mesmo pipeline roda com
+      blocos pequenos em uma VM de 8 GB e com blocos grandes em um servidor de 128 GB, sem ajuste manual
+    - O tamanho dos blocos (e dos row groups gravados, um por bloco) é calculado a partir dos bytes
+      por linha medidos nos próprios dados (ver linhas_por_bloco)
+    - A cada bloco, a memória residente do processo é medida: perto do limite, os blocos encolhem
+    - Nos modos paralelos, cada processo recebe uma fração do orçamento (ver dividir)
+
+    Não guarda travas nem arquivos abertos: pode ser enviado aos processos do modo paralelo.
+    """
+
+    def __init__(self, limite_mb=None):
+        if limite_mb is not None:
+            self.limite = int(limite_mb * MB)
+        else:
+            fisica = memoria_fisica()
+            self.limite = int(fisica * FRACAO_MEMORIA_FISICA) if fisica else LIMITE_SEM_MEDICAO
+        self.fator = 1.0  # recuo atual (1 = sem recuo)
+
+    @property
+    def limite_mb(self):
+        return self.limite // MB
+
+    def dividir(self, partes):
+        """Orçamento de cada um de 'partes' processos simultâneos (o recuo atual é mantido)."""
+        parte = copy.copy(self)
+        parte.limite = self.limite // max(1, partes)
+        return parte
+
+    def ajustar(self):
+        """
+        Mede a memória residente do processo e ajusta o recuo dos blocos. Retorna o fator de recuo atual.
+        """
+
+        rss = rss_atual()
+        if rss is None:
+            return self.fator
+
+        if rss > self.limite * LIMIAR_RECUO and self.fator > RECUO_MAXIMO:
+            self.fator = max(self.fator / 2, RECUO_MAXIMO)
+            print(f"⚠️ Memória em {rss // MB} MB (limite de {self.limite_mb} MB): "
+                  f"blocos reduzidos para {self.fator:.0%} do tamanho.")
+        elif rss < self.limite * LIMIAR_RETOMADA and self.fator < 1:
+            self.fator = min(1.0, self.fator * 1.25)
+        return self.fator
+
+    def bytes_por_bloco(self):
+        """Bytes em memória que o próximo bloco pode ocupar (já considerando o recuo)."""
+        return max(1, int(self.limite * FRACAO_BLOCO * self.ajustar()))
+
+    def linhas_por_bloco(self, bytes_por_linha):
+        """
+        Linhas do próximo bloco, para linhas de 'bytes_por_linha' bytes em memória,
+        entre LINHAS_MINIMAS e LINHAS_MAXIMAS.
+        """
+
+        linhas = self.bytes_por_bloco() // max(1, int(bytes_por_linha))
+        return int(min(max(linhas, LINHAS_MINIMAS), LINHAS_MAXIMAS))
@@ -0,0 +1,119 @@
+import os
+import shutil
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+# Linhas por row group nas partições: grupos menores tornam as estatísticas min/max mais seletivas
+LINHAS_POR_ROW_GROUP = 128 * 1024
+
+# Coluna de partição derivada da tabela de CNAEs: divisão CNAE (dois primeiros dígitos)
+COLUNA_DIVISAO_CNAE = "DIVISAO_CNAE"
+
+
+def divisao_cnae(lote, coluna="CNAE"):
+    """
+    Acrescenta ao lote a divisão CNAE ("01" a "99"), extraída do código de 7 dígitos (int32).
+    """
+
+    divisao = pc.divide(lote.column(coluna), 100_000)
+    texto = pc.utf8_lpad(pc.cast(divisao, pa.string()), 2, "0")
+    return lote.append_column(COLUNA_DIVISAO_CNAE, texto)
+
+
+def _lotes_com_particao(arquivo, coluna, derivar):
+    """
+    Lê o Parquet row group a row group, acrescentando a coluna derivada (se houver)
+    e convertendo a coluna de partição para texto (nome das pastas).
+    """
+
+    for i in range(arquivo.num_row_groups):
+        lote = arquivo.read_row_group(i)
+        if derivar is not None:
+            lote = derivar(lote)
+        indice = lote.schema.get_field_index(coluna)
+        lote = lote.set_column(indice, coluna, pc.cast(lote.column(coluna), pa.string()))
+        yield from lote.to_batches()
+
+
+def particionar_parquet(origem, destino, coluna, ordenar_por, derivar=None, compressao="snappy"):
+    """
+    Regrava um arquivo Parquet como dataset particionado no estilo Hive ('destino/COLUNA=valor/').
+
+    - 1ª passada: distribui os row groups da origem entre as partições, em streaming
+    - 2ª passada: ordena cada partição por 'ordenar_por' e a regrava em row groups de
+      LINHAS_POR_ROW_GROUP linhas, de modo que as estatísticas min/max permitam ao leitor
+      pular os grupos que não interessam
+    - 'derivar' acrescenta colunas ao lote antes da partição (ex: divisao_cnae)
+
+    Só uma partição fica em memória por vez, na ordenação. O dataset é montado em uma pasta
+    temporária, que substitui 'destino' ao término. Retorna a quantidade de partições gravadas.
+    """
+
+    arquivo = pq.ParquetFile(origem)
+    temporario = destino + ".tmp"
+    distribuido = destino + ".distribuido"
+    for pasta in (temporario, distribuido):
+        shutil.rmtree(pasta, ignore_errors=True)
+
+    lotes = _lotes_com_particao(arquivo, coluna, derivar)
+    primeiro = next(lotes, None)
+    if primeiro is None:
+        return 0
+
+    def todos_os_lotes():
+        yield primeiro
+        yield from lotes
+
+    particionamento = ds.partitioning(pa.schema([(coluna, pa.string())]), flavor="hive")
+    ds.write_dataset(
+        todos_os_lotes(),
+        distribuido,
+        schema=primeiro.schema,
+        format="parquet",
+        partitioning=particionamento,
+        existing_data_behavior="overwrite_or_ignore"
+    )
+
+    particoes = sorted(os.listdir(distribuido))
+    for particao in particoes:
+        tabela = ds.dataset(os.path.join(distribuido, particao), format="parquet").to_table()
+        tabela = tabela.sort_by([(c, "ascending") for c in ordenar_por])
+        os.makedirs(os.path.join(temporario, particao))
+        pq.write_table(
+            tabela,
+            os.path.join(temporario, particao, "part-0.parquet"),
+            row_group_size=LINHAS_POR_ROW_GROUP,
+            compression=compressao
+        )
+        del tabela
+
+    shutil.rmtree(distribuido, ignore_errors=True)
+    shutil.rmtree(destino, ignore_errors=True)
+    os.replace(temporario, destino)
+    return len(particoes)
+
+
+def particionar_saidas(pasta_parquet, destino):
+    """
+    Gera os datasets particionados das tabelas grandes do painel, a partir dos Parquet em 'pasta_parquet':
+    - estabelecimentos: por UF, ordenado por CNAE_PRIMARIO e CNPJ_COMPLETO
+    - cnae_estabelecimentos: por divisão CNAE, ordenado por CNAE e CNPJ_COMPLETO
+    """
+
+    tabelas = [
+        ("estabelecimentos", "UF", ["CNAE_PRIMARIO", "CNPJ_COMPLETO"], None),
+        ("cnae_estabelecimentos", COLUNA_DIVISAO_CNAE, ["CNAE", "CNPJ_COMPLETO"], divisao_cnae),
+    ]
+
+    os.makedirs(destino, exist_ok=True)
+    for nome, coluna, ordenar_por, derivar in tabelas:
+        origem = os.path.join(pasta_parquet, f"{nome}.parquet")
+        if not os.path.exists(origem):
+            print(f"⚠️ {nome}.parquet não encontrado. Particionamento pulado.")
+            continue
+
+        print(f"🗂️ Particionando {nome}.parquet por {coluna}...")
+        particoes = particionar_parquet(origem, os.path.join(destino, nome), coluna, ordenar_por, derivar)
+        print(f"   ➡️ {particoes} partições gravadas em: {os.path.join(destino, nome)}")
@@ -0,0 +1,100 @@
+import os
+import json
+import hashlib
+import threading
+from datetime import datetime
+
+
+def impressao_caminho(caminho):
+    """
+    Impressão digital barata de um arquivo ou pasta, a partir de tamanho e data de modificação
+    (sem ler o conteúdo). Pastas são percorridas recursivamente, ignorando itens ocultos
+    (iniciados por '.', como downloads parciais e saídas temporárias). None se não existir.
+    """
+
+    if os.path.isfile(caminho):
+        estado = os.stat(caminho)
+        return f"{estado.st_size}:{estado.st_mtime_ns}"
+    if not os.path.isdir(caminho):
+        return None
+
+    sha = hashlib.sha256()
+    for raiz, pastas, arquivos in os.walk(caminho):
+        pastas[:] = sorted(p for p in pastas if not p.startswith("."))
+        for arquivo in sorted(a for a in arquivos if not a.startswith(".")):
+            completo = os.path.join(raiz, arquivo)
+            estado = os.stat(completo)
+            sha.update(f"{os.path.relpath(completo, caminho)}|{estado.st_size}|{estado.st_mtime_ns}\n".encode())
+    return sha.hexdigest()
+
+
+def impressao_entradas(caminhos=(), parametros=None):
+    """
+    Impressão digital das entradas de uma etapa: arquivos/pastas lidos e parâmetros
+    que alteram o resultado (valores serializáveis em JSON, ex: formatos de saída, URLs do mês).
+    """
+
+    conteudo = {
+        "caminhos": {os.path.abspath(c): impressao_caminho(c) for c in caminhos},
+        "parametros": parametros or {},
+    }
+    return hashlib.sha256(json.dumps(conteudo, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class PontosControle:
+    """
+    Pontos de controle (checkpoints) persistentes (JSON) das etapas do pipeline, indexados pelo nome.
+
+    Ao terminar com sucesso, a etapa grava a impressão digital das suas entradas e das suas saídas.
+    Na execução seguinte, ela é considerada em dia (e pode ser pulada) enquanto as entradas
+    forem as mesmas e as saídas continuarem como ela as deixou. Assim, uma execução interrompida
+    retoma da primeira etapa incompleta ou desatualizada.
+    """
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self._trava = threading.Lock()
+        try:
+            with open(caminho, encoding="utf-8") as f:
+                self._etapas = json.load(f)
+        except (OSError, ValueError):
+            self._etapas = {}
+
+    def ponto(self, etapa):
+        """Retorna o ponto de controle da etapa (ou None)."""
+        with self._trava:
+            return self._etapas.get(etapa)
+
+    def em_dia(self, etapa, entradas):
+        """
+        Indica se a etapa já foi concluída com as mesmas 'entradas' (ver impressao_entradas)
+        e se as saídas registradas continuam intactas.
+        """
+
+        ponto = self.ponto(etapa)
+        if ponto is None or ponto.get("entradas") != entradas:
+            return False
+        return all(impressao_caminho(caminho) == impressao for caminho, impressao in ponto["saidas"].items())
+
+    def registrar(self, etapa, entradas, saidas=()):
+        """Registra a conclusão da etapa, com as impressões das entradas e das saídas, e grava em disco."""
+        ponto = {
+            "entradas": entradas,
+            "saidas": {os.path.abspath(s): impressao_caminho(s) for s in saidas},
+            "concluida_em": datetime.now().isoformat(timespec="seconds"),
+        }
+        with self._trava:
+            self._etapas[etapa] = ponto
+            self._gravar()
+
+    def invalidar(self, etapa):
+        """Descarta o ponto de controle da etapa (ela será executada na próxima vez)."""
+        with self._trava:
+            if self._etapas.pop(etapa, None) is not None:
+                self._gravar()
+
+    def _gravar(self):
+        temporario = self.caminho + ".tmp"
+        with open(temporario, "w", encoding="utf-8") as f:
+            json.dump(self._etapas, f, ensure_ascii=False, indent=2)
+        os.replace(temporario, self.caminho)
@@ -0,0 +1,96 @@
+import os
+import shutil
+import pyarrow.parquet as pq
+from concurrent.futures import ProcessPoolExecutor
+from metricas import registrar_arquivo
+
+
+def executar_em_paralelo(funcao, tarefas, processos=1):
+    """
+    Executa 'funcao(*tarefa)' para cada tarefa e devolve os resultados na ordem das tarefas.
+
+    - Com 'processos' > 1, usa um pool de processos (um shard por processo)
+    - Com 'processos' = 1, executa no próprio processo, sem custo de criação do pool
+    """
+
+    tarefas = list(tarefas)
+    processos = max(1, min(processos or 1, len(tarefas)))
+
+    if processos == 1:
+        for tarefa in tarefas:
+            yield funcao(*tarefa)
+        return
+
+    with ProcessPoolExecutor(max_workers=processos) as executor:
+        futuros = [executor.submit(funcao, *tarefa) for tarefa in tarefas]
+        for futuro in futuros:
+            yield futuro.result()
+
+
+def juntar_csvs(partes, destino):
+    """
+    Concatena os CSVs parciais em 'destino', na ordem informada (resultado determinístico).
+    O cabeçalho é mantido apenas uma vez. Partes inexistentes ou vazias são ignoradas.
+    Retorna True se algo foi gravado.
+    """
+
+    cabecalho_gravado = False
+    with open(destino, 'wb') as saida:
+        for parte in partes:
+            if not os.path.exists(parte) or os.path.getsize(parte) == 0:
+                continue
+            with open(parte, 'rb') as entrada:
+                cabecalho = entrada.readline()
+                if not cabecalho_gravado:
+                    saida.write(cabecalho)
+                    cabecalho_gravado = True
+                shutil.copyfileobj(entrada, saida, 1024 * 1024)
+
+    return cabecalho_gravado
+
+
+def juntar_parquets(partes, destino, compressao="snappy"):
+    """
+    Junta os Parquet parciais em 'destino', na ordem informada, copiando os row groups
+    um a um (sem carregar as partes inteiras em memória). Partes inexistentes são ignoradas.
+    Retorna True se algo foi gravado.
+    """
+
+    escritor = None
+    try:
+        for parte in partes:
+            if not os.path.exists(parte):
+                continue
+            arquivo = pq.ParquetFile(parte)
+            if escritor is None:
+                escritor = pq.ParquetWriter(destino, schema=arquivo.schema_arrow, compression=compressao)
+            for i in range(arquivo.num_row_groups):
+                escritor.write_table(arquivo.read_row_group(i))
+    finally:
+        if escritor is not None:
+            escritor.close()
+
+    return escritor is not None
+
+
+def juntar_partes(partes_por_formato, destinos, linhas=None):
+    """
+    Junta as partes de cada formato ({"csv": [...], "parquet": [...]}) no destino correspondente,
+    gravando primeiro em temporário e substituindo o arquivo final ao término.
+    Uma única parte existente é apenas movida para o destino, sem cópia.
+    'linhas' (total das partes, se conhecido) é registrado nas métricas de cada destino.
+    """
+
+    juntar = {"csv": juntar_csvs, "parquet": juntar_parquets}
+    for formato, partes in partes_por_formato.items():
+        existentes = [parte for parte in partes if os.path.exists(parte) and os.path.getsize(parte) > 0]
+        if len(existentes) == 1:
+            shutil.move(existentes[0], destinos[formato])
+            registrar_arquivo(destinos[formato], bytes_gravados=os.path.getsize(destinos[formato]),
+                              linhas_gravadas=linhas)
+            continue
+        temporario = destinos[formato] + ".tmp"
+        if juntar[formato](partes, temporario):
+            os.replace(temporario, destinos[formato])
+            registrar_arquivo(destinos[formato], bytes_gravados=os.path.getsize(destinos[formato]),
+                              linhas_gravadas=linhas)
@@ -1,17 +1,35 @@
 import os
+import re
+import sys
+import json
 import time
+import shutil
+import argparse
 import threading
+import pandas as pd
 from datetime import datetime
-from get_files_online import get_files_online, get_latest_cnpj_urls
-from transform_cnpj_estabelecimentos import transform_cnpj as transform_estab
+from get_files_online import get_files_online, get_latest_cnpj_urls, nome_local, PASTA_PARCIAIS
+from listagem_receita import ListagemReceita
+from transform_cnpj_estabelecimentos import transform_cnpj as transform_estab, remarcar_ctf
 from transform_cnpj_empresas import transform_cnpj_empresas
 from transform_ctf import transform_ctf
+from membros_ctf import ARQUIVO_MEMBROS
 from transform_natureza_juridica import transform_naturezas_juridicas
 from transform_cnae import transform_cnae
 from export_to_parquet import exportar_para_parquet
-
-# Registro do início do pipeline
-inicio_pipeline = datetime.now()
+from particionamento_parquet import particionar_saidas
+from orcamento_memoria import OrcamentoMemoria
+from juncao_empresas import juntar_empresas, NOME_TABELA_LARGA
+from agregado_adesao_ctf import gerar_agregado_adesao, NOME_AGREGADO
+from consulta_ctf import construir_indice
+from busca_textual import construir_indices_busca
+from delta_estabelecimentos import calcular_delta, ARQUIVO_RETRATO
+from manifesto_downloads import ManifestoDownloads
+from fontes_csv import localizar_fonte
+from escrita_saidas import gravar_tabela
+from agendador import Etapa, executar_etapas, selecionar_etapas, SUCESSO, INCOMPLETA
+from pontos_controle import PontosControle
+from metricas import metricas, gravar_relatorio_json, acrescentar_relatorio_jsonl, gravar_relatorio_prometheus
 
 # Diretório do projeto
 dir_atual = os.path.dirname(os.path.abspath(__file__))
@@ -24,10 +42,187 @@ natureza_dir = os.path.join(dir_atual, 'Dados Natureza Jurídica')
 ctf_dir = os.path.join(dir_atual, 'Dados CTF IBAMA')
 output_dir = os.path.join(dir_atual, 'Entrada do Painel')
 parquet_dir = os.path.join(dir_atual, 'Dados Painel Parquet')
+particionado_dir = os.path.join(dir_atual, 'Dados Painel Parquet Particionado')
+indice_dir = os.path.join(dir_atual, 'Indice Consulta CTF')
+indice_busca_dir = os.path.join(dir_atual, 'Indice Busca Textual')
+historico_dir = os.path.join(dir_atual, 'Historico Estabelecimentos')
+delta_dir = os.path.join(dir_atual, 'Delta Estabelecimentos')
+relatorios_dir = os.path.join(dir_atual, 'Relatorios Execucao')
 
 # URL base dos dados abertos do CNPJ
 base_cnpj_url = "https://arquivos.receitafederal.gov.br/dados/cnpj/dados_abertos_cnpj/"
 
+# Listagem dos diretórios da Receita: consultada uma vez por execução (um único mês para todas as fontes)
+# e reaproveitada pelas execuções seguintes por até 'validade_listagem' segundos
+validade_listagem = 6 * 60 * 60
+listagem_receita = ListagemReceita(base_cnpj_url, os.path.join(dir_atual, 'listagem_receita.json'),
+                                   validade=validade_listagem)
+
+# URL base do CTF/APP do IBAMA e UFs disponíveis
+url_base_ctf = "http://dadosabertos.ibama.gov.br/dados/CTF/APP/"
+estados = [
+    "AC","AL","AP","AM","BA","CE","DF","ES","GO","MA","MT","MS",
+    "MG","PA","PB","PR","PE","PI","RJ","RN","RS","RO","RR","SC",
+    "SP","SE","TO"
+]
+
+# Quantidade de downloads simultâneos em cada etapa de download
+downloads_simultaneos = 4
+
+# Faixas de bytes paralelas por arquivo grande da Receita (servidor lento por conexão)
+segmentos_por_arquivo = 4
+
+# Lê os CSVs da Receita diretamente de dentro dos ZIPs, sem extraí-los para o disco
+ler_direto_dos_zips = True
+
+# Leitor CSV das transformações: "pyarrow" (multithread) ou "pandas"
+motor_csv = "pyarrow"
+
+# Processos paralelos na transformação dos shards de Estabelecimentos e Empresas
+processos_transformacao = os.cpu_count() or 1
+
+# Formatos das saídas das transformações: Parquet gravado diretamente na pasta do painel.
+# Com --csv, gera os CSVs em 'Entrada do Painel' (como antes), convertidos na etapa exportar_parquet
+formatos_saida = ("parquet",)
+
+# Gera também datasets particionados (estabelecimentos por UF, CNAEs por divisão), ativado com --particionar
+particionar_parquet = False
+
+# Gera também a tabela larga estabelecimentos_empresas (atributos da empresa em cada estabelecimento),
+# ativado com --juntar-empresas. A junção é feita em partições que cabem no orçamento de memória
+juntar_empresas_parquet = False
+
+# Orçamento de memória (MB) respeitado por leitores e escritores: tamanho dos blocos e row groups das
+# transformações e da exportação e partições da junção. None = metade da memória física da máquina
+memoria_mb = None
+orcamento_memoria = OrcamentoMemoria(memoria_mb)
+
+# Marca os estabelecimentos inscritos no CTF (colunas TEM_CTF e CATEGORIAS_CTF) durante a própria transformação,
+# a partir do conjunto de CNPJs gravado por transformar_ctf (que passa a ser executada antes)
+marcar_ctf = True
+caminho_membros_ctf = os.path.join(parquet_dir, ARQUIVO_MEMBROS)
+
+# Etapas simultâneas por recurso: downloads (rede) seguem em paralelo às transformações (cpu)
+etapas_simultaneas = {"rede": 2, "cpu": 1}
+
+# Manifesto dos downloads (ETag, Last-Modified, tamanho e hash por URL)
+manifesto = ManifestoDownloads(os.path.join(dir_atual, 'manifesto_downloads.json'))
+
+# Códigos de saída do processo (para agendadores e orquestradores)
+SAIDA_OK = 0          # todas as etapas selecionadas terminaram com sucesso
+SAIDA_FALHA = 1       # alguma etapa falhou (ou não foi executada por dependência sem sucesso)
+SAIDA_ARGUMENTOS = 2  # argumentos inválidos
+
+# Pontos de controle das etapas (entradas e saídas de cada etapa concluída), para retomar execuções interrompidas
+pontos_controle = PontosControle(os.path.join(dir_atual, 'checkpoints_etapas.json'))
+
+# Estado compartilhado entre as etapas (URLs baixadas, fontes alteradas, datas de atualização)
+estado = {}
+
+# Tabelas de saída das transformações (nomes sem extensão)
+TABELAS_SAIDA = {
+    "estab": ["estabelecimentos", "cnae_estabelecimentos"],
+    "empresas": ["dados_empresa"],
+    "ctf": ["ctf_empresas"],
+    "naturezas": ["naturezas_juridicas"],
+    "cnaes": ["cnaes"],
+}
+
+def caminho_saida(nome, formato=None):
+    """
+    Caminho do arquivo de saída 'nome' (sem extensão) no formato informado
+    (por padrão, o primeiro dos formatos de saída).
+    """
+    formato = formato or formatos_saida[0]
+    pasta = parquet_dir if formato == "parquet" else output_dir
+    return os.path.join(pasta, f"{nome}.{formato}")
+
+def saidas_prontas(*nomes):
+    """
+    Indica se todas as saídas informadas (nomes sem extensão) já existem em todos os formatos de saída.
+    """
+    return all(os.path.exists(caminho_saida(nome, formato)) for nome in nomes for formato in formatos_saida)
+
+def arquivos_parquet(*nomes):
+    """
+    Caminhos dos arquivos Parquet do painel (nomes sem extensão).
+    """
+    return [caminho_saida(nome, "parquet") for nome in nomes]
+
+def urls_fonte(fonte):
+    """
+    URLs da fonte nesta execução, consultadas uma única vez e guardadas em 'estado'
+    (usadas tanto no ponto de controle quanto no download).
+    """
+    chave = f"{fonte}_urls"
+    if chave not in estado:
+        if fonte == 'ctf':
+            estado[chave] = [f"{url_base_ctf}{uf}/pessoasJuridicas.csv" for uf in estados]
+        else:
+            tipos = {'estab': 'Estabelecimentos', 'empresas': 'Empresas', 'naturezas': 'Naturezas', 'cnaes': 'Cnaes'}
+            estado[chave] = get_latest_cnpj_urls(base_cnpj_url, tipo_arquivo=tipos[fonte], listagem=listagem_receita)
+    return estado[chave]
+
+def opcoes_saida():
+    """
+    Argumentos de saída comuns às transformações (formatos e pasta Parquet).
+    """
+    return {"formatos": formatos_saida, "caminho_parquet": parquet_dir}
+
+def baixar_fonte(fonte, urls, destino, saidas, **kwargs):
+    """
+    Baixa uma fonte consultando o manifesto e registra em 'estado' se a sua transformação
+    precisa ser executada.
+
+    A fonte é pulada quando nenhuma URL mudou desde a última execução
+    e as saídas correspondentes já existem. Se algum arquivo não for baixado, a etapa falha:
+    a transformação não roda sobre uma fonte incompleta e as saídas anteriores são mantidas.
+    """
+    estado[f"{fonte}_urls"] = urls
+    prontas = saidas_prontas(*saidas)
+    alterados, falhas = get_files_online(urls, destino, max_workers=downloads_simultaneos,
+                                         manifesto=manifesto, forcar=not prontas,
+                                         extrair=not ler_direto_dos_zips, **kwargs)
+    if falhas:
+        raise Exception(f"{len(falhas)} arquivo(s) da fonte '{fonte}' não baixado(s): {', '.join(falhas)}")
+    if not alterados and prontas:
+        print(f"⏭️ Fonte inalterada: transformação dispensada ({', '.join(saidas)} mantidos).")
+        estado[f"{fonte}_transformar"] = False
+    else:
+        estado[f"{fonte}_transformar"] = True
+
+def fonte_baixada(fonte, pasta):
+    """
+    Indica se a pasta bruta tem um arquivo para cada URL da fonte (ponto de controle do download).
+    ZIPs extraídos (e removidos) contam como presentes se não há download pendente deles
+    e a pasta não está vazia.
+    """
+    if not os.path.isdir(pasta):
+        return False
+    presentes = [n for n in os.listdir(pasta) if not n.startswith(".")]
+    for i, url in enumerate(urls_fonte(fonte)):
+        nome = nome_local(i, url)
+        if nome in presentes:
+            continue
+        pendente = os.path.exists(os.path.join(pasta, PASTA_PARCIAIS, nome + ".json"))
+        if ler_direto_dos_zips or not nome.endswith(".zip") or pendente or not presentes:
+            return False
+    return True
+
+def deve_transformar(fonte):
+    """
+    Indica se a transformação da fonte deve rodar. Sem a etapa de download nesta execução
+    (ex: --only transformar_...), transforma os arquivos já presentes na pasta.
+    """
+    return estado.get(f"{fonte}_transformar", True)
+
+def confirmar_fonte(fonte):
+    """
+    Confirma no manifesto as URLs baixadas da fonte, após a transformação bem-sucedida.
+    """
+    if f"{fonte}_urls" in estado:
+        manifesto.confirmar(estado[f"{fonte}_urls"])
+
 # Função auxiliar para aguardar o ENTER ou timeout
 def esperar_enter(timeout=30):
     """
@@ -55,250 +250,651 @@ def esperar_enter(timeout=30):
 
     print("\n⌛ Tempo esgotado! Continuando o pipeline...\n")
 
-# ==============================================
-# Apresentação inicial do pipeline
-# ==============================================
-
-print("=" * 60)
-print("🔄 PIPELINE DE DADOS CNPJ E CTF IBAMA")
-print("=" * 60)
-
-print("\n📌 Este pipeline tem como objetivo atualizar os dados utilizados no modelo semântico")
-print("do relatório de Power BI denominado 'Consulta CTF por Descrição ou Código CNAE'.")
-print("Ele realiza o download, extração e transformação dos principais conjuntos de dados")
-print("necessários para garantir a integridade e atualidade da base utilizada no relatório.")
-
-print("\n📦 Arquivos finais gerados por este pipeline (em formato CSV):")
-
-print("\n - estabelecimentos.csv:")
-print("   📄 Contém: CNPJ Básico, CNPJ Completo, Nome Fantasia, Identificador Matriz/Filial,")
-print("             Data de Início de Atividade, Tipo de Logradouro, Logradouro, Número,")
-print("             Complemento, Bairro, CEP, UF, Município, Telefones, Fax, E-mail.")
-
-print("\n - cnae_estabelecimentos.csv:")
-print("   📄 Contém: CNPJ Completo e Código CNAE (Primário e Secundários separados).")
-
-print("\n - dados_empresa.csv:")
-print("   📄 Contém: CNPJ Básico, Razão Social, Natureza Jurídica, Capital Social, Porte.")
-
-print("\n - ctf_empresas.csv:")
-print("   📄 Contém: CNPJ Completo e Código da Atividade (CTF/IBAMA).")
-
-print("\n - naturezas_juridicas.csv:")
-print("   📄 Contém: Código, Descrição, Natureza, Qualificação, Data de Início e Data de Fim.")
-
-print("\n - cnaes.csv:")
-print("   📄 Contém: Código CNAE e Descrição oficial, conforme tabela da Receita Federal.")
-
-print("\n🧊 Todos esses arquivos também são automaticamente convertidos para o formato Parquet,")
-print("   que é mais eficiente para o Power BI por ser compacto, colunar e de leitura mais rápida.")
-print(f"   📂 Pasta: {os.path.join(dir_atual, 'Dados Painel Parquet')}")
-print("   📄 Caminho salvo em: caminho_dados_parquet.txt")
-
-print("\nEste pipeline agendado realizará as seguintes etapas:")
-print("\n1️⃣  Download e transformação dos dados de estabelecimentos do CNPJ:")
-print("    - Scripts: get_files_online.py, transform_cnpj_estabelecimentos.py")
-print("    - Funções: get_latest_cnpj_urls(), get_files_online(), transform_cnpj()\n")
-
-print("2️⃣  Download e transformação dos dados das empresas (matriz) do CNPJ:")
-print("    - Scripts: get_files_online.py, transform_cnpj_empresas.py")
-print("    - Funções: get_latest_cnpj_urls(), get_files_online(), transform_cnpj_empresas()\n")
-
-print("3️⃣  Download e transformação dos dados do CTF (IBAMA):")
-print("    - Scripts: get_files_online.py, transform_ctf.py")
-print("    - Funções: get_files_online(), transform_ctf()\n")
-
-print("4️⃣  Download e transformação dos dados de Natureza Jurídica do CNPJ:")
-print("    - Scripts: get_files_online.py, transform_natureza_juridica.py")
-print("    - Funções: get_latest_cnpj_urls(), get_files_online(), transform_naturezas_juridicas()\n")
-
-print("🗃️ Os resultados finais serão armazenados em:")
-print(f"    📂 CSV:    {output_dir}")
-print(f"    📂 Parquet: {parquet_dir}")
-
-# Pausa para ENTER ou timeout
-esperar_enter(timeout=30)
-
 # --------------------------------------------------------------------------
 # PARTE 1 - DADOS DE ESTABELECIMENTOS
 # --------------------------------------------------------------------------
-print("\n===== PARTE 1: DADOS DE ESTABELECIMENTOS (CNPJ) =====")
-estab_urls = get_latest_cnpj_urls(base_cnpj_url, tipo_arquivo='Estabelecimentos')
-get_files_online(estab_urls, estab_dir)
-transform_estab(estab_dir, output_dir)
+def baixar_estabelecimentos():
+    print("\n===== PARTE 1: DADOS DE ESTABELECIMENTOS (CNPJ) =====")
+    baixar_fonte('estab', urls_fonte('estab'), estab_dir, ['estabelecimentos', 'cnae_estabelecimentos'],
+                 segmentos=segmentos_por_arquivo)
 
-# Captura a data de atualização da Receita Federal (Estabelecimentos)
-data_receita_estab = datetime.today().strftime("%Y-%m-%d")
+def ctf_mais_recente():
+    """
+    Indica se o conjunto de inscritos no CTF é mais recente que os estabelecimentos gravados
+    (ou seja, a marcação TEM_CTF dos estabelecimentos está desatualizada).
+    """
+    saidas = [caminho_saida('estabelecimentos', formato) for formato in formatos_saida]
+    if not os.path.exists(caminho_membros_ctf) or not all(os.path.exists(s) for s in saidas):
+        return False
+    return os.path.getmtime(caminho_membros_ctf) > min(os.path.getmtime(s) for s in saidas)
+
+def transformar_estabelecimentos():
+    falhas = None
+    if deve_transformar('estab'):
+        membros_ctf = None
+        if marcar_ctf:
+            if os.path.exists(caminho_membros_ctf):
+                membros_ctf = caminho_membros_ctf
+            else:
+                print("⚠️ Conjunto de inscritos no CTF não encontrado: estabelecimentos gravados sem TEM_CTF.")
+        falhas = transform_estab(estab_dir, output_dir, motor=motor_csv, processos=processos_transformacao,
+                                 membros_ctf=membros_ctf, orcamento=orcamento_memoria, **opcoes_saida())
+        if not falhas:
+            confirmar_fonte('estab')
+    elif marcar_ctf and ctf_mais_recente():
+        # Receita inalterada, mas o conjunto de inscritos mudou: só a marcação CTF é refeita
+        print("🔄 Inscritos no CTF atualizados: remarcando TEM_CTF e CATEGORIAS_CTF nos estabelecimentos...")
+        remarcar_ctf(output_dir, caminho_membros_ctf, **opcoes_saida())
+
+    # Captura a data de atualização da Receita Federal (Estabelecimentos)
+    estado["data_receita_estab"] = datetime.today().strftime("%Y-%m-%d")
+
+    # Com arquivos descartados, o manifesto não é confirmado nem o ponto de controle gravado:
+    # a próxima execução transforma de novo
+    if falhas:
+        return INCOMPLETA
 
 # --------------------------------------------------------------------------
 # PARTE 2 - DADOS DE EMPRESAS (MATRIZ)
 # --------------------------------------------------------------------------
-print("\n===== PARTE 2: DADOS DE EMPRESAS (RAZÃO SOCIAL) =====")
-print("🔎 Iniciando download dos arquivos de Empresas (matriz)...")
-empresas_urls = get_latest_cnpj_urls(base_cnpj_url, tipo_arquivo='Empresas')
-get_files_online(empresas_urls, empresas_dir)
-
-print("🔄 Iniciando transformação dos arquivos de Empresas (matriz)...")
-transform_cnpj_empresas(empresas_dir, output_dir)
+def baixar_empresas():
+    print("\n===== PARTE 2: DADOS DE EMPRESAS (RAZÃO SOCIAL) =====")
+    print("🔎 Iniciando download dos arquivos de Empresas (matriz)...")
+    baixar_fonte('empresas', urls_fonte('empresas'), empresas_dir, ['dados_empresa'], segmentos=segmentos_por_arquivo)
+
+def transformar_empresas():
+    if deve_transformar('empresas'):
+        print("🔄 Iniciando transformação dos arquivos de Empresas (matriz)...")
+        falhas = transform_cnpj_empresas(empresas_dir, output_dir, motor=motor_csv, processos=processos_transformacao,
+                                         orcamento=orcamento_memoria, **opcoes_saida())
+        if falhas:
+            return INCOMPLETA
+        confirmar_fonte('empresas')
 
 # --------------------------------------------------------------------------
 # PARTE 3 - DADOS CTF IBAMA
 # --------------------------------------------------------------------------
-print("\n===== PARTE 3: DADOS DO CTF (IBAMA) =====")
-url_base_ctf = "http://dadosabertos.ibama.gov.br/dados/CTF/APP/"
-estados = [
-    "AC","AL","AP","AM","BA","CE","DF","ES","GO","MA","MT","MS",
-    "MG","PA","PB","PR","PE","PI","RJ","RN","RS","RO","RR","SC",
-    "SP","SE","TO"
-]
-ctf_urls = [f"{url_base_ctf}{uf}/pessoasJuridicas.csv" for uf in estados]
-get_files_online(ctf_urls, ctf_dir)
-transform_ctf(ctf_dir, output_dir)
+def baixar_ctf():
+    print("\n===== PARTE 3: DADOS DO CTF (IBAMA) =====")
+    baixar_fonte('ctf', urls_fonte('ctf'), ctf_dir, ['ctf_empresas'])
+
+def transformar_ctf():
+    falhas = None
+    if deve_transformar('ctf'):
+        falhas = transform_ctf(ctf_dir, output_dir, motor=motor_csv, caminho_membros=caminho_membros_ctf,
+                               **opcoes_saida())
+        if not falhas:
+            confirmar_fonte('ctf')
 
-# Captura a data de atualização do IBAMA (CTF)
-data_ibama_ctf = datetime.today().strftime("%Y-%m-%d")
+    # Captura a data de atualização do IBAMA (CTF)
+    estado["data_ibama_ctf"] = datetime.today().strftime("%Y-%m-%d")
+
+    # Arquivos ilegíveis não são confirmados no manifesto: a próxima execução baixa de novo
+    if falhas:
+        return INCOMPLETA
 
 # --------------------------------------------------------------------------
 # PARTE 4 - DADOS DE NATUREZA JURÍDICA
 # --------------------------------------------------------------------------
-print("\n===== PARTE 4: NATUREZAS JURÍDICAS (CNPJ) =====")
-naturezas_urls = get_latest_cnpj_urls(base_cnpj_url, tipo_arquivo='Naturezas')
-get_files_online(naturezas_urls, natureza_dir)
-
-# Localizar dinamicamente o arquivo NATJUCSV extraído
-arquivo_natureza_csv = None
-for arquivo in os.listdir(natureza_dir):
-    if arquivo.upper().endswith('NATJUCSV'):
-        arquivo_natureza_csv = os.path.join(natureza_dir, arquivo)
-        break
-
-if arquivo_natureza_csv:
-    print(f"🔄 Lendo naturezas jurídicas: {arquivo_natureza_csv}")
-    transform_naturezas_juridicas(arquivo_natureza_csv, output_dir)
-else:
-    print("⚠️ Nenhum arquivo CSV de natureza jurídica encontrado após extração!")
-    
+def baixar_naturezas():
+    print("\n===== PARTE 4: NATUREZAS JURÍDICAS (CNPJ) =====")
+    baixar_fonte('naturezas', urls_fonte('naturezas'), natureza_dir, ['naturezas_juridicas'])
+
+def transformar_naturezas():
+    if not deve_transformar('naturezas'):
+        return
+
+    # Localizar dinamicamente o arquivo NATJUCSV (extraído ou dentro do ZIP)
+    arquivo_natureza_csv = localizar_fonte(natureza_dir, 'NATJUCSV')
+
+    if arquivo_natureza_csv:
+        print(f"🔄 Lendo naturezas jurídicas: {arquivo_natureza_csv.nome}")
+        transform_naturezas_juridicas(arquivo_natureza_csv, output_dir, motor=motor_csv, **opcoes_saida())
+        confirmar_fonte('naturezas')
+    else:
+        print("⚠️ Nenhum arquivo CSV de natureza jurídica encontrado após extração!")
+
 # --------------------------------------------------------------------------
 # PARTE 5 - CNAEs
 # --------------------------------------------------------------------------
-print("\n===== PARTE 5: CNAEs (Códigos e Descrições) =====")
-cnae_urls = get_latest_cnpj_urls(base_cnpj_url, tipo_arquivo='Cnaes')
-get_files_online(cnae_urls, cnae_dir)
-
-# Localiza arquivo com "CNAECSV"
-# Usa diretamente o arquivo renomeado pelo get_files_online
-arquivo_cnae_csv = os.path.join(cnae_dir, "cnaes_original.csv")
-if os.path.exists(arquivo_cnae_csv):
-    print(f"🔄 Lendo CNAEs: {arquivo_cnae_csv}")
-    transform_cnae(arquivo_cnae_csv, output_dir)
-else:
-    print("⚠️ Arquivo 'cnaes_original.csv' não encontrado após extração!")
-    
+def baixar_cnaes():
+    print("\n===== PARTE 5: CNAEs (Códigos e Descrições) =====")
+    baixar_fonte('cnaes', urls_fonte('cnaes'), cnae_dir, ['cnaes'])
+
+def transformar_cnaes():
+    if not deve_transformar('cnaes'):
+        return
+
+    # Localiza arquivo com "CNAECSV" (dentro do ZIP)
+    # ou o arquivo renomeado pelo get_files_online após a extração
+    arquivo_cnae_csv = localizar_fonte(cnae_dir, ('CNAECSV', 'cnaes_original.csv'))
+    if arquivo_cnae_csv:
+        print(f"🔄 Lendo CNAEs: {arquivo_cnae_csv.nome}")
+        transform_cnae(arquivo_cnae_csv, output_dir, motor=motor_csv, **opcoes_saida())
+        confirmar_fonte('cnaes')
+    else:
+        print("⚠️ Arquivo de CNAEs não encontrado após o download!")
+
 # --------------------------------------------------------------------------
-#PARTE 6 - EXPORTAÇÃO PARA FORMATO PARQUET
+# PARTE 6 - EXPORTAÇÃO PARA FORMATO PARQUET
 # --------------------------------------------------------------------------
-print("\n===== EXPORTANDO ARQUIVOS PARA FORMATO PARQUET =====")
+def exportar_parquet():
+    print("\n===== EXPORTANDO ARQUIVOS PARA FORMATO PARQUET =====")
 
-from export_to_parquet import exportar_para_parquet
+    # Sem CSVs, as transformações já gravaram o Parquet diretamente
+    if "csv" not in formatos_saida:
+        print("⏭️ Parquet gravado diretamente pelas transformações: exportação dispensada.")
+        return
 
-# Pasta de destino para arquivos Parquet
-pasta_parquet = os.path.join(dir_atual, 'Dados Painel Parquet')
+    # Sem CSVs alterados desde a última exportação, a etapa nem chega a ser executada (ponto de controle)
+    exportar_para_parquet(origem=output_dir, destino=parquet_dir, orcamento=orcamento_memoria)
+    print("\n✅ Exportação para Parquet concluída com sucesso!")
 
-# Executa a exportação
-exportar_para_parquet(origem=output_dir, destino=pasta_parquet)
+def agregar_adesao_ctf():
+    print("\n===== AGREGADO DE ADESÃO AO CTF POR CNAE E UF =====")
+    gerar_agregado_adesao(parquet_dir)
 
-print("\n✅ Exportação para Parquet concluída com sucesso!")
+def indexar_consulta():
+    print("\n===== ÍNDICE DA CONSULTA RÁPIDA (consulta_ctf.py) =====")
+    construir_indice(parquet_dir, indice_dir)
 
-# --------------------------------------------------------------------------
-# PARTE 7 - LIMPEZA DAS PASTAS INTERMEDIÁRIAS
-# --------------------------------------------------------------------------
-print("\n===== PARTE 7: LIMPEZA DAS PASTAS INTERMEDIÁRIAS =====")
+def indexar_busca():
+    print("\n===== ÍNDICE DE BUSCA TEXTUAL (busca_textual.py) =====")
+    construir_indices_busca(parquet_dir, indice_busca_dir)
 
-import shutil
+def mes_receita():
+    """
+    Mês (AAAA-MM) dos dados da Receita, extraído das URLs de Estabelecimentos desta execução.
+    Sem download nesta execução (ex: --only calcular_delta), as URLs vêm da listagem da Receita
+    (consultada uma única vez, ver listagem_receita.py), e não do calendário: no início de um mês,
+    o mês corrente ainda não foi publicado e rotularia o retrato do mês anterior.
+    """
+    for url in urls_fonte('estab'):
+        encontrado = re.search(r"/(\d{4}-\d{2})/", url)
+        if encontrado:
+            return encontrado.group(1)
+    return listagem_receita.mes
+
+def calcular_delta_mensal():
+    print("\n===== DELTA MENSAL DOS ESTABELECIMENTOS =====")
+
+    # O retrato já é deste mês (ex: execução forçada): comparar o mês com ele mesmo apagaria o delta gravado
+    mes = mes_receita()
+    caminho_retrato = os.path.join(historico_dir, ARQUIVO_RETRATO)
+    if os.path.exists(caminho_retrato):
+        with open(caminho_retrato, encoding="utf-8") as f:
+            if json.load(f).get("mes") == mes:
+                print(f"⏭️ O retrato dos estabelecimentos já é de {mes}: delta existente mantido.")
+                return
+
+    caminho_estab = os.path.join(parquet_dir, "estabelecimentos.parquet")
+    if not os.path.exists(caminho_estab):
+        print("⚠️ estabelecimentos.parquet não encontrado. Delta não calculado.")
+        return
+
+    calcular_delta(caminho_estab, historico_dir, delta_dir, mes=mes)
+
+def particionar_datasets():
+    print("\n===== PARTICIONAMENTO DOS DADOS PARQUET =====")
+
+    if not particionar_parquet:
+        print("⏭️ Particionamento desativado (use --particionar).")
+        return
+
+    particionar_saidas(parquet_dir, particionado_dir)
+    print(f"\n✅ Datasets particionados salvos em: {particionado_dir}")
 
-pastas_intermediarias = [estab_dir, empresas_dir, cnae_dir, natureza_dir, ctf_dir]
+def juntar_estabelecimentos_empresas():
+    print("\n===== TABELA LARGA: ESTABELECIMENTOS E EMPRESAS =====")
 
-for pasta in pastas_intermediarias:
-    if os.path.exists(pasta):
-        print(f"🧹 Limpando: {pasta}")
-        for item in os.listdir(pasta):
-            caminho_item = os.path.join(pasta, item)
-            try:
-                if os.path.isfile(caminho_item):
-                    os.remove(caminho_item)
-                elif os.path.isdir(caminho_item):
-                    shutil.rmtree(caminho_item)
-            except Exception as e:
-                print(f"⚠️ Erro ao remover {caminho_item}: {e}")
+    if not juntar_empresas_parquet:
+        print("⏭️ Junção com as empresas desativada (use --juntar-empresas).")
+        return
 
-print("✅ Pastas intermediárias limpas com sucesso.")
+    faltando = [nome for nome in ("estabelecimentos", "dados_empresa")
+                if not os.path.exists(os.path.join(parquet_dir, f"{nome}.parquet"))]
+    if faltando:
+        print(f"⚠️ {', '.join(n + '.parquet' for n in faltando)} não encontrado(s). Tabela larga não gerada.")
+        return
+
+    juntar_empresas(parquet_dir, orcamento=orcamento_memoria)
+
+# --------------------------------------------------------------------------
+# PARTE 7 - LIMPEZA DAS PASTAS INTERMEDIÁRIAS
+# --------------------------------------------------------------------------
+def limpar_pastas_intermediarias():
+    print("\n===== PARTE 7: LIMPEZA DAS PASTAS INTERMEDIÁRIAS =====")
+
+    pastas_intermediarias = [estab_dir, empresas_dir, cnae_dir, natureza_dir, ctf_dir]
+
+    for pasta in pastas_intermediarias:
+        if os.path.exists(pasta):
+            print(f"🧹 Limpando: {pasta}")
+            for item in os.listdir(pasta):
+                # Preserva downloads incompletos para que sejam retomados na próxima execução
+                if item == PASTA_PARCIAIS:
+                    continue
+                caminho_item = os.path.join(pasta, item)
+                try:
+                    if os.path.isfile(caminho_item):
+                        os.remove(caminho_item)
+                    elif os.path.isdir(caminho_item):
+                        shutil.rmtree(caminho_item)
+                except Exception as e:
+                    print(f"⚠️ Erro ao remover {caminho_item}: {e}")
+
+    print("✅ Pastas intermediárias limpas com sucesso.")
 
 # --------------------------------------------------------------------------
 # PARTE 8 - REGISTRO DE DATAS DE ATUALIZAÇÃO
 # --------------------------------------------------------------------------
-print("\n===== PARTE 8: REGISTRO DE DATAS DE ATUALIZAÇÃO =====")
+def registrar_datas():
+    print("\n===== PARTE 8: REGISTRO DE DATAS DE ATUALIZAÇÃO =====")
+
+    hoje = datetime.today().strftime("%Y-%m-%d")
+    data_receita_estab = estado.setdefault("data_receita_estab", hoje)
+    data_ibama_ctf = estado.setdefault("data_ibama_ctf", hoje)
+
+    # DataFrames separados por fonte
+    df_data_receita = pd.DataFrame([
+        {"fonte": "Receita Federal - Estabelecimentos", "data_atualizacao": data_receita_estab},
+        {"fonte": "Receita Federal - Empresas (Matriz)", "data_atualizacao": data_receita_estab}
+    ])
+    df_data_ibama = pd.DataFrame([
+        {"fonte": "IBAMA - CTF/APP", "data_atualizacao": data_ibama_ctf}
+    ])
+
+    # Salva os arquivos nos formatos de saída
+    for nome, df in (("data_receita", df_data_receita), ("data_ibama", df_data_ibama)):
+        for caminho in gravar_tabela(df, nome, output_dir, **opcoes_saida()):
+            print(f"✅ Arquivo salvo: {caminho}")
 
-import pandas as pd
+# --------------------------------------------------------------------------
+# RELATÓRIO DE MÉTRICAS DA EXECUÇÃO
+# --------------------------------------------------------------------------
+def gravar_relatorio_execucao(situacao, caminho_json=None, caminho_prometheus=None):
+    """
+    Grava o relatório de métricas da execução (ver metricas.py), com a situação de cada etapa:
+    - JSON completo em 'caminho_json' (padrão: Relatorios Execucao/execucao_<data e hora>.json)
+    - uma linha em Relatorios Execucao/execucoes.jsonl, histórico de todas as execuções
+    - formato de texto do Prometheus em 'caminho_prometheus', se informado
+    Retorna o relatório.
+    """
+    relatorio = metricas.relatorio(
+        situacao=situacao,
+        mes_receita=mes_receita(),
+        configuracao={
+            "motor_csv": motor_csv,
+            "processos_transformacao": processos_transformacao,
+            "memoria_mb": orcamento_memoria.limite_mb,
+            "formatos_saida": list(formatos_saida),
+            "etapas_simultaneas": etapas_simultaneas,
+        },
+    )
+
+    caminho_json = caminho_json or os.path.join(
+        relatorios_dir, f"execucao_{metricas.inicio.strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    gravar_relatorio_json(relatorio, caminho_json)
+    acrescentar_relatorio_jsonl(relatorio, os.path.join(relatorios_dir, "execucoes.jsonl"))
+    print(f"📈 Relatório de métricas: {caminho_json}")
+    if caminho_prometheus:
+        gravar_relatorio_prometheus(relatorio, caminho_prometheus)
+        print(f"📈 Métricas no formato Prometheus: {caminho_prometheus}")
+    return relatorio
 
-# DataFrames separados por fonte
-df_data_receita = pd.DataFrame([
-    {"fonte": "Receita Federal - Estabelecimentos", "data_atualizacao": data_receita_estab},
-    {"fonte": "Receita Federal - Empresas (Matriz)", "data_atualizacao": data_receita_estab}
-])
-df_data_ibama = pd.DataFrame([
-    {"fonte": "IBAMA - CTF/APP", "data_atualizacao": data_ibama_ctf}
-])
+# --------------------------------------------------------------------------
+# ETAPAS DO PIPELINE E SUAS DEPENDÊNCIAS
+# --------------------------------------------------------------------------
+TRANSFORMACOES = [
+    "transformar_estabelecimentos",
+    "transformar_empresas",
+    "transformar_ctf",
+    "transformar_naturezas",
+    "transformar_cnaes",
+]
 
-# Salva os arquivos CSV
-caminho_receita = os.path.join(output_dir, "data_receita.csv")
-caminho_ibama = os.path.join(output_dir, "data_ibama.csv")
+def saidas_fonte(fonte):
+    """
+    Arquivos gravados pela transformação da fonte, em todos os formatos de saída.
+    """
+    return [caminho_saida(nome, formato) for nome in TABELAS_SAIDA[fonte] for formato in formatos_saida]
 
-df_data_receita.to_csv(caminho_receita, index=False)
-df_data_ibama.to_csv(caminho_ibama, index=False)
+def parametros_saida():
+    """
+    Parâmetros que alteram os arquivos gravados pelas etapas (parte dos pontos de controle).
+    """
+    return {"formatos": list(formatos_saida)}
+
+# Cada etapa declara o que lê e o que grava: concluída com as mesmas entradas e com as saídas
+# intactas, ela é pulada na execução seguinte (ver pontos_controle.py)
+ETAPAS = [
+    Etapa("baixar_estabelecimentos", baixar_estabelecimentos, recurso="rede",
+          descricao="download dos Estabelecimentos (Receita)",
+          parametros=lambda: {"urls": urls_fonte('estab')}, saidas=lambda: [estab_dir],
+          completa=lambda: fonte_baixada('estab', estab_dir)),
+    Etapa("transformar_estabelecimentos", transformar_estabelecimentos,
+          ["baixar_estabelecimentos"] + (["transformar_ctf"] if marcar_ctf else []),
+          descricao="estabelecimentos (marcados com TEM_CTF) e cnae_estabelecimentos",
+          entradas=lambda: [estab_dir] + ([caminho_membros_ctf] if marcar_ctf else []),
+          parametros=lambda: {**parametros_saida(), "marcar_ctf": marcar_ctf}, saidas=lambda: saidas_fonte('estab')),
+    Etapa("baixar_empresas", baixar_empresas, recurso="rede",
+          descricao="download das Empresas (Receita)",
+          parametros=lambda: {"urls": urls_fonte('empresas')}, saidas=lambda: [empresas_dir],
+          completa=lambda: fonte_baixada('empresas', empresas_dir)),
+    Etapa("transformar_empresas", transformar_empresas, ["baixar_empresas"],
+          descricao="dados_empresa",
+          entradas=lambda: [empresas_dir], parametros=parametros_saida, saidas=lambda: saidas_fonte('empresas')),
+    Etapa("baixar_ctf", baixar_ctf, recurso="rede",
+          descricao="download do CTF/APP (IBAMA)",
+          parametros=lambda: {"urls": urls_fonte('ctf')}, saidas=lambda: [ctf_dir],
+          completa=lambda: fonte_baixada('ctf', ctf_dir)),
+    Etapa("transformar_ctf", transformar_ctf, ["baixar_ctf"],
+          descricao="ctf_empresas e conjunto de CNPJs inscritos",
+          entradas=lambda: [ctf_dir], parametros=parametros_saida,
+          saidas=lambda: saidas_fonte('ctf') + [caminho_membros_ctf]),
+    Etapa("baixar_naturezas", baixar_naturezas, recurso="rede",
+          descricao="download das Naturezas Jurídicas (Receita)",
+          parametros=lambda: {"urls": urls_fonte('naturezas')}, saidas=lambda: [natureza_dir],
+          completa=lambda: fonte_baixada('naturezas', natureza_dir)),
+    Etapa("transformar_naturezas", transformar_naturezas, ["baixar_naturezas"],
+          descricao="naturezas_juridicas",
+          entradas=lambda: [natureza_dir], parametros=parametros_saida, saidas=lambda: saidas_fonte('naturezas')),
+    Etapa("baixar_cnaes", baixar_cnaes, recurso="rede",
+          descricao="download da tabela de CNAEs (Receita)",
+          parametros=lambda: {"urls": urls_fonte('cnaes')}, saidas=lambda: [cnae_dir],
+          completa=lambda: fonte_baixada('cnaes', cnae_dir)),
+    Etapa("transformar_cnaes", transformar_cnaes, ["baixar_cnaes"],
+          descricao="cnaes",
+          entradas=lambda: [cnae_dir], parametros=parametros_saida, saidas=lambda: saidas_fonte('cnaes')),
+    Etapa("exportar_parquet", exportar_parquet, TRANSFORMACOES,
+          descricao="conversão dos CSVs para Parquet (somente com --csv)",
+          entradas=lambda: [caminho_saida(n, "csv") for nomes in TABELAS_SAIDA.values() for n in nomes],
+          parametros=parametros_saida,
+          saidas=lambda: arquivos_parquet(*[n for nomes in TABELAS_SAIDA.values() for n in nomes])),
+    Etapa("agregar_adesao_ctf", agregar_adesao_ctf,
+          ["transformar_estabelecimentos", "transformar_ctf", "transformar_cnaes", "exportar_parquet"],
+          descricao=f"{NOME_AGREGADO}.parquet (adesão ao CTF por CNAE e UF)",
+          entradas=lambda: arquivos_parquet("estabelecimentos", "cnae_estabelecimentos", "ctf_empresas", "cnaes"),
+          saidas=lambda: arquivos_parquet(NOME_AGREGADO)),
+    Etapa("indexar_consulta", indexar_consulta,
+          ["transformar_estabelecimentos", "transformar_ctf", "exportar_parquet"],
+          descricao="índice CNAE -> CNPJs da consulta rápida por linha de comando",
+          entradas=lambda: arquivos_parquet("estabelecimentos", "cnae_estabelecimentos", "ctf_empresas"),
+          saidas=lambda: [indice_dir]),
+    Etapa("indexar_busca", indexar_busca,
+          ["transformar_estabelecimentos", "transformar_empresas", "transformar_cnaes", "exportar_parquet"],
+          descricao="índice de trigramas de desc_cnae, razao_social e NOME_FANTASIA",
+          entradas=lambda: arquivos_parquet("estabelecimentos", "dados_empresa", "cnaes"),
+          saidas=lambda: [indice_busca_dir]),
+    Etapa("calcular_delta", calcular_delta_mensal, ["transformar_estabelecimentos", "exportar_parquet"],
+          descricao="inseridos, atualizados e removidos em relação ao mês anterior",
+          entradas=lambda: arquivos_parquet("estabelecimentos"), parametros=lambda: {"mes": mes_receita()},
+          saidas=lambda: [historico_dir]),
+    Etapa("particionar_parquet", particionar_datasets, ["transformar_estabelecimentos", "exportar_parquet"],
+          descricao="datasets particionados por UF e divisão CNAE (somente com --particionar)",
+          entradas=lambda: arquivos_parquet("estabelecimentos", "cnae_estabelecimentos"),
+          parametros=lambda: {"particionar": particionar_parquet}, saidas=lambda: [particionado_dir]),
+    Etapa("juntar_empresas", juntar_estabelecimentos_empresas,
+          ["transformar_estabelecimentos", "transformar_empresas", "exportar_parquet"],
+          descricao="estabelecimentos com razão social, natureza, capital e porte (somente com --juntar-empresas)",
+          entradas=lambda: arquivos_parquet("estabelecimentos", "dados_empresa"),
+          parametros=lambda: {"juntar": juntar_empresas_parquet, "memoria_mb": orcamento_memoria.limite_mb},
+          saidas=lambda: arquivos_parquet(NOME_TABELA_LARGA)),
+    Etapa("limpeza", limpar_pastas_intermediarias, TRANSFORMACOES + ["exportar_parquet"],
+          descricao="remoção dos arquivos brutos baixados"),
+    Etapa("registrar_datas", registrar_datas, ["exportar_parquet"],
+          descricao="data_receita e data_ibama"),
+]
 
-print(f"✅ Arquivo salvo: {caminho_receita}")
-print(f"✅ Arquivo salvo: {caminho_ibama}")
+def ler_argumentos(argv=None):
+    """
+    Lê os argumentos de linha de comando (seleção de etapas, formatos e modo de execução).
+    """
+    parser = argparse.ArgumentParser(description="Pipeline de dados CNPJ e CTF IBAMA.")
+    parser.add_argument("--only", nargs="+", metavar="ETAPA", default=None,
+                        help="executa apenas as etapas informadas")
+    parser.add_argument("--skip", nargs="+", metavar="ETAPA", default=None,
+                        help="pula as etapas informadas")
+    parser.add_argument("--csv", action="store_true",
+                        help="gera as saídas em CSV (Entrada do Painel) e as converte para Parquet ao final")
+    parser.add_argument("--particionar", action="store_true",
+                        help="gera também datasets Parquet particionados por UF e por divisão CNAE")
+    parser.add_argument("--juntar-empresas", action="store_true",
+                        help="gera também a tabela larga estabelecimentos_empresas (dados da empresa em cada "
+                             "estabelecimento), com junção fora da memória")
+    parser.add_argument("--memoria", type=int, metavar="MB", default=None,
+                        help="orçamento de memória das transformações, da exportação e da junção, em MB "
+                             "(padrão: metade da memória da máquina)")
+    parser.add_argument("--forcar", action="store_true",
+                        help="executa as etapas selecionadas mesmo que estejam em dia (ignora os pontos de controle "
+                             "e a listagem da Receita gravada)")
+    parser.add_argument("--headless", action="store_true",
+                        help="execução não interativa: sem pausa inicial nem ENTER ao final "
+                             "(automático quando a entrada não é um terminal)")
+    parser.add_argument("--relatorio", metavar="ARQUIVO", default=None,
+                        help="caminho do relatório JSON de métricas (padrão: Relatorios Execucao/execucao_<data>.json)")
+    parser.add_argument("--prometheus", metavar="ARQUIVO", default=None,
+                        help="grava também as métricas no formato de texto do Prometheus")
+    parser.add_argument("--listar-etapas", action="store_true",
+                        help="lista as etapas disponíveis e suas dependências")
+    argumentos = parser.parse_args(argv)
+
+    try:
+        selecionar_etapas(ETAPAS, argumentos.only, argumentos.skip)
+    except ValueError as e:
+        parser.error(str(e))
+    return argumentos
+
+def apresentar_pipeline():
+    """
+    Mostra a apresentação inicial do pipeline: objetivo, arquivos gerados e etapas.
+    """
+    print("=" * 60)
+    print("🔄 PIPELINE DE DADOS CNPJ E CTF IBAMA")
+    print("=" * 60)
+
+    print("\n📌 Este pipeline tem como objetivo atualizar os dados utilizados no modelo semântico")
+    print("do relatório de Power BI denominado 'Consulta CTF por Descrição ou Código CNAE'.")
+    print("Ele realiza o download, extração e transformação dos principais conjuntos de dados")
+    print("necessários para garantir a integridade e atualidade da base utilizada no relatório.")
+
+    print(f"\n📦 Arquivos finais gerados por este pipeline (em formato {formatos_saida[0].upper()}):")
+
+    print("\n - estabelecimentos.csv:")
+    print("   📄 Contém: CNPJ Básico, CNPJ Completo, Nome Fantasia, Identificador Matriz/Filial,")
+    print("             Data de Início de Atividade, Tipo de Logradouro, Logradouro, Número,")
+    print("             Complemento, Bairro, CEP, UF, Município, Telefones, Fax, E-mail,")
+    print("             Inscrição no CTF (TEM_CTF) e Categorias CTF (CATEGORIAS_CTF).")
+
+    print("\n - cnae_estabelecimentos.csv:")
+    print("   📄 Contém: CNPJ Completo e Código CNAE (Primário e Secundários separados).")
+
+    print("\n - dados_empresa.csv:")
+    print("   📄 Contém: CNPJ Básico, Razão Social, Natureza Jurídica, Capital Social, Porte.")
+
+    print("\n - ctf_empresas.csv:")
+    print("   📄 Contém: CNPJ Completo e Código da Atividade (CTF/IBAMA).")
+
+    print("\n - naturezas_juridicas.csv:")
+    print("   📄 Contém: Código, Descrição, Natureza, Qualificação, Data de Início e Data de Fim.")
+
+    print("\n - cnaes.csv:")
+    print("   📄 Contém: Código CNAE e Descrição oficial, conforme tabela da Receita Federal.")
+
+    print("\n🧊 Os arquivos são gravados no formato Parquet, mais eficiente para o Power BI por ser")
+    print("   compacto, colunar e de leitura mais rápida (com --csv, gerados em CSV e convertidos ao final).")
+    print(f"   📂 Pasta: {os.path.join(dir_atual, 'Dados Painel Parquet')}")
+    print("   📄 Caminho salvo em: caminho_dados_parquet.txt")
+
+    print("\nEste pipeline agendado realizará as seguintes etapas:")
+    print("\n1️⃣  Download e transformação dos dados de estabelecimentos do CNPJ:")
+    print("    - Scripts: get_files_online.py, transform_cnpj_estabelecimentos.py")
+    print("    - Funções: get_latest_cnpj_urls(), get_files_online(), transform_cnpj()\n")
+
+    print("2️⃣  Download e transformação dos dados das empresas (matriz) do CNPJ:")
+    print("    - Scripts: get_files_online.py, transform_cnpj_empresas.py")
+    print("    - Funções: get_latest_cnpj_urls(), get_files_online(), transform_cnpj_empresas()\n")
+
+    print("3️⃣  Download e transformação dos dados do CTF (IBAMA):")
+    print("    - Scripts: get_files_online.py, transform_ctf.py")
+    print("    - Funções: get_files_online(), transform_ctf()\n")
+
+    print("4️⃣  Download e transformação dos dados de Natureza Jurídica do CNPJ:")
+    print("    - Scripts: get_files_online.py, transform_natureza_juridica.py")
+    print("    - Funções: get_latest_cnpj_urls(), get_files_online(), transform_naturezas_juridicas()\n")
+
+    print("⚙️  As etapas são executadas por dependência (agendador.py): downloads e transformações")
+    print("    independentes rodam ao mesmo tempo. Use --only/--skip para selecionar etapas.\n")
+
+    print("🗃️ Os resultados finais serão armazenados em:")
+    if "csv" in formatos_saida:
+        print(f"    📂 CSV:    {output_dir}")
+    print(f"    📂 Parquet: {parquet_dir}")
+    if particionar_parquet:
+        print(f"    📂 Parquet particionado: {particionado_dir}")
+    if juntar_empresas_parquet:
+        print(f"    📄 Tabela larga: {os.path.join(parquet_dir, NOME_TABELA_LARGA + '.parquet')}")
+    print(f"\n🧠 Orçamento de memória: {orcamento_memoria.limite_mb} MB (use --memoria para alterar)")
+
+def resumir_execucao(situacao, relatorio, inicio_pipeline, fim_pipeline):
+    """
+    Mostra o resumo final: situação e duração das etapas, datas dos dados e arquivos gerados.
+    """
+    print("\n===== PIPELINE COMPLETO! =====\n")
 
-# --------------------------------------------------------------------------
-# FINALIZAÇÃO
-# --------------------------------------------------------------------------
-fim_pipeline = datetime.now()
-duracao = fim_pipeline - inicio_pipeline
+    print("📋 Situação das etapas:")
+    for nome, situacao_etapa in situacao.items():
+        icone = '✅' if situacao_etapa in SUCESSO else '⚠️' if situacao_etapa == INCOMPLETA else '❌'
+        print(f"   {icone} {nome}: {situacao_etapa}")
+    print()
+
+    print(f"📅 Data dos dados da Receita Federal: {estado.get('data_receita_estab', '-')}")
+    print(f"📅 Data dos dados do IBAMA (CTF):     {estado.get('data_ibama_ctf', '-')}")
+    print(f"🕓 Início da execução:                {inicio_pipeline.strftime('%Y-%m-%d %H:%M:%S')}")
+    print(f"🕓 Fim da execução:                   {fim_pipeline.strftime('%Y-%m-%d %H:%M:%S')}")
+    print(f"⏱️  Duração total:                    {str(fim_pipeline - inicio_pipeline)}")
 
-print("\n===== PIPELINE COMPLETO! =====\n")
+    print("\n⏱️ Duração por etapa:")
+    for medicao in relatorio["etapas"]:
+        print(f"   {medicao['etapa']:<30} {medicao['segundos']:>10.1f} s  (CPU {medicao['cpu_segundos']:.1f} s)")
 
-print(f"📅 Data dos dados da Receita Federal: {data_receita_estab}")
-print(f"📅 Data dos dados do IBAMA (CTF):     {data_ibama_ctf}")
-print(f"🕓 Início da execução:                {inicio_pipeline.strftime('%Y-%m-%d %H:%M:%S')}")
-print(f"🕓 Fim da execução:                   {fim_pipeline.strftime('%Y-%m-%d %H:%M:%S')}")
-print(f"⏱️  Duração total:                    {str(duracao)}")
+    print("\n📁 Arquivos gerados:")
 
-print("\n📁 Arquivos gerados:")
+    print("\n🔹 Estabelecimentos (estabelecimentos)")
+    print(f"   - Local: {os.path.abspath(caminho_saida('estabelecimentos'))}")
+    print("   - Colunas: CNPJ Básico, CNPJ Completo, Nome Fantasia, Identificador Matriz/Filial, Data de Início de Atividade,")
+    print("              Tipo de Logradouro, Logradouro, Número, Complemento, Bairro, CEP, UF, Município, Telefones, Fax, E-mail,")
+    print("              Inscrição no CTF (TEM_CTF), Categorias CTF (CATEGORIAS_CTF).\n")
 
-print("\n🔹 Estabelecimentos (estabelecimentos.csv)")
-print(f"   - Local: {os.path.abspath(os.path.join(output_dir, 'estabelecimentos.csv'))}")
-print("   - Colunas: CNPJ Básico, CNPJ Completo, Nome Fantasia, Identificador Matriz/Filial, Data de Início de Atividade,")
-print("              Tipo de Logradouro, Logradouro, Número, Complemento, Bairro, CEP, UF, Município, Telefones, Fax, E-mail.\n")
+    print("🔹 CNAEs dos Estabelecimentos (cnae_estabelecimentos)")
+    print(f"   - Local: {os.path.abspath(caminho_saida('cnae_estabelecimentos'))}")
+    print("   - Colunas: CNPJ Completo, CNAE (Primário e Secundários separados).\n")
 
-print("🔹 CNAEs dos Estabelecimentos (cnae_estabelecimentos.csv)")
-print(f"   - Local: {os.path.abspath(os.path.join(output_dir, 'cnae_estabelecimentos.csv'))}")
-print("   - Colunas: CNPJ Completo, CNAE (Primário e Secundários separados).\n")
+    print("🔹 Empresas Matriz (dados_empresa)")
+    print(f"   - Local: {os.path.abspath(caminho_saida('dados_empresa'))}")
+    print("   - Colunas: CNPJ Básico, Razão Social, Natureza Jurídica, Capital Social, Porte da Empresa.\n")
 
-print("🔹 Empresas Matriz (dados_empresa.csv)")
-print(f"   - Local: {os.path.abspath(os.path.join(output_dir, 'dados_empresa.csv'))}")
-print("   - Colunas: CNPJ Básico, Razão Social, Natureza Jurídica, Capital Social, Porte da Empresa.\n")
+    print("🔹 Cadastro Técnico Federal - CTF (ctf_empresas)")
+    print(f"   - Local: {os.path.abspath(caminho_saida('ctf_empresas'))}")
+    print("   - Colunas: CNPJ Completo, Código da Atividade (CTF/IBAMA).\n")
 
-print("🔹 Cadastro Técnico Federal - CTF (ctf_empresas.csv)")
-print(f"   - Local: {os.path.abspath(os.path.join(output_dir, 'ctf_empresas.csv'))}")
-print("   - Colunas: CNPJ Completo, Código da Atividade (CTF/IBAMA).\n")
+    print("🔹 Naturezas Jurídicas (naturezas_juridicas)")
+    print(f"   - Local: {os.path.abspath(caminho_saida('naturezas_juridicas'))}")
+    print("   - Colunas: Código, Descrição, Natureza, Qualificação, Data de Início, Data de Fim.\n")
 
-print("🔹 Naturezas Jurídicas (naturezas_juridicas.csv)")
-print(f"   - Local: {os.path.abspath(os.path.join(output_dir, 'naturezas_juridicas.csv'))}")
-print("   - Colunas: Código, Descrição, Natureza, Qualificação, Data de Início, Data de Fim.\n")
+    print("🔹 CNAEs (cnaes)")
+    print(f"   - Local: {os.path.abspath(caminho_saida('cnaes'))}")
+    print("   - Colunas: cnae, desc_cnae.\n")
 
-print("🔹 CNAEs (cnae.csv)")
-print(f"   - Local: {os.path.abspath(os.path.join(output_dir, 'cnaes.csv'))}")
-print("   - Colunas: cnae, desc_cnae.\n")
+    print(f"🔹 Adesão ao CTF por CNAE e UF ({NOME_AGREGADO})")
+    print(f"   - Local: {os.path.abspath(os.path.join(parquet_dir, NOME_AGREGADO + '.parquet'))}")
+    print("   - Colunas: cnae, desc_cnae, UF, estabelecimentos, estabelecimentos_ctf, adesao_ctf, idade_media_anos.\n")
 
-input("\n ▶️ Pressione ENTER para fechar...")
+def codigo_saida(situacao):
+    """
+    Código de saída do processo: SAIDA_OK se todas as etapas terminaram com sucesso,
+    SAIDA_FALHA caso contrário (inclusive etapas incompletas).
+    """
+    return SAIDA_OK if all(s in SUCESSO for s in situacao.values()) else SAIDA_FALHA
 
+def run_pipeline(somente=None, pular=None, csv=False, particionar=False, interativo=False,
+                 relatorio=None, prometheus=None, forcar=False, juntar=False, memoria=None):
+    """
+    Executa o pipeline e devolve o relatório da execução (ver metricas.py), com a situação
+    de cada etapa em relatorio["situacao"] (use codigo_saida() para obter o código de saída).
+
+    - 'somente' / 'pular': seleção de etapas, como --only / --skip
+    - 'csv' / 'particionar': como --csv / --particionar
+    - 'juntar': como --juntar-empresas
+    - 'memoria': orçamento de memória em MB, como --memoria (None = 'memoria_mb', automático se também None)
+    - 'interativo': aguarda o ENTER (ou 30 s) antes de começar; por padrão inicia imediatamente,
+      o que permite chamar o pipeline de um orquestrador ou de outro programa Python
+    - 'relatorio' / 'prometheus': caminhos do relatório de métricas, como --relatorio / --prometheus
+    - 'forcar': executa as etapas mesmo que estejam em dia nos pontos de controle, como --forcar
+      (e consulta de novo a listagem da Receita, em vez de reaproveitar a gravada)
+
+    Levanta ValueError se alguma etapa informada não existir.
+    """
+    global formatos_saida, particionar_parquet, juntar_empresas_parquet, orcamento_memoria
+
+    selecionar_etapas(ETAPAS, somente, pular)
+    formatos_saida = ("csv",) if csv else ("parquet",)
+    particionar_parquet = particionar
+    juntar_empresas_parquet = juntar
+    orcamento_memoria = OrcamentoMemoria(memoria if memoria is not None else memoria_mb)
+
+    # Cada execução começa com o estado e as métricas zerados
+    estado.clear()
+    metricas.reiniciar()
+    listagem_receita.reiniciar()
+    if forcar:
+        listagem_receita.descartar()
+    inicio_pipeline = datetime.now()
+
+    apresentar_pipeline()
+    if interativo:
+        esperar_enter(timeout=30)
+
+    # Executa as etapas selecionadas, respeitando as dependências
+    situacao = executar_etapas(ETAPAS, somente=somente, pular=pular,
+                               trabalhadores=etapas_simultaneas, metricas=metricas,
+                               pontos_controle=pontos_controle, forcar=forcar)
+
+    fim_pipeline = datetime.now()
+    relatorio_execucao = gravar_relatorio_execucao(situacao, relatorio, prometheus)
+    resumir_execucao(situacao, relatorio_execucao, inicio_pipeline, fim_pipeline)
+    return relatorio_execucao
+
+def main(argv=None):
+    """
+    Ponto de entrada da linha de comando. Retorna o código de saída
+    (SAIDA_OK, SAIDA_FALHA ou SAIDA_ARGUMENTOS).
+    """
+    try:
+        argumentos = ler_argumentos(argv)
+    except SystemExit as e:
+        return SAIDA_OK if e.code in (0, None) else SAIDA_ARGUMENTOS
+
+    if argumentos.listar_etapas:
+        for etapa in ETAPAS:
+            dependencias = ", ".join(etapa.dependencias) or "-"
+            print(f"{etapa.nome:<30} [{etapa.recurso}] depende de: {dependencias}")
+        return SAIDA_OK
+
+    # Sem terminal (agendador, cron, contêiner), a execução é sempre não interativa
+    interativo = not argumentos.headless and sys.stdin is not None and sys.stdin.isatty()
+
+    relatorio = run_pipeline(
+        somente=argumentos.only, pular=argumentos.skip, csv=argumentos.csv, particionar=argumentos.particionar,
+        interativo=interativo, relatorio=argumentos.relatorio, prometheus=argumentos.prometheus,
+        forcar=argumentos.forcar, juntar=argumentos.juntar_empresas, memoria=argumentos.memoria,
+    )
+    codigo = codigo_saida(relatorio["situacao"])
+
+    if interativo:
+        input("\n ▶️ Pressione ENTER para fechar...")
+    return codigo
+
+if __name__ == "__main__":
+    sys.exit(main())
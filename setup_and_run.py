@@ -29,16 +29,19 @@ def criar_pastas(pastas):
         else:
             print(f"📁 Pasta já existe: {pasta}")
 
-# Função para executar o pipeline
-def executar_pipeline(script_path):
+# Função para executar o pipeline (repassa os argumentos, ex: --headless) e devolver o código de saída
+def executar_pipeline(script_path, argumentos=()):
     print(f"\n🚀 Executando pipeline: {script_path}\n")
     try:
-        subprocess.run([sys.executable, script_path], check=True)
+        subprocess.run([sys.executable, script_path, *argumentos], check=True)
         print("✅ Pipeline executado com sucesso.")
+        return 0
     except subprocess.CalledProcessError as e:
         print(f"❌ Erro ao executar {script_path} - Código de retorno: {e.returncode}")
+        return e.returncode
     except Exception as ex:
         print(f"❌ Erro inesperado: {ex}")
+        return 1
 
 if __name__ == "__main__":
     print("=" * 60)
@@ -64,13 +67,16 @@ if __name__ == "__main__":
 
     # Executar o run.py
     caminho_run = os.path.join(os.getcwd(), "run.py")
+    codigo = 1
     if os.path.exists(caminho_run):
-        executar_pipeline(caminho_run)
+        codigo = executar_pipeline(caminho_run, sys.argv[1:])
     else:
         print(f"❌ run.py não encontrado em: {caminho_run}")
 
     print("\n📋 Pacotes instalados no ambiente:")
     subprocess.run([sys.executable, "-m", "pip", "list"])
 
-    if sys.stdin.isatty():
+    if sys.stdin.isatty() and "--headless" not in sys.argv:
         input("\n⏹️ Pressione ENTER para encerrar...")
+
+    sys.exit(codigo)
@@ -0,0 +1,107 @@
+import os
+import re
+import json
+import threading
+import pytest
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from get_files_online import get_files_online, PASTA_PARCIAIS
+
+# 5,5 MB: grande o bastante para ser dividido em 4 segmentos (mínimo de 1 MB por segmento)
+CONTEUDO = bytes(range(256)) * (5_500_000 // 256)
+ETAG = '"v1"'
+
+
+class ServidorRange(BaseHTTPRequestHandler):
+    """Servidor local de um único arquivo, com suporte opcional a requisições por faixa (Range)."""
+
+    aceita_range = True
+    faixas_pedidas = []
+
+    def log_message(self, *args):
+        pass
+
+    def _cabecalhos(self, status, tamanho, inicio=None, fim=None):
+        self.send_response(status)
+        self.send_header("Content-Length", str(tamanho))
+        self.send_header("ETag", ETAG)
+        if self.aceita_range:
+            self.send_header("Accept-Ranges", "bytes")
+        if inicio is not None:
+            self.send_header("Content-Range", f"bytes {inicio}-{fim}/{len(CONTEUDO)}")
+        self.end_headers()
+
+    def do_HEAD(self):
+        self._cabecalhos(200, len(CONTEUDO))
+
+    def do_GET(self):
+        faixa = self.headers.get("Range")
+        type(self).faixas_pedidas.append(faixa)
+        encontrada = re.fullmatch(r"bytes=(\d+)-(\d*)", faixa or "")
+        if not (self.aceita_range and encontrada):
+            self._cabecalhos(200, len(CONTEUDO))
+            self.wfile.write(CONTEUDO)
+            return
+        inicio = int(encontrada.group(1))
+        fim = int(encontrada.group(2)) if encontrada.group(2) else len(CONTEUDO) - 1
+        self._cabecalhos(206, fim - inicio + 1, inicio, fim)
+        self.wfile.write(CONTEUDO[inicio:fim + 1])
+
+
+@pytest.fixture
+def servidor():
+    def iniciar(aceita_range=True):
+        manipulador = type("Manipulador", (ServidorRange,), {"aceita_range": aceita_range, "faixas_pedidas": []})
+        httpd = ThreadingHTTPServer(("127.0.0.1", 0), manipulador)
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        servidores.append(httpd)
+        return f"http://127.0.0.1:{httpd.server_port}/Estabelecimentos0.zip", manipulador
+
+    servidores = []
+    yield iniciar
+    for httpd in servidores:
+        httpd.shutdown()
+        httpd.server_close()
+
+
+def _baixado(pasta):
+    with open(os.path.join(pasta, "file_0_Estabelecimentos0.zip"), "rb") as f:
+        return f.read()
+
+
+def test_download_segmentado(servidor, tmp_path):
+    url, manipulador = servidor()
+    assert get_files_online([url], str(tmp_path), segmentos=4, extrair=False) == ([url], [])
+    assert _baixado(tmp_path) == CONTEUDO
+    assert len(manipulador.faixas_pedidas) == 4
+    assert all(faixa is not None for faixa in manipulador.faixas_pedidas)
+
+
+def test_retoma_download_interrompido(servidor, tmp_path):
+    url, manipulador = servidor()
+    # Metade do arquivo já em disco, de uma execução anterior com o mesmo plano
+    pasta_parciais = tmp_path / PASTA_PARCIAIS
+    pasta_parciais.mkdir()
+    parcial = pasta_parciais / "file_0_Estabelecimentos0.zip"
+    with open(f"{parcial}.json", "w", encoding="utf-8") as f:
+        json.dump({"url": url, "tamanho": len(CONTEUDO), "validador": ETAG, "segmentos": 1}, f)
+    metade = len(CONTEUDO) // 2
+    (pasta_parciais / "file_0_Estabelecimentos0.zip.0").write_bytes(CONTEUDO[:metade])
+
+    get_files_online([url], str(tmp_path), segmentos=1, extrair=False)
+    assert _baixado(tmp_path) == CONTEUDO
+    assert manipulador.faixas_pedidas == [f"bytes={metade}-"]
+
+
+def test_servidor_sem_range_baixa_inteiro(servidor, tmp_path):
+    url, manipulador = servidor(aceita_range=False)
+    get_files_online([url], str(tmp_path), segmentos=4, extrair=False)
+    assert _baixado(tmp_path) == CONTEUDO
+    assert manipulador.faixas_pedidas == [None]
+
+
+def test_falha_de_download_e_devolvida(servidor, tmp_path):
+    url, _ = servidor()
+    inacessivel = "http://127.0.0.1:1/Estabelecimentos1.zip"
+    alterados, falhas = get_files_online([url, inacessivel], str(tmp_path), tentativas=1, extrair=False)
+    assert alterados == [url]
+    assert falhas == [inacessivel]
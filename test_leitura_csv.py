@@ -0,0 +1,49 @@
+import pytest
+from leitura_csv import ler_csv, ler_csv_em_blocos, MOTORES
+from metricas import metricas
+
+COLUNAS = ["a", "b", "c"]
+
+# Segunda linha com um campo a menos, terceira com um campo a mais
+CONTEUDO_MALFORMADO = "1;x;p\n2;y\n3;z;q;sobra\n4;w;r\n"
+
+
+@pytest.fixture
+def csv_malformado(tmp_path):
+    caminho = tmp_path / "malformado.csv"
+    caminho.write_text(CONTEUDO_MALFORMADO, encoding="utf-8")
+    metricas.reiniciar()
+    return str(caminho)
+
+
+def _linhas_lidas(nome):
+    return sum(r.get("linhas_lidas", 0) for (_, arquivo), r in metricas.arquivos.items() if arquivo == nome)
+
+
+def test_pandas_completa_linha_curta(csv_malformado):
+    df = ler_csv(csv_malformado, colunas=COLUNAS, usecols=["a", "c"], motor="pandas")
+    assert df["a"].tolist() == ["1", "2", "3", "4"]
+    assert df["c"].isna().tolist() == [False, True, False, False]
+
+
+def test_pyarrow_descarta_e_relata_linhas_malformadas(csv_malformado, capsys):
+    df = ler_csv(csv_malformado, colunas=COLUNAS, usecols=["a", "c"], motor="pyarrow")
+    assert df["a"].tolist() == ["1", "4"]
+    assert "2 linha(s) com número incorreto de colunas descartada(s)" in capsys.readouterr().out
+    assert _linhas_lidas("malformado.csv") == 2
+
+
+@pytest.mark.parametrize("motor", MOTORES)
+def test_linhas_validas_iguais_nos_dois_motores(csv_malformado, motor):
+    blocos = list(ler_csv_em_blocos(csv_malformado, colunas=COLUNAS, usecols=["a", "c"], chunk_size=10, motor=motor))
+    linhas = [linha for bloco in blocos for linha in bloco.itertuples(index=False, name=None)]
+    assert ("1", "p") in linhas and ("4", "r") in linhas
+
+
+def test_pyarrow_sem_linhas_malformadas_nao_relata(tmp_path, capsys):
+    caminho = tmp_path / "valido.csv"
+    caminho.write_text("1;x;p\n2;y;q\n", encoding="utf-8")
+    metricas.reiniciar()
+    assert len(ler_csv(str(caminho), colunas=COLUNAS, motor="pyarrow")) == 2
+    assert "descartada" not in capsys.readouterr().out
+    assert _linhas_lidas("valido.csv") == 0
@@ -1,26 +1,31 @@
-import os
-import pandas as pd
+from leitura_csv import ler_csv
+from fontes_csv import como_fonte, tamanho_fonte
+from escrita_saidas import gravar_tabela
+from metricas import registrar_arquivo
 
-def transform_cnae(arquivo_csv, caminho_saida):
+def transform_cnae(arquivo_csv, caminho_saida, motor="pandas", formatos=("csv",), caminho_parquet=None):
     """
     Transforma o arquivo CNAE da Receita Federal, extraído do Cnaes.zip,
     renomeando as colunas para 'cnae' e 'desc_cnae' e salvando o CSV final.
+
+    'arquivo_csv' pode ser o CSV extraído, o próprio Cnaes.zip ou uma Fonte (membro de ZIP),
+    lido sem extração para o disco. 'motor' escolhe o leitor CSV ("pandas" ou "pyarrow").
+    'formatos' define as saídas: "csv" (em 'caminho_saida') e/ou "parquet" (em 'caminho_parquet').
     """
     try:
-        df = pd.read_csv(
+        df = ler_csv(
             arquivo_csv,
+            colunas=["cnae", "desc_cnae"],
             encoding="windows-1252",
-            delimiter=";",
-            names=["cnae", "desc_cnae"],
-            header=None,
-            dtype=str
+            delimitador=";",
+            motor=motor
         )
     except Exception as e:
         print(f"⚠️ Erro ao ler o arquivo CNAE: {e}")
         return
 
-    os.makedirs(caminho_saida, exist_ok=True)
-    caminho_saida_arquivo = os.path.join(caminho_saida, "cnaes.csv")
-    df.to_csv(caminho_saida_arquivo, index=False)
+    registrar_arquivo(como_fonte(arquivo_csv).nome, bytes_lidos=tamanho_fonte(arquivo_csv),
+                      linhas_lidas=len(df), linhas_filtradas=len(df))
 
-    print(f"✅ Transformação concluída. Arquivo salvo em: {caminho_saida_arquivo}")
+    for caminho_saida_arquivo in gravar_tabela(df, "cnaes", caminho_saida, caminho_parquet, formatos):
+        print(f"✅ Transformação concluída. Arquivo salvo em: {caminho_saida_arquivo}")
@@ -1,63 +1,144 @@
 import os
+import shutil
 import pandas as pd
 import warnings
+from fontes_csv import listar_fontes, tamanho_fonte
+from leitura_csv import ler_csv_em_blocos
+from processamento_paralelo import executar_em_paralelo, juntar_partes
+from escrita_saidas import EscritorTabela, validar_formatos
+from metricas import registrar_arquivo
 
 # Suprime warnings de leitura
 warnings.simplefilter(action='ignore', category=pd.errors.ParserWarning)
 
-def transform_cnpj_empresas(caminho_pasta, caminho_saida):
+# Layout do arquivo EMPRESA (7 colunas, identificadas pela posição)
+COLUNAS_EMPRESAS = [str(i) for i in range(7)]
+
+# Colunas efetivamente lidas (projeção) e seus nomes na saída
+COLUNAS_SAIDA_EMPRESAS = {
+    '0': 'cnpj_basico',
+    '1': 'razao_social',
+    '2': 'natureza_juridica',
+    '5': 'capital_social',
+    '6': 'porte'
+}
+
+def _transformar_fonte_empresas(fonte, escritor, motor, orcamento=None):
+    """
+    Lê uma fonte (shard) EMPRESA e grava as colunas de saída no escritor (ver escrita_saidas.py).
+    Sem 'orcamento', o shard é lido inteiro; com ele, em blocos do tamanho do orçamento de memória.
+
+    Retorna (registros, erro), em que 'erro' é None ou a mensagem da falha.
+    Executada tanto no processo principal quanto nos processos do modo paralelo.
+    """
+
+    registros = 0
+    try:
+        leitor = ler_csv_em_blocos(
+            fonte,
+            colunas=COLUNAS_EMPRESAS,  # layout do arquivo EMPRESA
+            usecols=list(COLUNAS_SAIDA_EMPRESAS),
+            encoding="latin1",  # codificação dos arquivos da Receita
+            delimitador=";",
+            motor=motor,
+            orcamento=orcamento
+        )
+
+        for df in leitor:
+            if df.shape[1] < len(COLUNAS_SAIDA_EMPRESAS):
+                return registros, "possui colunas insuficientes"
+
+            # Renomeia colunas conforme layout Receita
+            df = df.rename(columns=COLUNAS_SAIDA_EMPRESAS)
+
+            df = df[['cnpj_basico', 'razao_social', 'natureza_juridica', 'capital_social', 'porte']]
+            escritor.escrever(df)
+            registros += len(df)
+    except Exception as e:
+        return registros, f"Erro ao ler: {e}"
+
+    return registros, None
+
+
+def _transformar_shard_empresas(fonte, pasta_parcial, indice, formatos, motor, orcamento=None):
+    """
+    Transforma um shard EMPRESA em uma saída parcial própria (no processo principal ou em um do modo paralelo).
+    """
+
+    with EscritorTabela(f"dados_empresa_{indice:04d}", pasta_parcial, pasta_parcial, formatos,
+                        tabela="dados_empresa") as escritor:
+        return _transformar_fonte_empresas(fonte, escritor, motor, orcamento)
+
+
+def transform_cnpj_empresas(caminho_pasta, caminho_saida, motor="pandas", processos=1,
+                            formatos=("csv",), caminho_parquet=None, orcamento=None):
     """
     Transforma os arquivos do tipo EMPRESA da Receita Federal em:
     - dados_empresa.csv: CNPJ básico, razão social, natureza jurídica, capital social e porte
+
+    Arquivos ZIP na pasta são lidos diretamente, sem extração para o disco.
+    'motor' escolhe o leitor CSV: "pandas" ou "pyarrow" (multithread, ver leitura_csv.py).
+    Cada shard é gravado em uma saída parcial própria assim que lido; só um shard fica em memória por vez.
+    Com 'orcamento' (OrcamentoMemoria), cada shard é lido em blocos do tamanho do orçamento de memória
+    (dividido entre os processos no modo paralelo).
+    Com 'processos' > 1, os shards são transformados em paralelo.
+    As parciais são juntadas ao final na ordem dos arquivos; a de um shard que falha no meio da leitura
+    é descartada inteira, para que a saída nunca fique com parte de um arquivo.
+    'formatos' define as saídas: "csv" (em 'caminho_saida') e/ou "parquet" (em 'caminho_parquet').
+
+    Retorna a lista dos arquivos que falharam (vazia se todos foram transformados).
     """
 
-    empresas = []
+    formatos = validar_formatos(formatos, caminho_parquet)
+    os.makedirs(caminho_saida, exist_ok=True)
+    total = 0
 
     print(f"\n📁 Verificando arquivos EMPRESA em: {caminho_pasta}")
-    arquivos = sorted([f for f in os.listdir(caminho_pasta) if not f.endswith('.csv') and not f.startswith('.')])
-
-    for i, arquivo in enumerate(arquivos, start=1):
-        caminho_arquivo = os.path.join(caminho_pasta, arquivo)
-        print(f"\n🔄 ({i}/{len(arquivos)}) Lendo: {arquivo}")
-
-        try:
-            df = pd.read_csv(
-                caminho_arquivo,
-                encoding="windows-1251",
-                delimiter=";",
-                names=list(range(0,10)),  # layout do arquivo EMPRESA
-                index_col=False,
-                dtype=str
-            )
-            print(f"   ➡️ {len(df)} registros carregados.")
-        except Exception as e:
-            print(f"⚠️ Erro ao ler {arquivo}: {e}")
-            continue
+    fontes = [f for f in listar_fontes(caminho_pasta) if not f.nome.endswith('.csv')]
 
-        if df.shape[1] < 7:
-            print(f"⚠️ Arquivo {arquivo} possui colunas insuficientes. Pulando...")
-            continue
+    if processos > 1 and len(fontes) > 1:
+        print(f"⚙️ Transformando {len(fontes)} arquivos em até {processos} processos paralelos...")
 
-        # Renomeia colunas conforme layout Receita
-        df = df.rename(columns={
-            0: 'cnpj_basico',
-            1: 'razao_social',
-            2: 'natureza_juridica',
-            5: 'capital_social',
-            6: 'porte'
-        })
+    # Cada shard grava uma saída parcial própria: um shard que falha no meio é descartado inteiro
+    pasta_parcial = os.path.join(caminho_saida, ".parciais_empresas")
+    shutil.rmtree(pasta_parcial, ignore_errors=True)
+    os.makedirs(pasta_parcial)
 
-        df = df[['cnpj_basico', 'razao_social', 'natureza_juridica', 'capital_social', 'porte']]
-        empresas.append(df)
+    orcamento_shard = orcamento.dividir(min(processos, len(fontes))) if orcamento is not None else None
+    tarefas = [(fonte, pasta_parcial, indice, formatos, motor, orcamento_shard)
+               for indice, fonte in enumerate(fontes)]
+    resultados = executar_em_paralelo(_transformar_shard_empresas, tarefas, processos)
 
-    if not empresas:
-        print("⚠️ Nenhum dado de EMPRESA processado.")
-        return
+    concluidos = []
+    falhas = []
+    for i, (fonte, (registros, erro)) in enumerate(zip(fontes, resultados), start=1):
+        print(f"\n🔄 ({i}/{len(fontes)}) {fonte.nome}")
+        if erro is not None:
+            registrar_arquivo(fonte.nome, bytes_lidos=tamanho_fonte(fonte), linhas_lidas=registros)
+            print(f"⚠️ {fonte.nome}: {erro}. Arquivo descartado ({registros} registros não gravados).")
+            falhas.append(fonte.nome)
+            continue
+        registrar_arquivo(fonte.nome, bytes_lidos=tamanho_fonte(fonte), linhas_lidas=registros,
+                          linhas_filtradas=registros)
+        print(f"   ➡️ {registros} registros carregados.")
+        concluidos.append(i - 1)
+        total += registros
 
-    os.makedirs(caminho_saida, exist_ok=True)
-    df_final = pd.concat(empresas, ignore_index=True)
-    df_final.to_csv(os.path.join(caminho_saida, 'dados_empresa.csv'), index=False)
+    if total:
+        destinos = EscritorTabela("dados_empresa", caminho_saida, caminho_parquet, formatos).destinos
+        partes = {
+            formato: [os.path.join(pasta_parcial, f"dados_empresa_{i:04d}.{formato}") for i in concluidos]
+            for formato in destinos
+        }
+        juntar_partes(partes, destinos, total)
+    shutil.rmtree(pasta_parcial, ignore_errors=True)
+
+    if total == 0:
+        print("⚠️ Nenhum dado de EMPRESA processado.")
+        return falhas
 
-    print(f"\n📋 Total de registros consolidados: {len(df_final)} registros.")
+    print(f"\n📋 Total de registros consolidados: {total} registros.")
     print("\n✅ Transformação de EMPRESAS concluída.")
-    print(" - Arquivo salvo: dados_empresa.csv")
+    for formato in formatos:
+        print(f" - Arquivo salvo: dados_empresa.{formato}")
+    return falhas
@@ -1,115 +1,383 @@
 import os
+import shutil
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
 import warnings
+from fontes_csv import listar_fontes, tamanho_fonte
+from leitura_csv import ler_csv_em_blocos
+from processamento_paralelo import executar_em_paralelo, juntar_partes
+from escrita_saidas import EscritorTabela, validar_formatos
+from esquema_saida import codigos_cnae, explodir_cnaes, lista_cnaes, esquema_saida
+from chave_cnpj import compor_cnpj
+from membros_ctf import MembrosCTF, COLUNA_TEM_CTF, COLUNA_CATEGORIAS_CTF
+from metricas import registrar_arquivo
 
 # Suprime ParserWarnings causados por diferença de colunas
 warnings.simplefilter(action='ignore', category=pd.errors.ParserWarning)
 
-def transform_cnpj(caminho_pasta, caminho_saida):
+# 30 colunas do layout oficial de ESTABELECIMENTOS da Receita Federal
+COLUNAS_ESTABELECIMENTOS = [
+    'CNPJ_BASICO',
+    'CNPJ_ORDEM',
+    'CNPJ_DV',
+    'IDENT_MATRIZ_FILIAL',
+    'NOME_FANTASIA',
+    'SITUACAO_CADASTRAL',
+    'DATA_SITUACAO_CADASTRAL',
+    'MOTIVO_SITUACAO_CADASTRAL',
+    'NOME_CIDADE_EXTERIOR',
+    'PAIS',
+    'DATA_INICIO_ATIVIDADE',
+    'CNAE_PRIMARIO',
+    'CNAES_SECUNDARIOS',
+    'TIPO_LOGRADOURO',
+    'LOGRADOURO',
+    'NUMERO',
+    'COMPLEMENTO',
+    'BAIRRO',
+    'CEP',
+    'UF',
+    'MUNICIPIO',
+    'DDD_1',
+    'TELEFONE_1',
+    'DDD_2',
+    'TELEFONE_2',
+    'DDD_FAX',
+    'FAX',
+    'EMAIL',
+    'SITUACAO_ESPECIAL',
+    'DATA_SITUACAO_ESPECIAL'
+]
+
+# Colunas sempre lidas, pois são usadas no filtro, no CNPJ_COMPLETO e nos CNAEs
+COLUNAS_NECESSARIAS = [
+    'CNPJ_BASICO',
+    'CNPJ_ORDEM',
+    'CNPJ_DV',
+    'SITUACAO_CADASTRAL',
+    'CNAE_PRIMARIO',
+    'CNAES_SECUNDARIOS'
+]
+
+
+def _texto_arrow(coluna):
+    """Coluna de texto de uma tabela Arrow como um único pa.Array de string."""
+    return coluna.combine_chunks().cast(pa.string())
+
+
+def _tabela_cnaes(cnpj, primario, secundarios, em_lista=False):
+    """
+    Monta o bloco de CNAEs dos estabelecimentos em Arrow, a partir da chave int64 'cnpj' e das colunas
+    de texto dos CNAEs, com os códigos já convertidos para int32
+    (sem split/explode de objetos Python nem cópias intermediárias do bloco):
+    - padrão: (CNPJ_COMPLETO, CNAE), um CNAE por linha, primeiro os primários e depois os secundários
+    - 'em_lista': (CNPJ_COMPLETO, CNAE_PRIMARIO, CNAES_SECUNDARIOS list<int32>), um estabelecimento por linha
+    Códigos vazios ou fora do formato são descartados.
+    """
+
+    primario = codigos_cnae(_texto_arrow(primario))
+    secundarios = _texto_arrow(secundarios)
+
+    if em_lista:
+        return pa.table({
+            "CNPJ_COMPLETO": cnpj,
+            "CNAE_PRIMARIO": primario,
+            "CNAES_SECUNDARIOS": lista_cnaes(secundarios),
+        })
+
+    linhas, codigos = explodir_cnaes(secundarios)
+    validos = primario.is_valid()
+    return pa.table({
+        "CNPJ_COMPLETO": pa.concat_arrays([cnpj.filter(validos), cnpj.take(linhas)]),
+        "CNAE": pa.concat_arrays([primario.filter(validos), codigos]),
+    })
+
+
+def _processar_chunk(df, colunas=None, cnaes_em_lista=False, membros_ctf=None):
+    """
+    Filtra os estabelecimentos ativos de um bloco de linhas e monta, em Arrow:
+    - o bloco de estabelecimentos com a chave int64 CNPJ_COMPLETO à frente (ver chave_cnpj.py)
+      e apenas 'colunas', se informadas; com 'membros_ctf', acrescenta ao final TEM_CTF e CATEGORIAS_CTF
+    - o bloco de CNAEs (ver _tabela_cnaes)
+    """
+
+    df = df[df['SITUACAO_CADASTRAL'] == "02"]  # Situação Cadastral = 02 (ativo)
+
+    if df.empty:
+        return None, None
+
+    # CNPJ COMPLETO (básico, ordem e DV compostos em int64, sem concatenar texto) à frente das demais colunas
+    tabela = pa.Table.from_pandas(df, preserve_index=False).replace_schema_metadata(None)
+    cnpj = compor_cnpj(tabela.column('CNPJ_BASICO'), tabela.column('CNPJ_ORDEM'), tabela.column('CNPJ_DV'))
+
+    cnae_tabela = _tabela_cnaes(cnpj, tabela.column('CNAE_PRIMARIO'), tabela.column('CNAES_SECUNDARIOS'),
+                                cnaes_em_lista)
+
+    if colunas is not None:
+        tabela = tabela.select(list(colunas))
+    tabela = tabela.add_column(0, 'CNPJ_COMPLETO', cnpj)
+
+    # Inscritos no CTF: uma única busca binária vetorizada por bloco
+    if membros_ctf is not None:
+        tem_ctf, categorias = membros_ctf.sondar(cnpj)
+        tabela = tabela.append_column(COLUNA_TEM_CTF, tem_ctf).append_column(COLUNA_CATEGORIAS_CTF, categorias)
+    return tabela, cnae_tabela
+
+
+def _transformar_fonte(fonte, escritor_estab, escritor_cnae, chunk_size, motor, colunas, usecols,
+                       cnaes_em_lista=False, membros_ctf=None, orcamento=None):
+    """
+    Transforma uma fonte (shard) de estabelecimentos, gravando os blocos filtrados
+    nos escritores de saída (ver escrita_saidas.py).
+
+    Retorna (lidas, ativos, cnaes, erro): linhas lidas, estabelecimentos ativos gravados, CNAEs gravados
+    e None ou a mensagem da falha de leitura.
+    Executada tanto no processo principal quanto nos processos do modo paralelo.
+    """
+
+    lidas = 0
+    ativos = 0
+    cnaes = 0
+    try:
+        leitor = ler_csv_em_blocos(
+            fonte,
+            colunas=COLUNAS_ESTABELECIMENTOS,  # 30 colunas do layout oficial
+            usecols=usecols,
+            encoding="latin1",  # codificação dos arquivos da Receita
+            delimitador=";",
+            chunk_size=chunk_size,
+            motor=motor,
+            orcamento=orcamento
+        )
+
+        for chunk in leitor:
+            if chunk.shape[1] != len(usecols or COLUNAS_ESTABELECIMENTOS):
+                return lidas, ativos, cnaes, "número incorreto de colunas"
+
+            lidas += len(chunk)
+            estab_tabela, cnae_tabela = _processar_chunk(chunk, colunas, cnaes_em_lista, membros_ctf)
+            if estab_tabela is None:
+                continue
+
+            escritor_estab.escrever(estab_tabela)
+            escritor_cnae.escrever(cnae_tabela)
+
+            ativos += estab_tabela.num_rows
+            cnaes += cnae_tabela.num_rows
+    except Exception as e:
+        return lidas, ativos, cnaes, str(e)
+
+    return lidas, ativos, cnaes, None
+
+
+def _transformar_shard(fonte, pasta_parcial, indice, formatos, chunk_size, motor, colunas, usecols,
+                       cnaes_em_lista=False, membros_ctf=None, orcamento=None):
+    """
+    Transforma um shard em saídas parciais próprias, numeradas por 'indice'
+    (no processo principal ou em um do modo paralelo).
+    """
+
+    with EscritorTabela(f"estabelecimentos_{indice:04d}", pasta_parcial, pasta_parcial, formatos,
+                        tabela="estabelecimentos") as estab, \
+         EscritorTabela(f"cnae_estabelecimentos_{indice:04d}", pasta_parcial, pasta_parcial, formatos,
+                        tabela=_tabela_saida_cnaes(cnaes_em_lista)) as cnae:
+        return _transformar_fonte(fonte, estab, cnae, chunk_size, motor, colunas, usecols, cnaes_em_lista,
+                                  membros_ctf, orcamento)
+
+
+def _tabela_saida_cnaes(cnaes_em_lista):
+    """Esquema de saída (ver esquema_saida.py) de cnae_estabelecimentos no layout escolhido."""
+    return "cnae_estabelecimentos_lista" if cnaes_em_lista else "cnae_estabelecimentos"
+
+
+def _relatar_fonte(fonte, lidas, ativos, erro):
+    """
+    Mostra o resultado da transformação de uma fonte e o registra nas métricas da execução.
+    """
+
+    if erro is not None:
+        registrar_arquivo(fonte.nome, bytes_lidos=tamanho_fonte(fonte), linhas_lidas=lidas)
+        print(f"⚠️ Erro ao ler {fonte.nome}: {erro}. "
+              f"Arquivo descartado ({ativos} estabelecimentos ativos não gravados).")
+        return
+    registrar_arquivo(fonte.nome, bytes_lidos=tamanho_fonte(fonte), linhas_lidas=lidas, linhas_filtradas=ativos)
+    if ativos == 0:
+        print(f"ℹ️ Nenhum estabelecimento ativo no arquivo {fonte.nome}.")
+    else:
+        print(f"   ➡️ {ativos} estabelecimentos ativos gravados.")
+
+
+def transform_cnpj(caminho_pasta, caminho_saida, chunk_size=500_000, motor="pandas", colunas=None, processos=1,
+                   formatos=("csv",), caminho_parquet=None, cnaes_em_lista=False, membros_ctf=None, orcamento=None):
     """
     Transforma os arquivos de estabelecimentos do CNPJ em dois conjuntos de dados:
     1. estabelecimentos.csv -> Todas as 30 colunas do layout oficial + CNPJ_COMPLETO
     2. cnae_estabelecimentos.csv -> CNPJ completo + todos os CNAEs (primário e secundários)
+
+    - Lê cada arquivo em blocos de 'chunk_size' linhas e filtra os ativos à medida que chegam;
+      com 'orcamento' (OrcamentoMemoria), o tamanho dos blocos segue o orçamento de memória
+      (dividido entre os processos no modo paralelo), e não 'chunk_size'
+    - Acrescenta cada bloco filtrado diretamente às saídas parciais do seu shard
+    - O pico de memória depende do tamanho do bloco, e não do tamanho da base
+    - Arquivos ZIP na pasta são lidos diretamente, sem extração para o disco
+    - 'motor' escolhe o leitor CSV: "pandas" ou "pyarrow" (multithread, ver leitura_csv.py)
+    - 'colunas' restringe estabelecimentos.csv a um subconjunto do layout (projeção);
+      as colunas não usadas nem chegam a ser materializadas
+    - Cada shard (Estabelecimentos0 ... 9) grava saídas parciais próprias, juntadas ao final na ordem
+      dos arquivos; as de um shard que falha no meio da leitura são descartadas inteiras, para que
+      a saída nunca fique com parte de um arquivo
+    - Com 'processos' > 1, os shards são transformados em processos separados, gerando sempre
+      o mesmo resultado do modo serial
+    - 'formatos' define as saídas: "csv" (em 'caminho_saida') e/ou "parquet" (em 'caminho_parquet',
+      gravado diretamente, um row group por bloco, sem passar pelo CSV)
+    - Os CNAEs são separados em Arrow e convertidos direto para int32 (ver _tabela_cnaes)
+    - Com 'cnaes_em_lista', cnae_estabelecimentos é gravado no layout compacto, somente em Parquet:
+      um estabelecimento por linha, com CNAE_PRIMARIO e a lista CNAES_SECUNDARIOS.
+      O agregado, os índices e o particionamento leem o layout padrão (um CNAE por linha)
+    - Com 'membros_ctf' (MembrosCTF ou caminho do arquivo gravado por transform_ctf), acrescenta
+      TEM_CTF e CATEGORIAS_CTF aos estabelecimentos, dispensando o cruzamento com ctf_empresas no painel
+
+    Retorna a lista dos arquivos que falharam (vazia se todos foram transformados).
     """
 
-    estabelecimentos = []
-    cnaes_estabelecimentos = []
+    formatos = validar_formatos(formatos, caminho_parquet)
+    if cnaes_em_lista and "csv" in formatos:
+        raise ValueError("O layout 'cnaes_em_lista' só pode ser gravado em Parquet.")
+    if isinstance(membros_ctf, (str, os.PathLike)):
+        membros_ctf = MembrosCTF.carregar(membros_ctf)
 
-    print(f"\n📁 Verificando arquivos em: {caminho_pasta}")
-    for arquivo in os.listdir(caminho_pasta):
-        if arquivo in [".DS_Store", "estabelecimentos.csv", "cnae_estabelecimentos.csv"]:
-            continue
+    if colunas is not None:
+        desconhecidas = [c for c in colunas if c not in COLUNAS_ESTABELECIMENTOS]
+        if desconhecidas:
+            raise ValueError(f"Colunas fora do layout de estabelecimentos: {desconhecidas}")
+        usecols = [c for c in COLUNAS_ESTABELECIMENTOS if c in colunas or c in COLUNAS_NECESSARIAS]
+    else:
+        usecols = None
 
-        caminho_arquivo = os.path.join(caminho_pasta, arquivo)
-        print(f"\n🔍 Tentando ler: {arquivo}")
+    os.makedirs(caminho_saida, exist_ok=True)
+    total_estab = 0
+    total_cnae = 0
 
-        try:
-            df = pd.read_csv(
-                caminho_arquivo,
-                encoding="windows-1251",
-                delimiter=";",
-                names=list(range(30)),  # 30 colunas do layout oficial
-                dtype=str
-            )
-        except Exception as e:
-            print(f"⚠️ Erro ao ler {arquivo}: {e}")
-            continue
+    print(f"\n📁 Verificando arquivos em: {caminho_pasta}")
+    fontes = listar_fontes(caminho_pasta, ignorar=["estabelecimentos.csv", "cnae_estabelecimentos.csv"])
 
-        # Filtra estabelecimentos ativos ("02")
-        if df.shape[1] != 30:
-            print(f"⚠️ Arquivo {arquivo} com número incorreto de colunas. Pulando...")
-            continue
+    if processos > 1 and len(fontes) > 1:
+        print(f"⚙️ Transformando {len(fontes)} arquivos em até {processos} processos paralelos...")
 
-        df = df[df[5] == "02"]  # Situação Cadastral = 02 (ativo)
+    # Cada shard grava saídas parciais próprias: um shard que falha no meio é descartado inteiro
+    pasta_parcial = os.path.join(caminho_saida, ".parciais_estabelecimentos")
+    shutil.rmtree(pasta_parcial, ignore_errors=True)
+    os.makedirs(pasta_parcial)
 
-        if df.empty:
-            print(f"ℹ️ Nenhum estabelecimento ativo no arquivo {arquivo}.")
+    orcamento_shard = orcamento.dividir(min(processos, len(fontes))) if orcamento is not None else None
+    tarefas = [
+        (fonte, pasta_parcial, indice, formatos, chunk_size, motor, colunas, usecols, cnaes_em_lista, membros_ctf,
+         orcamento_shard)
+        for indice, fonte in enumerate(fontes)
+    ]
+    concluidos = []
+    falhas = []
+    for indice, (fonte, (lidas, ativos, cnaes, erro)) in enumerate(
+            zip(fontes, executar_em_paralelo(_transformar_shard, tarefas, processos))):
+        print(f"\n🔍 {fonte.nome}")
+        _relatar_fonte(fonte, lidas, ativos, erro)
+        if erro is not None:
+            falhas.append(fonte.nome)
             continue
+        concluidos.append(indice)
+        total_estab += ativos
+        total_cnae += cnaes
 
-        # CNPJ COMPLETO
-        df['CNPJ_COMPLETO'] = df[0] + df[1] + df[2]
-
-        df = df.rename(columns={
-            0: 'CNPJ_BASICO',
-            1: 'CNPJ_ORDEM',
-            2: 'CNPJ_DV',
-            3: 'IDENT_MATRIZ_FILIAL',
-            4: 'NOME_FANTASIA',
-            5: 'SITUACAO_CADASTRAL',
-            6: 'DATA_SITUACAO_CADASTRAL',
-            7: 'MOTIVO_SITUACAO_CADASTRAL',
-            8: 'NOME_CIDADE_EXTERIOR',
-            9: 'PAIS',
-            10: 'DATA_INICIO_ATIVIDADE',
-            11: 'CNAE_PRIMARIO',
-            12: 'CNAES_SECUNDARIOS',
-            13: 'TIPO_LOGRADOURO',
-            14: 'LOGRADOURO',
-            15: 'NUMERO',
-            16: 'COMPLEMENTO',
-            17: 'BAIRRO',
-            18: 'CEP',
-            19: 'UF',
-            20: 'MUNICIPIO',
-            21: 'DDD_1',
-            22: 'TELEFONE_1',
-            23: 'DDD_2',
-            24: 'TELEFONE_2',
-            25: 'DDD_FAX',
-            26: 'FAX',
-            27: 'EMAIL',
-            28: 'SITUACAO_ESPECIAL',
-            29: 'DATA_SITUACAO_ESPECIAL'
-        })
+    # Junta as parciais dos shards concluídos na ordem dos arquivos (resultado determinístico)
+    if total_estab:
+        if len(fontes) > 1:
+            print("\n🧩 Juntando saídas parciais...")
+        for nome in ("estabelecimentos", "cnae_estabelecimentos"):
+            destinos = EscritorTabela(nome, caminho_saida, caminho_parquet, formatos).destinos
+            partes = {
+                formato: [os.path.join(pasta_parcial, f"{nome}_{i:04d}.{formato}") for i in concluidos]
+                for formato in destinos
+            }
+            juntar_partes(partes, destinos, total_estab if nome == "estabelecimentos" else total_cnae)
+    shutil.rmtree(pasta_parcial, ignore_errors=True)
 
-        # Adiciona CNPJ_COMPLETO à frente
-        cols_ordenadas = ['CNPJ_COMPLETO'] + [col for col in df.columns if col != 'CNPJ_COMPLETO']
-        df = df[cols_ordenadas]
-        estabelecimentos.append(df)
+    if total_estab == 0:
+        print("⚠️ Nenhum arquivo foi processado.")
+        return falhas
 
-        # Processa CNAEs
-        cnae_df = df[['CNPJ_COMPLETO', 'CNAE_PRIMARIO', 'CNAES_SECUNDARIOS']].copy()
-        cnae_df['CNAES_SECUNDARIOS'] = cnae_df['CNAES_SECUNDARIOS'].str.split(',')
+    print("\n✅ Transformação concluída.")
+    for formato in formatos:
+        print(f" - estabelecimentos.{formato} ({total_estab} registros)")
+        print(f" - cnae_estabelecimentos.{formato} ({total_cnae} registros)")
+    return falhas
 
-        primario_df = cnae_df[['CNPJ_COMPLETO', 'CNAE_PRIMARIO']].rename(columns={'CNAE_PRIMARIO': 'CNAE'})
-        secundario_df = cnae_df[['CNPJ_COMPLETO', 'CNAES_SECUNDARIOS']].explode('CNAES_SECUNDARIOS').dropna().rename(columns={'CNAES_SECUNDARIOS': 'CNAE'})
 
-        cnaes_final_df = pd.concat([primario_df, secundario_df], ignore_index=True)
-        cnaes_estabelecimentos.append(cnaes_final_df)
+def remarcar_ctf(caminho_saida, membros_ctf, formatos=("csv",), caminho_parquet=None, chunk_size=500_000):
+    """
+    Atualiza TEM_CTF e CATEGORIAS_CTF em estabelecimentos já gravados, sem reler os arquivos da Receita:
+    usada quando só o conjunto de inscritos no CTF mudou (os arquivos brutos já podem ter sido removidos).
 
-    if not estabelecimentos:
-        print("⚠️ Nenhum arquivo foi processado.")
-        return
+    - Parquet: relido row group a row group, com as duas colunas substituídas (ou acrescentadas)
+    - CSV: relido em blocos de 'chunk_size' linhas, como texto, preservando as demais colunas
+    - 'membros_ctf': MembrosCTF ou caminho do arquivo gravado por transform_ctf
 
-    estabelecimentos_consolidado = pd.concat(estabelecimentos, ignore_index=True)
-    cnaes_estabelecimentos_consolidado = pd.concat(cnaes_estabelecimentos, ignore_index=True)
+    Tudo é gravado em temporários que substituem os arquivos ao final. Retorna os arquivos atualizados.
+    """
 
-    os.makedirs(caminho_saida, exist_ok=True)
-    estabelecimentos_consolidado.to_csv(os.path.join(caminho_saida, 'estabelecimentos.csv'), index=False)
-    cnaes_estabelecimentos_consolidado.to_csv(os.path.join(caminho_saida, 'cnae_estabelecimentos.csv'), index=False)
+    formatos = validar_formatos(formatos, caminho_parquet)
+    if isinstance(membros_ctf, (str, os.PathLike)):
+        membros_ctf = MembrosCTF.carregar(membros_ctf)
+    colunas_ctf = [COLUNA_TEM_CTF, COLUNA_CATEGORIAS_CTF]
+    atualizados = []
 
-    print("\n✅ Transformação concluída.")
-    print(" - estabelecimentos.csv")
-    print(" - cnae_estabelecimentos.csv")
+    destino = os.path.join(caminho_parquet, "estabelecimentos.parquet") if "parquet" in formatos else None
+    if destino and os.path.exists(destino):
+        arquivo = pq.ParquetFile(destino)
+        esquema = arquivo.schema_arrow
+        tipos = {campo.name: campo.type for campo in esquema_saida("estabelecimentos", colunas_ctf)}
+        tipos.update({nome: esquema.field(nome).type for nome in colunas_ctf if nome in esquema.names})
+        linhas = 0
+        escritor = None
+        try:
+            for i in range(arquivo.num_row_groups):
+                tabela = arquivo.read_row_group(i)
+                tabela = tabela.drop_columns([c for c in colunas_ctf if c in tabela.column_names])
+                tem_ctf, categorias = membros_ctf.sondar(tabela.column("CNPJ_COMPLETO").combine_chunks())
+                tabela = tabela.append_column(pa.field(COLUNA_TEM_CTF, tipos[COLUNA_TEM_CTF]),
+                                              tem_ctf.cast(tipos[COLUNA_TEM_CTF]))
+                tabela = tabela.append_column(pa.field(COLUNA_CATEGORIAS_CTF, tipos[COLUNA_CATEGORIAS_CTF]),
+                                              categorias.cast(tipos[COLUNA_CATEGORIAS_CTF]))
+                if escritor is None:
+                    escritor = pq.ParquetWriter(destino + ".tmp", schema=tabela.schema, compression="snappy")
+                escritor.write_table(tabela, row_group_size=max(1, tabela.num_rows))
+                linhas += tabela.num_rows
+        finally:
+            if escritor is not None:
+                escritor.close()
+        if escritor is not None:
+            os.replace(destino + ".tmp", destino)
+            registrar_arquivo(destino, bytes_gravados=os.path.getsize(destino), linhas_gravadas=linhas)
+            atualizados.append(destino)
 
+    destino = os.path.join(caminho_saida, "estabelecimentos.csv") if "csv" in formatos else None
+    if destino and os.path.exists(destino):
+        if os.path.exists(destino + ".tmp"):
+            os.remove(destino + ".tmp")
+        linhas = 0
+        for df in ler_csv_em_blocos(destino, delimitador=",", chunk_size=chunk_size):
+            cnpj = pc.cast(pa.array(df["CNPJ_COMPLETO"], pa.string(), from_pandas=True), pa.int64())
+            tem_ctf, categorias = membros_ctf.sondar(cnpj)
+            df[COLUNA_TEM_CTF] = tem_ctf.to_numpy(zero_copy_only=False)
+            df[COLUNA_CATEGORIAS_CTF] = categorias.to_numpy(zero_copy_only=False)
+            df.to_csv(destino + ".tmp", mode="a", header=linhas == 0, index=False)
+            linhas += len(df)
+        if linhas:
+            os.replace(destino + ".tmp", destino)
+            registrar_arquivo(destino, bytes_gravados=os.path.getsize(destino), linhas_gravadas=linhas)
+            atualizados.append(destino)
 
+    for caminho in atualizados:
+        print(f"✅ Marcação CTF atualizada em: {caminho}")
+    return atualizados
@@ -1,17 +1,42 @@
 import os
-import pandas as pd
+import pyarrow as pa
+from leitura_csv import ler_csv
+from chave_cnpj import cnpj_int64, cnpj_valido
+from membros_ctf import MembrosCTF
+from escrita_saidas import gravar_tabela
+from metricas import registrar_arquivo
 
-def transform_ctf(caminho_pasta, caminho_saida):
+# Colunas do CSV do IBAMA efetivamente utilizadas (projeção)
+COLUNAS_CTF = [
+    'CNPJ',
+    'Código da categoria',
+    'Código da atividade',
+    'Situação cadastral',
+    'Data de término da atividade'
+]
+
+def transform_ctf(caminho_pasta, caminho_saida, motor="pandas", formatos=("csv",), caminho_parquet=None,
+                  caminho_membros=None):
     """
     Transforma os arquivos CSV de pessoas jurídicas do CTF/APP IBAMA
     em um único arquivo com CNPJ e código de atividade (ctf).
 
+    O CNPJ, que o IBAMA publica com ou sem pontuação, é normalizado para a mesma chave int64
+    dos estabelecimentos (ver chave_cnpj.py); CNPJs com dígitos verificadores inválidos são descartados.
+
     Parâmetros:
     - caminho_pasta: pasta onde estão os arquivos .csv baixados.
     - caminho_saida: pasta onde o arquivo final consolidado será salvo.
+    - motor: leitor CSV, "pandas" ou "pyarrow" (multithread, ver leitura_csv.py).
+    - formatos: saídas a gravar, "csv" (em caminho_saida) e/ou "parquet" (em caminho_parquet).
+    - caminho_membros: se informado, grava também o conjunto dos CNPJs inscritos (ver membros_ctf.py),
+      usado para marcar os estabelecimentos na transformação de estabelecimentos.
+
+    Retorna a lista dos arquivos que não puderam ser lidos (vazia se todos foram transformados).
     """
 
-    dfs = []  # Lista para armazenar todos os DataFrames válidos
+    tabelas = []  # Lista para armazenar todas as tabelas válidas
+    falhas = []
 
     for arquivo in os.listdir(caminho_pasta):
         # Ignora arquivos não CSV e arquivos indesejados
@@ -22,15 +47,16 @@ def transform_ctf(caminho_pasta, caminho_saida):
         print(f"🔍 Lendo arquivo CTF: {caminho_arquivo}")
 
         try:
-            df = pd.read_csv(
+            df = ler_csv(
                 caminho_arquivo,
+                usecols=COLUNAS_CTF,
                 encoding="utf-8",
-                delimiter=";",
-                index_col=False,
-                dtype=str
+                delimitador=";",
+                motor=motor
             )
         except Exception as e:
             print(f"❌ Erro ao ler {arquivo}: {e}")
+            falhas.append(arquivo)
             continue
 
         # Verifica se o DataFrame está vazio
@@ -39,29 +65,44 @@ def transform_ctf(caminho_pasta, caminho_saida):
             continue
 
         # Aplica os filtros: apenas registros ativos e sem data de término
+        lidas = len(df)
         df = df[df['Data de término da atividade'].isna()]
         df = df[df['Situação cadastral'] == "Ativa"]
 
+        # Normaliza o CNPJ na chave int64 e descarta os inválidos
+        cnpj = cnpj_int64(df['CNPJ'])
+        validos = cnpj_valido(cnpj)
+        if not validos.all():
+            print(f"⚠️ {int((~validos).sum())} CNPJ(s) inválido(s) descartado(s) em: {arquivo}")
+        df = df[validos]
+        registrar_arquivo(caminho_arquivo, bytes_lidos=os.path.getsize(caminho_arquivo), linhas_lidas=lidas,
+                          linhas_filtradas=len(df))
+
         # Verifica novamente após os filtros se o DataFrame ainda tem conteúdo
         if df.empty:
             print(f"⚠️ Nenhum dado válido após filtros no arquivo: {arquivo}")
             continue
 
         # Criação da coluna "ctf" unindo código da categoria e da atividade
-        df["ctf"] = df['Código da categoria'].map(str) + '-' + df['Código da atividade'].map(str)
+        ctf = df['Código da categoria'].map(str) + '-' + df['Código da atividade'].map(str)
 
-        # Seleciona apenas colunas desejadas
-        df = df[['CNPJ', 'ctf']].rename(columns={'CNPJ': 'cnpj'})
-        dfs.append(df)
+        # Seleciona apenas colunas desejadas, com o CNPJ já na chave int64
+        tabelas.append(pa.table({
+            "cnpj": cnpj.filter(pa.array(validos)),
+            "ctf": pa.array(ctf, type=pa.string(), from_pandas=True),
+        }))
 
     # Valida se houve dados válidos antes de tentar concatenar
-    if not dfs:
+    if not tabelas:
         print("⚠️ Nenhum dado consolidado. Nenhum arquivo válido encontrado.")
-        return
-
-    # Consolida os DataFrames e salva como CSV final
-    df_final = pd.concat(dfs, ignore_index=True)
-    os.makedirs(caminho_saida, exist_ok=True)
-    caminho_final = os.path.join(caminho_saida, 'ctf_empresas.csv')
-    df_final.to_csv(caminho_final, index=False)
-    print(f"✅ Arquivo consolidado salvo em: {caminho_final}")
+        return falhas
+
+    # Consolida as tabelas e salva nos formatos pedidos
+    tabela_final = pa.concat_tables(tabelas)
+    for caminho_final in gravar_tabela(tabela_final, 'ctf_empresas', caminho_saida, caminho_parquet, formatos):
+        print(f"✅ Arquivo consolidado salvo em: {caminho_final}")
+
+    if caminho_membros:
+        membros = MembrosCTF.de_tabela(tabela_final)
+        print(f"✅ Conjunto de {len(membros)} CNPJs inscritos salvo em: {membros.gravar(caminho_membros)}")
+    return falhas
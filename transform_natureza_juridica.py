@@ -1,35 +1,41 @@
-import os
-import pandas as pd
+from fontes_csv import como_fonte, tamanho_fonte
+from leitura_csv import ler_csv
+from escrita_saidas import gravar_tabela
+from metricas import registrar_arquivo
 
-def transform_naturezas_juridicas(caminho_arquivo_csv, caminho_saida):
+def transform_naturezas_juridicas(caminho_arquivo_csv, caminho_saida, motor="pandas",
+                                  formatos=("csv",), caminho_parquet=None):
     '''
     Transforma o arquivo de naturezas jurídicas da Receita Federal em um CSV legível.
     Entrada:
-        - caminho_arquivo_csv: caminho completo do .csv baixado do site da Receita
+        - caminho_arquivo_csv: caminho completo do .csv baixado do site da Receita,
+          do próprio .zip ou uma Fonte (membro de ZIP), lido sem extração para o disco
         - caminho_saida: pasta onde o CSV final será salvo
+        - motor: leitor CSV, "pandas" ou "pyarrow" (ver leitura_csv.py)
+        - formatos: saídas a gravar, "csv" (em caminho_saida) e/ou "parquet" (em caminho_parquet)
     '''
-    print(f"🔄 Lendo naturezas jurídicas: {caminho_arquivo_csv}")
+    print(f"🔄 Lendo naturezas jurídicas: {como_fonte(caminho_arquivo_csv).nome}")
 
     try:
-        df = pd.read_csv(
+        df = ler_csv(
             caminho_arquivo_csv,
-            sep=';',
-            header=None,
-            names=['codigo', 'descricao'],
-            dtype=str,
-            encoding='latin1'
+            colunas=['codigo', 'descricao'],
+            encoding='latin1',
+            delimitador=';',
+            motor=motor
         )
     except Exception as e:
         print(f"❌ Erro ao ler o arquivo: {e}")
         return
 
+    registrar_arquivo(como_fonte(caminho_arquivo_csv).nome, bytes_lidos=tamanho_fonte(caminho_arquivo_csv),
+                      linhas_lidas=len(df), linhas_filtradas=len(df))
+
     # Valida se o DataFrame tem conteúdo
     if df.empty or df.shape[1] < 2:
         print("⚠️ Arquivo lido está vazio ou incompleto. Transformação cancelada.")
         return
 
-    os.makedirs(caminho_saida, exist_ok=True)
-    caminho_final = os.path.join(caminho_saida, 'naturezas_juridicas.csv')
-    df.to_csv(caminho_final, index=False)
-    print(f"✅ Transformação concluída. Arquivo salvo em: {caminho_final}")
+    for caminho_final in gravar_tabela(df, 'naturezas_juridicas', caminho_saida, caminho_parquet, formatos):
+        print(f"✅ Transformação concluída. Arquivo salvo em: {caminho_final}")
 